@@ -23,6 +23,7 @@ with con:
     for log_id in args.log_id:
         print('Removing '+log_id)
         cur.execute("DELETE FROM LogsGenerated WHERE Id = ?", (log_id,))
+        cur.execute("DELETE FROM IngestJobs WHERE Id = ?", (log_id,))
         cur.execute("DELETE FROM Logs WHERE Id = ?", (log_id,))
         num_deleted = cur.rowcount
         if num_deleted != 1:
@@ -0,0 +1,150 @@
+#! /usr/bin/env python3
+""" Script to (re)generate the LogsGenerated DB table from the log files, in parallel """
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import sqlite3
+import sys
+from timeit import default_timer as timer
+
+# this is needed for the following imports
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'plot_app'))
+from plot_app.config import get_db_filename
+from plot_app.db_entry import DBDataGenerated
+
+
+def get_log_ids(con, args):
+    """ get the (sorted) list of log ids to process """
+    cur = con.cursor()
+    if args.all:
+        cur.execute('select Id from Logs order by Id')
+    elif args.column is not None:
+        cur.execute("PRAGMA table_info('LogsGenerated')")
+        columns = {column[1]: column[4] for column in cur.fetchall()}
+        if args.column not in columns:
+            print('Error: no column {} in LogsGenerated'.format(args.column))
+            sys.exit(1)
+        # rows added before the column existed have the column default
+        condition = '{} is null'.format(args.column)
+        if columns[args.column] is not None:
+            condition += ' or {} = {}'.format(args.column, columns[args.column])
+        cur.execute('select Id from LogsGenerated where {} order by Id'.format(condition))
+    else:
+        cur.execute('select Id from Logs where Id not in (select Id from LogsGenerated) '
+                    'order by Id')
+    log_ids = [db_tuple[0] for db_tuple in cur.fetchall()]
+    cur.close()
+    return log_ids
+
+
+def extract_db_row(log_id):
+    """ read a log file (runs in a worker process)
+    :return: tuple of (log_id, LogsGenerated row or None, error message)
+    """
+    try:
+        return log_id, DBDataGenerated.from_log_file(log_id).to_db_row(log_id), ''
+    except Exception as error:
+        return log_id, None, str(error) or type(error).__name__
+
+
+def read_progress(progress_file_name):
+    """ get the last log id of a previous (interrupted) run or None """
+    try:
+        with open(progress_file_name, encoding='utf-8') as progress_file:
+            return progress_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_progress(progress_file_name, log_id):
+    """ store the last log id that is committed to the DB """
+    with open(progress_file_name + '.tmp', 'w', encoding='utf-8') as progress_file:
+        progress_file.write(log_id)
+    os.replace(progress_file_name + '.tmp', progress_file_name)
+
+
+def write_batch(con, rows):
+    """ write a batch of LogsGenerated rows in a single transaction """
+    with con:
+        con.executemany('insert or replace into LogsGenerated ({}) values ({})'.format(
+            ', '.join(DBDataGenerated.db_columns),
+            ', '.join(['?'] * len(DBDataGenerated.db_columns))), rows)
+
+
+def main():
+    """ command line interface """
+    parser = argparse.ArgumentParser(
+        description='Generate the LogsGenerated DB entries from the log files. '
+        'By default only the missing entries are generated.')
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument('--all', action='store_true', default=False,
+                            help='Regenerate the entries of all logs')
+    mode_group.add_argument('--column', action='store', default=None,
+                            help='Regenerate the entries where this column is missing '
+                            '(has the default value), e.g. StartTime')
+    parser.add_argument('--workers', '-j', action='store', type=int,
+                        default=os.cpu_count(),
+                        help='Number of worker processes (default=number of CPUs)')
+    parser.add_argument('--batch-size', action='store', type=int, default=200,
+                        help='Number of entries written per DB transaction (default=200)')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue an interrupted run (skips the logs that were '
+                        'already processed, only needed with --all)')
+    args = parser.parse_args()
+
+    progress_file_name = get_db_filename() + '.generate_progress'
+    con = sqlite3.connect(get_db_filename())
+    log_ids = get_log_ids(con, args)
+    if args.resume:
+        last_log_id = read_progress(progress_file_name)
+        if last_log_id is not None:
+            log_ids = [log_id for log_id in log_ids if log_id > last_log_id]
+            print('Resuming after log {}'.format(last_log_id))
+    elif os.path.exists(progress_file_name):
+        os.unlink(progress_file_name)
+
+    num_logs = len(log_ids)
+    print('Processing {} logs with {} workers'.format(num_logs, args.workers))
+    if num_logs == 0:
+        con.close()
+        return
+
+    num_done = 0
+    failed = []
+    rows = []
+    start_time = timer()
+    # fork: the workers do not need to re-import anything
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context('fork')) as executor:
+        # results are in order of the log ids, so the progress is well-defined
+        results = executor.map(extract_db_row, log_ids,
+                               chunksize=max(1, min(16, num_logs // (args.workers * 4))))
+        for log_id, row, error in results:
+            num_done += 1
+            if row is None:
+                print('Failed to process {}: {}'.format(log_id, error))
+                failed.append(log_id)
+            else:
+                rows.append(row)
+
+            if len(rows) >= args.batch_size or num_done == num_logs:
+                write_batch(con, rows)
+                rows = []
+                write_progress(progress_file_name, log_id)
+                elapsed = timer() - start_time
+                logs_per_sec = num_done / elapsed
+                print('{}/{} logs, {:.1f} logs/s, {} failed, ETA {:.0f} s'.format(
+                    num_done, num_logs, logs_per_sec, len(failed),
+                    (num_logs - num_done) / logs_per_sec))
+
+    con.close()
+    os.unlink(progress_file_name)
+    elapsed = timer() - start_time
+    print('Done: {} logs in {:.1f} s ({:.1f} logs/s), {} failed'.format(
+        num_logs, elapsed, num_logs / elapsed, len(failed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+""" Compact encoding of the plot data that is sent to the client """
+import weakref
+
+import numpy as np
+from bokeh.io import curdoc
+from bokeh.transform import dodge
+from bokeh.util.serialization import array_encoding_disabled, transform_array
+
+from config import get_compact_plot_data_enabled, debug_print_timing
+
+# float64 data is sent as float32 if the rounding error (relative to the
+# value) is below this fraction of the value range of the data, so that it is
+# not visible, even when zooming in
+_FLOAT32_MAX_RANGE_ERROR = 1e-4
+_FLOAT32_EPS = float(np.finfo(np.float32).eps)
+_FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+# number of bytes before and after the compaction, per document (only
+# collected with print_timing enabled)
+_document_stats = weakref.WeakKeyDictionary()
+
+
+def compact_array(values):
+    """ convert an array to the smallest type that is sent as binary buffer
+    and that displays the same:
+    - 64 bit integers (e.g. timestamps): 32 bit if the values fit, float64
+      otherwise (which bokeh would otherwise send as JSON list)
+    - float64: float32 if the rounding error is not visible
+    :return: values or the converted array
+    """
+    if not isinstance(values, np.ndarray) or len(values) == 0:
+        return values
+    if values.dtype in (np.int64, np.uint64):
+        for dtype in (np.int32, np.uint32):
+            info = np.iinfo(dtype)
+            if info.min <= np.min(values) and np.max(values) <= info.max:
+                return values.astype(dtype)
+        return values.astype(np.float64)
+    if values.dtype == np.float64:
+        with np.errstate(invalid='ignore'):
+            finite_values = values[np.isfinite(values)]
+        if len(finite_values) == 0:
+            return values.astype(np.float32)
+        max_abs = np.max(np.abs(finite_values))
+        value_range = np.max(finite_values) - np.min(finite_values)
+        if max_abs < _FLOAT32_MAX and \
+                max_abs * _FLOAT32_EPS <= value_range * _FLOAT32_MAX_RANGE_ERROR:
+            return values.astype(np.float32)
+    return values
+
+
+def get_timestamp_offset(timestamps):
+    """ get the offset that is subtracted from the 'timestamp' field of a data
+    source before it is sent (see compact_plot_data()): the first timestamp if
+    the compaction is enabled, 0 otherwise. Timestamps are in us since boot,
+    so they usually do not fit into 32 bits, but the offsets from the start of
+    the data do (for data spanning up to 71 minutes).
+    :param timestamps: all timestamps of the data source (before downsampling)
+    """
+    if not get_compact_plot_data_enabled() or len(timestamps) == 0 or \
+            timestamps.dtype.kind not in 'iu':
+        return 0
+    return int(timestamps[0])
+
+
+def get_timestamp_field(timestamp_offset):
+    """ get the x coordinate of the glyphs of a data source with the given
+    timestamp offset: the offset is added back on the client """
+    if timestamp_offset == 0:
+        return 'timestamp'
+    return dodge('timestamp', timestamp_offset)
+
+
+def compact_plot_data(data, timestamp_offset=0):
+    """ compact the arrays of a ColumnDataSource data dict (if enabled in the
+    config). The compaction is applied to the data that is actually sent,
+    (e.g. after downsampling), so that zooming in gets precise data.
+    :param timestamp_offset: subtracted from the 'timestamp' field (see
+    get_timestamp_offset())
+    :return: new dict (or data if disabled)
+    """
+    if not get_compact_plot_data_enabled():
+        return data
+    compacted = {}
+    for key, values in data.items():
+        if key == 'timestamp' and timestamp_offset != 0:
+            values = values - timestamp_offset
+        compacted[key] = compact_array(values)
+    if debug_print_timing():
+        stats = _document_stats.setdefault(curdoc(), [0, 0])
+        for key, values in data.items():
+            stats[0] += _get_encoded_size(values)
+            stats[1] += _get_encoded_size(compacted[key])
+    return compacted
+
+
+def _get_encoded_size(values):
+    """ approximate number of bytes bokeh uses to send an array """
+    if not isinstance(values, np.ndarray):
+        return len(str(values))
+    values = transform_array(values)
+    if array_encoding_disabled(values):
+        return len(str(values.tolist())) # sent as JSON list
+    return values.nbytes
+
+
+def print_compaction_stats(doc):
+    """ print the amount of plot data of a document (for debugging) """
+    num_bytes, num_bytes_compact = _document_stats.get(doc, [0, 0])
+    if num_bytes > 0:
+        print("Plot data: {:.1f} kB, compacted to {:.1f} kB ({:.0f}% saved)".format(
+            num_bytes / 1024, num_bytes_compact / 1024,
+            100 * (1 - num_bytes_compact / num_bytes)))
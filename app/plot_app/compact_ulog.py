@@ -0,0 +1,238 @@
+""" Compact (lossless) in-memory representation of ULog objects """
+import copy
+import mmap
+
+import numpy as np
+from pyulog import ULog
+
+from derived_signals import DerivedSignals
+
+#pylint: disable=protected-access
+
+# integer types to narrow to, smallest first
+_INT_TYPES = [np.dtype(t) for t in
+              [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32,
+               np.uint64, np.int64]]
+_INT64_MAX = np.iinfo(np.int64).max
+_FLOAT_TYPES = [np.dtype(np.float16), np.dtype(np.float32)]
+
+
+def _smallest_int_dtype(min_value, max_value):
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return dtype
+    return None
+
+
+def _is_memory_mapped(array):
+    """ check if an array is (a view of) a memory mapping, i.e. its pages are
+    backed by a file (the disk cache) and not resident in process memory """
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+class _CompactColumn:
+    """
+    A single encoded column. Encodings:
+    - 'raw': values stored in a narrower (or the original) dtype
+    - 'const': all values are the same, only the first one is stored
+    - 'delta': integers stored as first value and (narrowed) differences
+    - 'offset': integers stored as (narrowed) difference to the timestamp
+      column (e.g. timestamp_sample)
+    - 'bits': booleans packed into bits
+    """
+    __slots__ = ('dtype', 'size', 'encoding', 'first', 'values')
+
+    def __init__(self, array, timestamps=None):
+        self.dtype = array.dtype
+        self.size = len(array)
+        self.encoding = 'raw'
+        self.first = None
+        self.values = array
+
+        if self.size > 0 and array.ndim == 1:
+            self._encode(array, timestamps)
+        if self.values is array:
+            if isinstance(array, np.memmap):
+                # keep a view of the mapping (disk cache): the pages are
+                # shared with the other processes
+                self.values = np.asarray(array)
+            else:
+                # copy: the source is a field of the parsed message buffer
+                self.values = np.array(array)
+
+    def _encode(self, array, timestamps):
+        if self.dtype.kind in 'iufb':
+            # compare the bit patterns, so that NaN's count as equal
+            bits = array.view('u{}'.format(self.dtype.itemsize)) \
+                if self.dtype.kind == 'f' else array
+            if np.all(bits == bits[0]):
+                self.encoding = 'const'
+                self.first = array[:1].copy()
+                self.values = None
+                return
+
+        if self.dtype.kind == 'b':
+            self.encoding = 'bits'
+            self.values = np.packbits(array)
+        elif self.dtype.kind in 'iu':
+            self._encode_int(array)
+            if timestamps is not None and self.values.dtype.itemsize > 2:
+                self._encode_offset(array, timestamps)
+        elif self.dtype.kind == 'f':
+            for narrow_dtype in _FLOAT_TYPES:
+                if narrow_dtype.itemsize >= self.dtype.itemsize:
+                    break
+                with np.errstate(over='ignore'):
+                    narrowed = array.astype(narrow_dtype)
+                if np.array_equal(narrowed.astype(self.dtype), array, equal_nan=True):
+                    self.values = narrowed
+                    break
+
+    def _encode_int(self, array):
+        min_value = int(array.min())
+        max_value = int(array.max())
+        narrow_dtype = _smallest_int_dtype(min_value, max_value)
+        if narrow_dtype is not None and narrow_dtype.itemsize < self.dtype.itemsize:
+            self.values = array.astype(narrow_dtype)
+        if max_value > _INT64_MAX or max_value - min_value > _INT64_MAX // 2:
+            return # differences could overflow
+        # e.g. timestamps and counters: the differences are small
+        deltas = np.diff(array.astype(np.int64))
+        delta_dtype = _smallest_int_dtype(int(deltas.min()), int(deltas.max())) \
+            if len(deltas) > 0 else _INT_TYPES[0]
+        if delta_dtype.itemsize < self.values.dtype.itemsize:
+            self.encoding = 'delta'
+            self.first = int(array[0])
+            self.values = deltas.astype(delta_dtype)
+
+    def _encode_offset(self, array, timestamps):
+        if int(array.max()) > _INT64_MAX or int(timestamps.max()) > _INT64_MAX:
+            return
+        offsets = array.astype(np.int64) - timestamps.astype(np.int64)
+        offset_dtype = _smallest_int_dtype(int(offsets.min()), int(offsets.max()))
+        if offset_dtype.itemsize < self.values.dtype.itemsize:
+            self.encoding = 'offset'
+            self.values = offsets.astype(offset_dtype)
+
+    @property
+    def nbytes(self):
+        """ memory footprint in bytes, without memory-mapped values """
+        if self.values is None:
+            return self.first.nbytes
+        if _is_memory_mapped(self.values):
+            return 0
+        return self.values.nbytes
+
+    @property
+    def mapped_nbytes(self):
+        """ size of the memory-mapped values in bytes """
+        if self.values is None or not _is_memory_mapped(self.values):
+            return 0
+        return self.values.nbytes
+
+    @property
+    def original_nbytes(self):
+        """ size of the decoded column in bytes """
+        return self.size * self.dtype.itemsize
+
+    def decode(self, timestamps=None):
+        """ get the original array
+        :param timestamps: decoded timestamp column (needed for 'offset') """
+        if self.encoding == 'const':
+            return np.full(self.size, self.first[0], dtype=self.dtype)
+        if self.encoding == 'bits':
+            return np.unpackbits(self.values, count=self.size).astype(self.dtype)
+        if self.encoding == 'delta':
+            result = np.empty(self.size, dtype=np.int64)
+            result[0] = self.first
+            np.cumsum(self.values, dtype=np.int64, out=result[1:])
+            result[1:] += self.first
+            return result.astype(self.dtype)
+        if self.encoding == 'offset':
+            return (timestamps.astype(np.int64) + self.values).astype(self.dtype)
+        if self.values.dtype == self.dtype:
+            # no copy, but read-only (as the data of a parsed ULog)
+            values = self.values.view()
+            values.flags.writeable = False
+            return values
+        return self.values.astype(self.dtype)
+
+
+class _CompactData(ULog.Data):
+    """ topic of a ULog object created by CompactULog.to_ulog(): the data is
+    decoded on first access """
+
+    def __init__(self, topic):
+        """ :param topic: encoded topic of CompactULog """
+        #pylint: disable=super-init-not-called
+        (self.name, self.multi_id, self.msg_id, self.field_data,
+         self.timestamp_idx, self._columns) = topic
+        self._data = None
+
+    @property
+    def data(self):
+        """ dict of the decoded columns, key: field name """
+        if self._data is None:
+            columns = self._columns
+            timestamps = columns['timestamp'].decode() if 'timestamp' in columns else None
+            self._data = {field_name: timestamps if field_name == 'timestamp'
+                                      else column.decode(timestamps)
+                          for field_name, column in columns.items()}
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+
+class CompactULog:
+    """
+    Lossless, compact copy of the data of a ULog object, as stored in the RAM
+    cache. to_ulog() creates an ordinary ULog object with the original arrays
+    (same dtypes and values). The topics are decoded on first access, the
+    arrays can be read-only (as with ULog), but the caller is free to replace
+    them.
+    The derived signals are shared by all the ULog objects created from it.
+    """
+
+    def __init__(self, ulog):
+        self._topics = []
+        for data in ulog.data_list:
+            timestamps = data.data.get('timestamp')
+            columns = {}
+            for field_name, values in data.data.items():
+                # (not np.asarray(): keep memory-mapped columns as np.memmap)
+                values = values if isinstance(values, np.ndarray) else np.asarray(values)
+                # the timestamp column is delta-encoded, the other integer
+                # columns might be close to it
+                reference = timestamps if field_name != 'timestamp' and \
+                    timestamps is not None and len(timestamps) == len(values) else None
+                columns[field_name] = _CompactColumn(values, reference)
+            self._topics.append((data.name, data.multi_id, data.msg_id, data.field_data,
+                                 data.timestamp_idx, columns))
+        self._ulog = copy.copy(ulog) # everything except the data
+        self._ulog._data_list = []
+        self.derived_signals = DerivedSignals()
+        columns = [column for topic in self._topics for column in topic[5].values()]
+        self._columns_nbytes = sum(column.nbytes for column in columns)
+        self.mapped_nbytes = sum(column.mapped_nbytes for column in columns)
+        self.original_nbytes = sum(column.original_nbytes for column in columns)
+
+    @property
+    def nbytes(self):
+        """ memory footprint in bytes (the data and the derived signals).
+        Memory-mapped columns (from the disk cache) are not included, their
+        pages are shared and can be dropped by the OS (see mapped_nbytes). """
+        return self._columns_nbytes + self.derived_signals.nbytes
+
+    def to_ulog(self):
+        """ create a ULog object, its topics are decoded on first access """
+        ulog = copy.copy(self._ulog)
+        ulog._data_list = [_CompactData(topic) for topic in self._topics]
+        ulog.derived_signals = self.derived_signals
+        return ulog
@@ -30,9 +30,23 @@ __AIRFRAMES_URL = _conf.get('general', 'airframes_url')
 __PARAMETERS_URL = _conf.get('general', 'parameters_url')
 __EVENTS_URL = _conf.get('general', 'events_url')
 __MAPBOX_API_ACCESS_TOKEN = _conf.get('general', 'mapbox_api_access_token')
+__ADMIN_TOKEN = _conf.get('general', 'admin_token')
 __BING_API_KEY = _conf.get('general', 'bing_maps_api_key')
 __CESIUM_API_KEY = _conf.get('general', 'cesium_api_key')
-__LOG_CACHE_SIZE = int(_conf.get('general', 'log_cache_size'))
+__LOG_CACHE_MEMORY = _conf.get('general', 'log_cache_memory')
+__ULOG_DISK_CACHE = int(_conf.get('general', 'ulog_disk_cache'))
+__ULOG_DISK_CACHE_SIZE = int(_conf.get('general', 'ulog_disk_cache_size'))
+__INGEST_WORKERS = int(_conf.get('general', 'ingest_workers'))
+__INGEST_MAX_ATTEMPTS = int(_conf.get('general', 'ingest_max_attempts'))
+__PREFETCH_NUM_LOGS = int(_conf.get('general', 'prefetch_num_logs'))
+__RENDER_CACHE = int(_conf.get('general', 'render_cache'))
+__RENDER_CACHE_SIZE = int(_conf.get('general', 'render_cache_size'))
+__RENDER_CACHE_MAX_ENTRY_SIZE = int(_conf.get('general', 'render_cache_max_entry_size'))
+__LAZY_PLOTS = int(_conf.get('general', 'lazy_plots'))
+__PLOT_COMPUTE_THREADS = int(_conf.get('general', 'plot_compute_threads'))
+__COMPACT_PLOT_DATA = int(_conf.get('general', 'compact_plot_data'))
+__DOWNSAMPLING = _conf.get('general', 'downsampling')
+__ZOOM_UPDATE_DELAY = int(_conf.get('general', 'zoom_update_delay'))
 __DB_FILENAME_CUSTOM = _conf.get('general', 'db_filename')
 
 __STORAGE_PATH = _conf.get('general', 'storage_path')
@@ -49,6 +63,8 @@ __RELEASES_FILENAME = os.path.join(__CACHE_FILE_PATH, 'releases.json')
 
 __PRINT_TIMING = int(_conf.get('debug', 'print_timing'))
 __VERBOSE_OUTPUT = int(_conf.get('debug', 'verbose_output'))
+__TIMING_REPORTS = int(_conf.get('debug', 'timing_reports'))
+__TIMING_REPORTS_MAX = int(_conf.get('debug', 'timing_reports_max'))
 
 # general configuration variables for plotting
 plot_width = 840
@@ -95,6 +111,18 @@ def get_kml_filepath():
     """ get configured KML files directory """
     return os.path.join(get_cache_filepath(), 'kml')
 
+def get_ulog_cache_filepath():
+    """ get configured directory for the parsed ULog disk cache """
+    return os.path.join(get_cache_filepath(), 'ulog')
+
+def get_render_cache_filepath():
+    """ get configured directory for the plot page render cache """
+    return os.path.join(get_cache_filepath(), 'render')
+
+def get_timing_reports_filepath():
+    """ get configured directory for the timing reports """
+    return os.path.join(get_cache_filepath(), 'timing')
+
 def get_overview_img_filepath():
     """ get configured overview image directory """
     return os.path.join(get_cache_filepath(), 'img')
@@ -137,6 +165,10 @@ def get_mapbox_api_access_token():
     """ get MapBox API Access Token """
     return __MAPBOX_API_ACCESS_TOKEN
 
+def get_admin_token():
+    """ get the token for the admin pages (empty = disabled) """
+    return __ADMIN_TOKEN
+
 def get_bing_maps_api_key():
     """ get Bing maps API key """
     return __BING_API_KEY
@@ -145,14 +177,74 @@ def get_cesium_api_key():
     """ get Cesium API key """
     return __CESIUM_API_KEY
 
-def get_log_cache_size():
-    """ get maximum number of cached logs in RAM """
-    return __LOG_CACHE_SIZE
+def get_log_cache_memory():
+    """ get maximum memory for cached logs in RAM (MB or 'auto') """
+    return __LOG_CACHE_MEMORY
+
+def get_ulog_disk_cache_enabled():
+    """ use the disk cache for parsed ULog files? """
+    return __ULOG_DISK_CACHE == 1
+
+def get_ulog_disk_cache_size():
+    """ get maximum size of the ULog disk cache in MB """
+    return __ULOG_DISK_CACHE_SIZE
+
+def get_ingest_workers():
+    """ get number of background ingest worker processes """
+    return __INGEST_WORKERS
+
+def get_ingest_max_attempts():
+    """ get maximum number of attempts for an ingest job """
+    return __INGEST_MAX_ATTEMPTS
+
+def get_render_cache_enabled():
+    """ cache the rendered plot pages? """
+    return __RENDER_CACHE == 1
+
+def get_render_cache_size():
+    """ get maximum size of the render cache in MB """
+    return __RENDER_CACHE_SIZE
+
+def get_render_cache_max_entry_size():
+    """ get maximum size of a single render cache entry in MB """
+    return __RENDER_CACHE_MAX_ENTRY_SIZE
+
+def get_lazy_plots_enabled():
+    """ render the plots of the main page when they are scrolled into view? """
+    return __LAZY_PLOTS == 1
+
+def get_plot_compute_threads():
+    """ get number of threads for the plot analyses (0 = number of CPUs) """
+    return __PLOT_COMPUTE_THREADS
+
+def get_compact_plot_data_enabled():
+    """ send the plot data with reduced precision where it is not visible? """
+    return __COMPACT_PLOT_DATA == 1
+
+def get_downsampling_method():
+    """ get the downsampling method of the plot data ('auto', 'envelope' or 'step') """
+    return __DOWNSAMPLING
+
+def get_zoom_update_delay():
+    """ get the delay of the (batched) zoom updates of the plot data [ms] """
+    return __ZOOM_UPDATE_DELAY
+
+def get_prefetch_num_logs():
+    """ get maximum number of logs to prefetch (0 = disabled) """
+    return __PREFETCH_NUM_LOGS
 
 def debug_print_timing():
     """ print timing information? """
     return __PRINT_TIMING == 1
 
+def get_timing_reports_enabled():
+    """ store a timing report per plot page session? """
+    return __TIMING_REPORTS == 1
+
+def get_timing_reports_max():
+    """ get maximum number of stored timing reports """
+    return __TIMING_REPORTS_MAX
+
 def debug_verbose_output():
     """ print verbose output? """
     return __VERBOSE_OUTPUT == 1
@@ -1,6 +1,5 @@
 """ This contains the list of all drawn plots on the log plotting page """
 
-import re
 from html import escape
 
 from bokeh.layouts import column
@@ -12,6 +11,8 @@ from config import *
 from helper import *
 from leaflet import ulog_to_polyline
 from plotting import *
+from render_cache import add_restore_callback
+from topic_registry import get_topic_registry
 from plotted_tables import (
     get_logged_messages, get_changed_parameters,
     get_info_table_html, get_heading_html, get_error_labels_html,
@@ -21,19 +22,110 @@ from plotted_tables import (
 from vtol_tailsitter import *
 
 #pylint: disable=cell-var-from-loop, undefined-loop-variable,
-#pylint: disable=consider-using-enumerate,too-many-statements
+#pylint: disable=consider-using-enumerate,too-many-statements,too-many-lines
+# (pylint infers data_plot from all the plot sections)
+#pylint: disable=unexpected-keyword-arg
+
+
+# topics of the actuator controls (see ActuatorControls)
+_ACTUATOR_CONTROLS_TOPICS = ['actuator_motors', 'actuator_servos',
+                             'vehicle_torque_setpoint', 'vehicle_thrust_setpoint',
+                             'actuator_controls_0', 'actuator_controls_1']
+
+# sections of the plot page that can be selected with the plots argument
+# (e.g. ?plots=attitude,rates). key: section name, value: topics used by the
+# plots of the section. Note that COMPATIBILITY topics of old logs are not
+# included (e.g. the barometer altitude in sensor_combined).
+PLOT_SECTIONS = {
+    'position': ['vehicle_local_position', 'vehicle_local_position_setpoint',
+                 'vehicle_local_position_groundtruth', 'vehicle_gps_position',
+                 'vehicle_air_data', 'vehicle_global_position', 'position_setpoint_triplet',
+                 'vehicle_visual_odometry', 'vehicle_attitude_groundtruth',
+                 'airspeed', 'airspeed_validated', 'tecs_status'] + _ACTUATOR_CONTROLS_TOPICS,
+    'attitude': ['vehicle_attitude', 'vehicle_attitude_setpoint',
+                 'vehicle_attitude_groundtruth', 'vehicle_angular_velocity'],
+    'rates': ['vehicle_angular_velocity', 'vehicle_attitude', 'vehicle_rates_setpoint',
+              'rate_ctrl_status', 'vehicle_attitude_groundtruth'],
+    'control': ['manual_control_setpoint', 'manual_control_switches', 'rc_channels',
+                'actuator_outputs'] + _ACTUATOR_CONTROLS_TOPICS,
+    'vibration': ['sensor_combined', 'vehicle_imu_status', 'vehicle_angular_velocity',
+                  'vehicle_angular_acceleration', 'sensor_accel_fifo',
+                  'sensor_gyro_fifo'] + _ACTUATOR_CONTROLS_TOPICS,
+    'sensors': ['vehicle_magnetometer', 'distance_sensor',
+                'vehicle_gps_position'] + _ACTUATOR_CONTROLS_TOPICS,
+    'power': ['battery_status', 'system_power', 'sensor_baro', 'sensor_accel', 'airspeed'],
+    'estimator': ['estimator_status'],
+    'system': ['failsafe_flags', 'cpuload', 'sensor_combined', 'estimator_status'],
+    }
+
+# topics used by every plot page: heading, info table, flight modes and
+# logged messages
+_PLOT_PAGE_TOPICS = ['vehicle_status', 'vehicle_gps_position', 'vehicle_local_position',
+                     'vehicle_attitude', 'battery_status', 'event']
+
+
+def parse_plot_sections(plots_argument):
+    """ get the plot sections from the plots argument (comma-separated
+    section names, unknown names are ignored)
+    :return: list of section names (in page order) or None if there's none
+    """
+    names = plots_argument.split(',')
+    sections = [section for section in PLOT_SECTIONS if section in names]
+    if len(sections) == 0:
+        return None
+    return sections
+
+
+def get_plot_sections_topics(sections):
+    """ get the topics needed to show the given plot sections """
+    topics = set(_PLOT_PAGE_TOPICS)
+    for section in sections:
+        topics.update(PLOT_SECTIONS[section])
+    return sorted(topics)
+
+
+
+def setup_param_changes_button(param_changes_button, param_change_labels):
+    """ add the callback to the button to show/hide parameter changes """
+    # FIXME: this should be a CustomJS callback, not on the server. However this
+    # did not work for me.
+    def param_changes_button_clicked():
+        """ callback to show/hide parameter changes """
+        for label in param_change_labels:
+            if label.visible:
+                param_changes_button.label = 'Show Parameter Changes'
+                label.visible = False
+                label.text_alpha = 0 # label.visible does not work, so we use this instead
+            else:
+                param_changes_button.label = 'Hide Parameter Changes'
+                label.visible = True
+                label.text_alpha = 1
+    param_changes_button.on_click(param_changes_button_clicked)
+
 
+def restore_param_changes_button(doc, state):
+    """ re-create the button callback of a document restored from the render cache """
+    param_changes_button = doc.get_model_by_id(state['button'])
+    if param_changes_button is not None: # not shown
+        setup_param_changes_button(param_changes_button,
+                                   [doc.get_model_by_id(label) for label in state['labels']])
 
 
 def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
-                   link_to_pid_analysis_page):
-    """ create a list of bokeh plots (and widgets) to show """
+                   link_to_pid_analysis_page, *, sections=None):
+    """ create a list of bokeh plots (and widgets) to show
+    :param sections: list of the plot sections to show (see PLOT_SECTIONS), or
+                     None for all
+    """
+
+    def show(section):
+        return sections is None or section in sections
 
     plots = []
-    data = ulog.data_list
+    data = get_topic_registry(ulog)
 
     # COMPATIBILITY support for old logs
-    if any(elem.name in ('vehicle_air_data', 'vehicle_magnetometer') for elem in data):
+    if data.has_topic('vehicle_air_data', 'vehicle_magnetometer'):
         baro_alt_meter_topic = 'vehicle_air_data'
         magnetometer_ga_topic = 'vehicle_magnetometer'
     else: # old
@@ -42,19 +134,9 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
     manual_control_sp_controls = ['roll', 'pitch', 'yaw', 'throttle']
     manual_control_sp_throttle_range = '[-1, 1]'
     vehicle_gps_position_altitude = None
+    # (COMPATIBILITY: renamed fields are handled by the topic registry)
     for topic in data:
-        if topic.name == 'system_power':
-            # COMPATIBILITY: rename fields to new format
-            if 'voltage5V_v' in topic.data:     # old (prior to PX4/Firmware:213aa93)
-                topic.data['voltage5v_v'] = topic.data.pop('voltage5V_v')
-            if 'voltage3V3_v' in topic.data:    # old (prior to PX4/Firmware:213aa93)
-                topic.data['sensors3v3[0]'] = topic.data.pop('voltage3V3_v')
-            if 'voltage3v3_v' in topic.data:
-                topic.data['sensors3v3[0]'] = topic.data.pop('voltage3v3_v')
-        elif topic.name == 'tecs_status':
-            if 'airspeed_sp' in topic.data: # old (prior to PX4-Autopilot/pull/16585)
-                topic.data['true_airspeed_sp'] = topic.data.pop('airspeed_sp')
-        elif topic.name == 'manual_control_setpoint':
+        if topic.name == 'manual_control_setpoint':
             if 'throttle' not in topic.data: # old (prior to PX4-Autopilot/pull/15949)
                 manual_control_sp_controls = ['y', 'x', 'r', 'z']
                 manual_control_sp_throttle_range = '[0, 1]'
@@ -64,7 +146,7 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
             else: # COMPATIBILITY
                 vehicle_gps_position_altitude = topic.data['alt'] * 0.001
 
-    if any(elem.name == 'vehicle_angular_velocity' for elem in data):
+    if data.has_topic('vehicle_angular_velocity'):
         rate_estimated_topic_name = 'vehicle_angular_velocity'
         rate_groundtruth_topic_name = 'vehicle_angular_velocity_groundtruth'
         rate_field_names = ['xyz[0]', 'xyz[1]', 'xyz[2]']
@@ -72,12 +154,11 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
         rate_estimated_topic_name = 'vehicle_attitude'
         rate_groundtruth_topic_name = 'vehicle_attitude_groundtruth'
         rate_field_names = ['rollspeed', 'pitchspeed', 'yawspeed']
-    if any(elem.name == 'manual_control_switches' for elem in data):
+    if data.has_topic('manual_control_switches'):
         manual_control_switches_topic = 'manual_control_switches'
     else: # old
         manual_control_switches_topic = 'manual_control_setpoint'
-    dynamic_control_alloc = any(elem.name in ('actuator_motors', 'actuator_servos')
-                                for elem in data)
+    dynamic_control_alloc = data.has_topic('actuator_motors', 'actuator_servos')
     actuator_controls_0 = ActuatorControls(ulog, dynamic_control_alloc, 0)
     actuator_controls_1 = ActuatorControls(ulog, dynamic_control_alloc, 1)
 
@@ -89,7 +170,7 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
     is_vtol = False
     is_vtol_tailsitter = False
     try:
-        cur_dataset = ulog.get_dataset('vehicle_status')
+        cur_dataset = data.get_dataset('vehicle_status')
         if np.amax(cur_dataset.data['is_vtol']) == 1:
             is_vtol = True
             # check if is tailsitter
@@ -145,32 +226,33 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
     if corrupt_log_html:
         curdoc().template_variables['corrupt_log_html'] = corrupt_log_html
 
-    # Position plot
-    data_plot = DataPlot2D(data, plot_config, 'vehicle_local_position',
-                           x_axis_label='[m]', y_axis_label='[m]', plot_height='large')
-    data_plot.add_graph('y', 'x', colors2[0], 'Estimated',
-                        check_if_all_zero=True)
-    if not data_plot.had_error: # vehicle_local_position is required
-        data_plot.change_dataset('vehicle_local_position_setpoint')
-        data_plot.add_graph('y', 'x', colors2[1], 'Setpoint')
-        # groundtruth (SITL only)
-        data_plot.change_dataset('vehicle_local_position_groundtruth')
-        data_plot.add_graph('y', 'x', color_gray, 'Groundtruth')
-        # GPS + position setpoints
-        plot_map(ulog, plot_config, map_type='plain', setpoints=True,
-                 bokeh_plot=data_plot.bokeh_plot)
-        if data_plot.finalize() is not None:
-            plots.append(data_plot.bokeh_plot)
-
-    if any(elem.name == 'vehicle_gps_position' for elem in ulog.data_list):
-        # Leaflet Map
-        try:
-            pos_datas, flight_modes = ulog_to_polyline(ulog, flight_mode_changes)
-            curdoc().template_variables['pos_datas'] = pos_datas
-            curdoc().template_variables['pos_flight_modes'] = flight_modes
-        except:
-            pass
-        curdoc().template_variables['has_position_data'] = True
+    if show('position'):
+        # Position plot
+        data_plot = DataPlot2D(data, plot_config, 'vehicle_local_position',
+                               x_axis_label='[m]', y_axis_label='[m]', plot_height='large')
+        data_plot.add_graph('y', 'x', colors2[0], 'Estimated',
+                            check_if_all_zero=True)
+        if not data_plot.had_error: # vehicle_local_position is required
+            data_plot.change_dataset('vehicle_local_position_setpoint')
+            data_plot.add_graph('y', 'x', colors2[1], 'Setpoint')
+            # groundtruth (SITL only)
+            data_plot.change_dataset('vehicle_local_position_groundtruth')
+            data_plot.add_graph('y', 'x', color_gray, 'Groundtruth')
+            # GPS + position setpoints
+            plot_map(ulog, plot_config, map_type='plain', setpoints=True,
+                     bokeh_plot=data_plot.bokeh_plot)
+            if data_plot.finalize() is not None:
+                plots.append(data_plot.bokeh_plot)
+
+        if data.has_topic('vehicle_gps_position'):
+            # Leaflet Map
+            try:
+                pos_datas, flight_modes = ulog_to_polyline(ulog, flight_mode_changes)
+                curdoc().template_variables['pos_datas'] = pos_datas
+                curdoc().template_variables['pos_flight_modes'] = flight_modes
+            except:
+                pass
+            curdoc().template_variables['has_position_data'] = True
 
     # initialize parameter changes
     changed_params = None
@@ -184,26 +266,27 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
     x_range_offset = (ulog.last_timestamp - ulog.start_timestamp) * 0.05
     x_range = Range1d(ulog.start_timestamp - x_range_offset, ulog.last_timestamp + x_range_offset)
 
-    # Altitude estimate
-    data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
-                         y_axis_label='[m]', title='Altitude Estimate',
-                         changed_params=changed_params, x_range=x_range)
-    data_plot.add_graph([lambda data: ('alt', vehicle_gps_position_altitude)],
-                        colors8[0:1], ['GPS Altitude (MSL)'])
-    data_plot.change_dataset(baro_alt_meter_topic)
-    data_plot.add_graph(['baro_alt_meter'], colors8[1:2], ['Barometer Altitude'])
-    data_plot.change_dataset('vehicle_global_position')
-    data_plot.add_graph(['alt'], colors8[2:3], ['Fused Altitude Estimation'])
-    data_plot.change_dataset('position_setpoint_triplet')
-    data_plot.add_circle(['current.alt'], [plot_config['mission_setpoint_color']],
-                         ['Altitude Setpoint'])
-    data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
-    if actuator_controls_0.thrust_z_neg is not None:
-        data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_z_neg*100)],
-                            colors8[6:7], ['Thrust [0, 100]'])
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
+    if show('position'):
+        # Altitude estimate
+        data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
+                             y_axis_label='[m]', title='Altitude Estimate',
+                             changed_params=changed_params, x_range=x_range)
+        data_plot.add_graph([lambda data: ('alt', vehicle_gps_position_altitude)],
+                            colors8[0:1], ['GPS Altitude (MSL)'])
+        data_plot.change_dataset(baro_alt_meter_topic)
+        data_plot.add_graph(['baro_alt_meter'], colors8[1:2], ['Barometer Altitude'])
+        data_plot.change_dataset('vehicle_global_position')
+        data_plot.add_graph(['alt'], colors8[2:3], ['Fused Altitude Estimation'])
+        data_plot.change_dataset('position_setpoint_triplet')
+        data_plot.add_circle(['current.alt'], [plot_config['mission_setpoint_color']],
+                             ['Altitude Setpoint'])
+        data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
+        if actuator_controls_0.thrust_z_neg is not None:
+            data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_z_neg*100)],
+                                colors8[6:7], ['Thrust [0, 100]'])
+        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
     # VTOL tailistter orientation conversion, if relevant
     if is_vtol_tailsitter:
@@ -211,809 +294,827 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
 
     # Roll/Pitch/Yaw angle & angular rate
     for index, axis in enumerate(['roll', 'pitch', 'yaw']):
-        # angle
         axis_name = axis.capitalize()
-        data_plot = DataPlot(data, plot_config, 'vehicle_attitude',
-                             y_axis_label='[deg]', title=axis_name+' Angle',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        if is_vtol_tailsitter:
-            if tailsitter_attitude[axis] is not None:
-                data_plot.add_graph([lambda data: (axis+'_q',
-                                                   np.rad2deg(tailsitter_attitude[axis]))],
+        if show('attitude'):
+            # angle
+            data_plot = DataPlot(data, plot_config, 'vehicle_attitude',
+                                 y_axis_label='[deg]', title=axis_name+' Angle',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            if is_vtol_tailsitter:
+                if tailsitter_attitude[axis] is not None:
+                    data_plot.add_graph([lambda data: (axis+'_q',
+                                                       np.rad2deg(tailsitter_attitude[axis]))],
+                                        colors3[0:1], [axis_name+' Estimated'], mark_nan=True)
+            else:
+                data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
                                     colors3[0:1], [axis_name+' Estimated'], mark_nan=True)
-        else:
-            data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
-                                colors3[0:1], [axis_name+' Estimated'], mark_nan=True)
 
-        data_plot.change_dataset('vehicle_attitude_setpoint')
-        data_plot.add_graph([lambda data: (axis+'_d', np.rad2deg(data[axis+'_d']))],
-                            colors3[1:2], [axis_name+' Setpoint'],
-                            use_step_lines=True)
-        if axis == 'yaw':
-            data_plot.add_graph(
-                [lambda data: ('yaw_sp_move_rate', np.rad2deg(data['yaw_sp_move_rate']))],
-                colors3[2:3], [axis_name+' FF Setpoint [deg/s]'],
-                use_step_lines=True)
-        data_plot.change_dataset('vehicle_attitude_groundtruth')
-        data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
-                            [color_gray], [axis_name+' Groundtruth'])
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            data_plot.change_dataset('vehicle_attitude_setpoint')
+            data_plot.add_graph([lambda data: (axis+'_d', np.rad2deg(data[axis+'_d']))],
+                                colors3[1:2], [axis_name+' Setpoint'],
+                                use_change_points=True)
+            if axis == 'yaw':
+                data_plot.add_graph(
+                    [lambda data: ('yaw_sp_move_rate', np.rad2deg(data['yaw_sp_move_rate']))],
+                    colors3[2:3], [axis_name+' FF Setpoint [deg/s]'],
+                    use_change_points=True)
+            data_plot.change_dataset('vehicle_attitude_groundtruth')
+            data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
+                                [color_gray], [axis_name+' Groundtruth'])
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
-        # rate
-        data_plot = DataPlot(data, plot_config, rate_estimated_topic_name,
-                             y_axis_label='[deg/s]', title=axis_name+' Angular Rate',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        if is_vtol_tailsitter:
-            if tailsitter_rates[axis] is not None:
-                data_plot.add_graph([lambda data: (axis+'_q',
-                                                   np.rad2deg(tailsitter_rates[axis]))],
+        if show('rates'):
+            # rate
+            data_plot = DataPlot(data, plot_config, rate_estimated_topic_name,
+                                 y_axis_label='[deg/s]', title=axis_name+' Angular Rate',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            if is_vtol_tailsitter:
+                if tailsitter_rates[axis] is not None:
+                    data_plot.add_graph([lambda data: (axis+'_q',
+                                                       np.rad2deg(tailsitter_rates[axis]))],
+                                        colors3[0:1], [axis_name+' Rate Estimated'], mark_nan=True)
+            else:
+                data_plot.add_graph([lambda data: (axis+'speed',
+                                                   np.rad2deg(data[rate_field_names[index]]))],
                                     colors3[0:1], [axis_name+' Rate Estimated'], mark_nan=True)
-        else:
+            data_plot.change_dataset('vehicle_rates_setpoint')
+            data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
+                                colors3[1:2], [axis_name+' Rate Setpoint'],
+                                mark_nan=True, use_change_points=True)
+            axis_letter = axis[0].upper()
+            rate_int_limit = '(*100)'
+            # this param is MC/VTOL only (it will not exist on FW)
+            rate_int_limit_param = 'MC_' + axis_letter + 'R_INT_LIM'
+            if rate_int_limit_param in ulog.initial_parameters:
+                rate_int_limit = '[-{0:.0f}, {0:.0f}]'.format(
+                    ulog.initial_parameters[rate_int_limit_param]*100)
+            data_plot.change_dataset('rate_ctrl_status')
+            data_plot.add_graph([lambda data: (axis, data[axis+'speed_integ']*100)],
+                                colors3[2:3], [axis_name+' Rate Integral '+rate_int_limit])
+            data_plot.change_dataset(rate_groundtruth_topic_name)
             data_plot.add_graph([lambda data: (axis+'speed',
                                                np.rad2deg(data[rate_field_names[index]]))],
-                                colors3[0:1], [axis_name+' Rate Estimated'], mark_nan=True)
-        data_plot.change_dataset('vehicle_rates_setpoint')
-        data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
-                            colors3[1:2], [axis_name+' Rate Setpoint'],
-                            mark_nan=True, use_step_lines=True)
-        axis_letter = axis[0].upper()
-        rate_int_limit = '(*100)'
-        # this param is MC/VTOL only (it will not exist on FW)
-        rate_int_limit_param = 'MC_' + axis_letter + 'R_INT_LIM'
-        if rate_int_limit_param in ulog.initial_parameters:
-            rate_int_limit = '[-{0:.0f}, {0:.0f}]'.format(
-                ulog.initial_parameters[rate_int_limit_param]*100)
-        data_plot.change_dataset('rate_ctrl_status')
-        data_plot.add_graph([lambda data: (axis, data[axis+'speed_integ']*100)],
-                            colors3[2:3], [axis_name+' Rate Integral '+rate_int_limit])
-        data_plot.change_dataset(rate_groundtruth_topic_name)
-        data_plot.add_graph([lambda data: (axis+'speed',
-                                           np.rad2deg(data[rate_field_names[index]]))],
-                            [color_gray], [axis_name+' Rate Groundtruth'])
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+                                [color_gray], [axis_name+' Rate Groundtruth'])
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
+            if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+
+    if show('position'):
+        # Local position
+        for axis in ['x', 'y', 'z']:
+            data_plot = DataPlot(data, plot_config, 'vehicle_local_position',
+                                 y_axis_label='[m]', title='Local Position '+axis.upper(),
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph([axis], colors2[0:1], [axis.upper()+' Estimated'], mark_nan=True)
+            data_plot.change_dataset('vehicle_local_position_setpoint')
+            data_plot.add_graph([axis], colors2[1:2], [axis.upper()+' Setpoint'],
+                                use_change_points=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
 
 
-    # Local position
-    for axis in ['x', 'y', 'z']:
+        # Velocity
         data_plot = DataPlot(data, plot_config, 'vehicle_local_position',
-                             y_axis_label='[m]', title='Local Position '+axis.upper(),
+                             y_axis_label='[m/s]', title='Velocity',
                              plot_height='small', changed_params=changed_params,
                              x_range=x_range)
-        data_plot.add_graph([axis], colors2[0:1], [axis.upper()+' Estimated'], mark_nan=True)
+        data_plot.add_graph(['vx', 'vy', 'vz'], colors8[0:3], ['X', 'Y', 'Z'])
         data_plot.change_dataset('vehicle_local_position_setpoint')
-        data_plot.add_graph([axis], colors2[1:2], [axis.upper()+' Setpoint'],
-                            use_step_lines=True)
+        data_plot.add_graph(['vx', 'vy', 'vz'], [colors8[5], colors8[4], colors8[6]],
+                            ['X Setpoint', 'Y Setpoint', 'Z Setpoint'], use_change_points=True)
         plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
         if data_plot.finalize() is not None: plots.append(data_plot)
 
 
+        # Visual Odometry (only if topic found)
+        if data.has_topic('vehicle_visual_odometry'):
+            # Vision position
+            data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
+                                 y_axis_label='[m]', title='Visual Odometry Position',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'], mark_nan=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-    # Velocity
-    data_plot = DataPlot(data, plot_config, 'vehicle_local_position',
-                         y_axis_label='[m/s]', title='Velocity',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['vx', 'vy', 'vz'], colors8[0:3], ['X', 'Y', 'Z'])
-    data_plot.change_dataset('vehicle_local_position_setpoint')
-    data_plot.add_graph(['vx', 'vy', 'vz'], [colors8[5], colors8[4], colors8[6]],
-                        ['X Setpoint', 'Y Setpoint', 'Z Setpoint'], use_step_lines=True)
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            data_plot.change_dataset('vehicle_local_position_groundtruth')
+            data_plot.add_graph(['x', 'y', 'z'], colors8[2:5],
+                                ['Groundtruth X', 'Groundtruth Y', 'Groundtruth Z'])
 
-    if data_plot.finalize() is not None: plots.append(data_plot)
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
 
-    # Visual Odometry (only if topic found)
-    if any(elem.name == 'vehicle_visual_odometry' for elem in data):
-        # Vision position
-        data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
-                             y_axis_label='[m]', title='Visual Odometry Position',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'], mark_nan=True)
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            # Vision velocity
+            data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
+                                 y_axis_label='[m]', title='Visual Odometry Velocity',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph(['vx', 'vy', 'vz'], colors3, ['X', 'Y', 'Z'], mark_nan=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        data_plot.change_dataset('vehicle_local_position_groundtruth')
-        data_plot.add_graph(['x', 'y', 'z'], colors8[2:5],
-                            ['Groundtruth X', 'Groundtruth Y', 'Groundtruth Z'])
+            data_plot.change_dataset('vehicle_local_position_groundtruth')
+            data_plot.add_graph(['vx', 'vy', 'vz'], colors8[2:5],
+                                ['Groundtruth VX', 'Groundtruth VY', 'Groundtruth VZ'])
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
 
+            # Vision attitude
+            data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
+                                 y_axis_label='[deg]', title='Visual Odometry Attitude',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph([lambda data: ('roll', np.rad2deg(data['roll'])),
+                                 lambda data: ('pitch', np.rad2deg(data['pitch'])),
+                                 lambda data: ('yaw', np.rad2deg(data['yaw']))],
+                                colors3, ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        # Vision velocity
-        data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
-                             y_axis_label='[m]', title='Visual Odometry Velocity',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        data_plot.add_graph(['vx', 'vy', 'vz'], colors3, ['X', 'Y', 'Z'], mark_nan=True)
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            data_plot.change_dataset('vehicle_attitude_groundtruth')
+            data_plot.add_graph([lambda data: ('roll', np.rad2deg(data['roll'])),
+                                 lambda data: ('pitch', np.rad2deg(data['pitch'])),
+                                 lambda data: ('yaw', np.rad2deg(data['yaw']))],
+                                colors8[2:5],
+                                ['Roll Groundtruth', 'Pitch Groundtruth', 'Yaw Groundtruth'])
 
-        data_plot.change_dataset('vehicle_local_position_groundtruth')
-        data_plot.add_graph(['vx', 'vy', 'vz'], colors8[2:5],
-                            ['Groundtruth VX', 'Groundtruth VY', 'Groundtruth VZ'])
-        if data_plot.finalize() is not None: plots.append(data_plot)
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
+            # Vision attitude rate
+            data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
+                                 y_axis_label='[deg]', title='Visual Odometry Attitude Rate',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph([lambda data: ('rollspeed', np.rad2deg(data['rollspeed'])),
+                                 lambda data: ('pitchspeed', np.rad2deg(data['pitchspeed'])),
+                                 lambda data: ('yawspeed', np.rad2deg(data['yawspeed']))],
+                                colors3, ['Roll Rate', 'Pitch Rate', 'Yaw Rate'], mark_nan=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        # Vision attitude
-        data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
-                             y_axis_label='[deg]', title='Visual Odometry Attitude',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        data_plot.add_graph([lambda data: ('roll', np.rad2deg(data['roll'])),
-                             lambda data: ('pitch', np.rad2deg(data['pitch'])),
-                             lambda data: ('yaw', np.rad2deg(data['yaw']))],
-                            colors3, ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            data_plot.change_dataset(rate_groundtruth_topic_name)
+            data_plot.add_graph([lambda data: ('rollspeed', np.rad2deg(data[rate_field_names[0]])),
+                                 lambda data: ('pitchspeed', np.rad2deg(data[rate_field_names[1]])),
+                                 lambda data: ('yawspeed', np.rad2deg(data[rate_field_names[2]]))],
+                                colors8[2:5],
+                                ['Roll Rate Groundtruth', 'Pitch Rate Groundtruth',
+                                 'Yaw Rate Groundtruth'])
 
-        data_plot.change_dataset('vehicle_attitude_groundtruth')
-        data_plot.add_graph([lambda data: ('roll', np.rad2deg(data['roll'])),
-                             lambda data: ('pitch', np.rad2deg(data['pitch'])),
-                             lambda data: ('yaw', np.rad2deg(data['yaw']))],
-                            colors8[2:5],
-                            ['Roll Groundtruth', 'Pitch Groundtruth', 'Yaw Groundtruth'])
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
+            # Vision latency
+            data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
+                                 y_axis_label='[ms]', title='Visual Odometry Latency',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph(
+                [lambda data: ('latency', 1e-3*(data['timestamp'] - data['timestamp_sample']))],
+                colors3, ['VIO Latency'], mark_nan=True)
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        # Vision attitude rate
-        data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
-                             y_axis_label='[deg]', title='Visual Odometry Attitude Rate',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        data_plot.add_graph([lambda data: ('rollspeed', np.rad2deg(data['rollspeed'])),
-                             lambda data: ('pitchspeed', np.rad2deg(data['pitchspeed'])),
-                             lambda data: ('yawspeed', np.rad2deg(data['yawspeed']))],
-                            colors3, ['Roll Rate', 'Pitch Rate', 'Yaw Rate'], mark_nan=True)
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+            if data_plot.finalize() is not None: plots.append(data_plot)
 
-        data_plot.change_dataset(rate_groundtruth_topic_name)
-        data_plot.add_graph([lambda data: ('rollspeed', np.rad2deg(data[rate_field_names[0]])),
-                             lambda data: ('pitchspeed', np.rad2deg(data[rate_field_names[1]])),
-                             lambda data: ('yawspeed', np.rad2deg(data[rate_field_names[2]]))],
-                            colors8[2:5],
-                            ['Roll Rate Groundtruth', 'Pitch Rate Groundtruth',
-                             'Yaw Rate Groundtruth'])
+        # Airspeed vs Ground speed: but only if there's valid airspeed data or a VTOL
+        try:
+            if is_vtol or data.get_dataset('airspeed') is not None:
+                data_plot = DataPlot(data, plot_config, 'vehicle_global_position',
+                                     y_axis_label='[m/s]', title='Airspeed',
+                                     plot_height='small',
+                                     changed_params=changed_params, x_range=x_range)
+                data_plot.add_graph([lambda data: ('groundspeed_estimated',
+                                                   np.sqrt(data['vel_n']**2 + data['vel_e']**2))],
+                                    colors8[0:1], ['Ground Speed Estimated'])
+                if data.has_topic('airspeed_validated'):
+                    airspeed_validated = data.get_dataset('airspeed_validated')
+                    data_plot.change_dataset('airspeed_validated')
+                    if np.amax(airspeed_validated.data['airspeed_sensor_measurement_valid']) == 1:
+                        data_plot.add_graph(['true_airspeed_m_s'], colors8[1:2],
+                                            ['True Airspeed'])
+                    else:
+                        data_plot.add_graph(['true_ground_minus_wind_m_s'], colors8[1:2],
+                                            ['True Airspeed (estimated)'])
+                else:
+                    data_plot.change_dataset('airspeed')
+                    data_plot.add_graph(['indicated_airspeed_m_s'], colors8[1:2],
+                                        ['Indicated Airspeed'])
+                data_plot.change_dataset('vehicle_gps_position')
+                data_plot.add_graph(['vel_m_s'], colors8[2:3], ['Ground Speed (from GPS)'])
+                data_plot.change_dataset('tecs_status')
+                data_plot.add_graph(['true_airspeed_sp'], colors8[3:4], ['True Airspeed Setpoint'])
+                plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
+                if data_plot.finalize() is not None: plots.append(data_plot)
+        except (KeyError, IndexError) as error:
+            pass
 
-        # Vision latency
-        data_plot = DataPlot(data, plot_config, 'vehicle_visual_odometry',
-                             y_axis_label='[ms]', title='Visual Odometry Latency',
-                             plot_height='small', changed_params=changed_params,
-                             x_range=x_range)
-        data_plot.add_graph(
-            [lambda data: ('latency', 1e-3*(data['timestamp'] - data['timestamp_sample']))],
-            colors3, ['VIO Latency'], mark_nan=True)
+        # TECS (fixed-wing or VTOLs)
+        data_plot = DataPlot(data, plot_config, 'tecs_status', y_start=0, title='TECS',
+                             y_axis_label='[m/s]', plot_height='small',
+                             changed_params=changed_params, x_range=x_range)
+        data_plot.add_graph(['height_rate', 'height_rate_setpoint'],
+                            colors2, ['Height Rate', 'Height Rate Setpoint'],
+                            mark_nan=True)
         plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-
         if data_plot.finalize() is not None: plots.append(data_plot)
 
-    # Airspeed vs Ground speed: but only if there's valid airspeed data or a VTOL
-    try:
-        if is_vtol or ulog.get_dataset('airspeed') is not None:
-            data_plot = DataPlot(data, plot_config, 'vehicle_global_position',
-                                 y_axis_label='[m/s]', title='Airspeed',
-                                 plot_height='small',
+
+    if show('control'):
+        # manual control inputs
+        # prefer the manual_control_setpoint topic. Old logs do not contain it
+        if data.has_topic('manual_control_setpoint'):
+            data_plot = DataPlot(data, plot_config, 'manual_control_setpoint',
+                                 title='Manual Control Inputs (Radio or Joystick)',
+                                 plot_height='small', y_range=Range1d(-1.1, 1.1),
                                  changed_params=changed_params, x_range=x_range)
-            data_plot.add_graph([lambda data: ('groundspeed_estimated',
-                                               np.sqrt(data['vel_n']**2 + data['vel_e']**2))],
-                                colors8[0:1], ['Ground Speed Estimated'])
-            if any(elem.name == 'airspeed_validated' for elem in data):
-                airspeed_validated = ulog.get_dataset('airspeed_validated')
-                data_plot.change_dataset('airspeed_validated')
-                if np.amax(airspeed_validated.data['airspeed_sensor_measurement_valid']) == 1:
-                    data_plot.add_graph(['true_airspeed_m_s'], colors8[1:2],
-                                        ['True Airspeed'])
+            data_plot.add_graph(manual_control_sp_controls + ['aux1', 'aux2'], colors8[0:6],
+                                ['Y / Roll', 'X / Pitch', 'Yaw',
+                                 'Throttle ' + manual_control_sp_throttle_range, 'Aux1', 'Aux2'])
+            data_plot.change_dataset(manual_control_switches_topic)
+            data_plot.add_graph([lambda data: ('mode_slot', data['mode_slot']/6),
+                                 lambda data: ('kill_switch', data['kill_switch'] == 1)],
+                                colors8[6:8], ['Flight Mode', 'Kill Switch'],
+                                use_change_points=True)
+            # TODO: add RTL switch and others? Look at params which functions are mapped?
+            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+
+            if data_plot.finalize() is not None: plots.append(data_plot)
+
+        else: # it's an old log (COMPATIBILITY)
+            data_plot = DataPlot(data, plot_config, 'rc_channels',
+                                 title='Raw Radio Control Inputs',
+                                 plot_height='small', y_range=Range1d(-1.1, 1.1),
+                                 changed_params=changed_params, x_range=x_range)
+            num_rc_channels = 8
+            if data_plot.dataset:
+                num_rc_channels = min(np.amax(data_plot.dataset.data['channel_count']),
+                                      num_rc_channels)
+            legends = []
+            for i in range(num_rc_channels):
+                channel_names = px4_ulog.get_configured_rc_input_names(i)
+                if channel_names is None:
+                    legends.append('Channel '+str(i))
                 else:
-                    data_plot.add_graph(['true_ground_minus_wind_m_s'], colors8[1:2],
-                                        ['True Airspeed (estimated)'])
-            else:
-                data_plot.change_dataset('airspeed')
-                data_plot.add_graph(['indicated_airspeed_m_s'], colors8[1:2],
-                                    ['Indicated Airspeed'])
-            data_plot.change_dataset('vehicle_gps_position')
-            data_plot.add_graph(['vel_m_s'], colors8[2:3], ['Ground Speed (from GPS)'])
-            data_plot.change_dataset('tecs_status')
-            data_plot.add_graph(['true_airspeed_sp'], colors8[3:4], ['True Airspeed Setpoint'])
+                    legends.append('Channel '+str(i)+' ('+', '.join(channel_names)+')')
+            data_plot.add_graph(['channels['+str(i)+']' for i in range(num_rc_channels)],
+                                colors8[0:num_rc_channels], legends, mark_nan=True)
             plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
             if data_plot.finalize() is not None: plots.append(data_plot)
-    except (KeyError, IndexError) as error:
-        pass
-
-    # TECS (fixed-wing or VTOLs)
-    data_plot = DataPlot(data, plot_config, 'tecs_status', y_start=0, title='TECS',
-                         y_axis_label='[m/s]', plot_height='small',
-                         changed_params=changed_params, x_range=x_range)
-    data_plot.add_graph(['height_rate', 'height_rate_setpoint'],
-                        colors2, ['Height Rate', 'Height Rate Setpoint'],
-                        mark_nan=True)
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # manual control inputs
-    # prefer the manual_control_setpoint topic. Old logs do not contain it
-    if any(elem.name == 'manual_control_setpoint' for elem in data):
-        data_plot = DataPlot(data, plot_config, 'manual_control_setpoint',
-                             title='Manual Control Inputs (Radio or Joystick)',
-                             plot_height='small', y_range=Range1d(-1.1, 1.1),
-                             changed_params=changed_params, x_range=x_range)
-        data_plot.add_graph(manual_control_sp_controls + ['aux1', 'aux2'], colors8[0:6],
-                            ['Y / Roll', 'X / Pitch', 'Yaw',
-                             'Throttle ' + manual_control_sp_throttle_range, 'Aux1', 'Aux2'])
-        data_plot.change_dataset(manual_control_switches_topic)
-        data_plot.add_graph([lambda data: ('mode_slot', data['mode_slot']/6),
-                             lambda data: ('kill_switch', data['kill_switch'] == 1)],
-                            colors8[6:8], ['Flight Mode', 'Kill Switch'])
-        # TODO: add RTL switch and others? Look at params which functions are mapped?
-        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
 
-        if data_plot.finalize() is not None: plots.append(data_plot)
 
-    else: # it's an old log (COMPATIBILITY)
-        data_plot = DataPlot(data, plot_config, 'rc_channels',
-                             title='Raw Radio Control Inputs',
-                             plot_height='small', y_range=Range1d(-1.1, 1.1),
-                             changed_params=changed_params, x_range=x_range)
-        num_rc_channels = 8
-        if data_plot.dataset:
-            num_rc_channels = min(np.amax(data_plot.dataset.data['channel_count']), num_rc_channels)
-        legends = []
-        for i in range(num_rc_channels):
-            channel_names = px4_ulog.get_configured_rc_input_names(i)
-            if channel_names is None:
-                legends.append('Channel '+str(i))
-            else:
-                legends.append('Channel '+str(i)+' ('+', '.join(channel_names)+')')
-        data_plot.add_graph(['channels['+str(i)+']' for i in range(num_rc_channels)],
-                            colors8[0:num_rc_channels], legends, mark_nan=True)
+        # actuator controls 0
+        data_plot = DataPlot(data, plot_config, actuator_controls_0.torque_sp_topic,
+                             y_start=0, title='Actuator Controls',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(actuator_controls_0.torque_axes_field_names,
+                            colors8[0:3], ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
+        data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
+        if actuator_controls_0.thrust_z_neg is not None:
+            data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_z_neg)],
+                                colors8[3:4], ['Thrust (up)'], mark_nan=True)
+        if actuator_controls_0.thrust_x is not None:
+            data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_x)],
+                                colors8[4:5], ['Thrust (forward)'], mark_nan=True)
         plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+    if show('vibration'):
+        # actuator controls (Main) FFT (for filter & output noise analysis)
+        data_plot = DataPlotFFT(data, plot_config, actuator_controls_0.torque_sp_topic,
+                                title='Actuator Controls FFT', y_range = Range1d(0, 0.01))
+        data_plot.add_graph(actuator_controls_0.torque_axes_field_names,
+                            colors3, ['Roll', 'Pitch', 'Yaw'])
+        if not data_plot.had_error:
+            if 'MC_DTERM_CUTOFF' in ulog.initial_parameters: # COMPATIBILITY
+                data_plot.mark_frequency(
+                    ulog.initial_parameters['MC_DTERM_CUTOFF'],
+                    'MC_DTERM_CUTOFF')
+            if 'IMU_DGYRO_CUTOFF' in ulog.initial_parameters:
+                data_plot.mark_frequency(
+                    ulog.initial_parameters['IMU_DGYRO_CUTOFF'],
+                    'IMU_DGYRO_CUTOFF')
+            if 'IMU_GYRO_CUTOFF' in ulog.initial_parameters:
+                data_plot.mark_frequency(
+                    ulog.initial_parameters['IMU_GYRO_CUTOFF'],
+                    'IMU_GYRO_CUTOFF', 20)
 
         if data_plot.finalize() is not None: plots.append(data_plot)
 
 
-    # actuator controls 0
-    data_plot = DataPlot(data, plot_config, actuator_controls_0.torque_sp_topic,
-                         y_start=0, title='Actuator Controls',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(actuator_controls_0.torque_axes_field_names,
-                        colors8[0:3], ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
-    data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
-    if actuator_controls_0.thrust_z_neg is not None:
-        data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_z_neg)],
-                            colors8[3:4], ['Thrust (up)'], mark_nan=True)
-    if actuator_controls_0.thrust_x is not None:
-        data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust_x)],
-                            colors8[4:5], ['Thrust (forward)'], mark_nan=True)
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    # actuator controls (Main) FFT (for filter & output noise analysis)
-    data_plot = DataPlotFFT(data, plot_config, actuator_controls_0.torque_sp_topic,
-                            title='Actuator Controls FFT', y_range = Range1d(0, 0.01))
-    data_plot.add_graph(actuator_controls_0.torque_axes_field_names,
-                        colors3, ['Roll', 'Pitch', 'Yaw'])
-    if not data_plot.had_error:
-        if 'MC_DTERM_CUTOFF' in ulog.initial_parameters: # COMPATIBILITY
-            data_plot.mark_frequency(
-                ulog.initial_parameters['MC_DTERM_CUTOFF'],
-                'MC_DTERM_CUTOFF')
-        if 'IMU_DGYRO_CUTOFF' in ulog.initial_parameters:
-            data_plot.mark_frequency(
-                ulog.initial_parameters['IMU_DGYRO_CUTOFF'],
-                'IMU_DGYRO_CUTOFF')
-        if 'IMU_GYRO_CUTOFF' in ulog.initial_parameters:
-            data_plot.mark_frequency(
-                ulog.initial_parameters['IMU_GYRO_CUTOFF'],
-                'IMU_GYRO_CUTOFF', 20)
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # angular_velocity FFT (for filter & output noise analysis)
-    data_plot = DataPlotFFT(data, plot_config, 'vehicle_angular_velocity',
-                            title='Angular Velocity FFT', y_range = Range1d(0, 0.01))
-    data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
-                        colors3, ['Rollspeed', 'Pitchspeed', 'Yawspeed'])
-    if not data_plot.had_error:
-        if 'IMU_GYRO_CUTOFF' in ulog.initial_parameters:
-            data_plot.mark_frequency(
-                ulog.initial_parameters['IMU_GYRO_CUTOFF'],
-                'IMU_GYRO_CUTOFF', 20)
-        if 'IMU_GYRO_NF_FREQ' in ulog.initial_parameters:
-            if  ulog.initial_parameters['IMU_GYRO_NF_FREQ'] > 0:
+        # angular_velocity FFT (for filter & output noise analysis)
+        data_plot = DataPlotFFT(data, plot_config, 'vehicle_angular_velocity',
+                                title='Angular Velocity FFT', y_range = Range1d(0, 0.01))
+        data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
+                            colors3, ['Rollspeed', 'Pitchspeed', 'Yawspeed'])
+        if not data_plot.had_error:
+            if 'IMU_GYRO_CUTOFF' in ulog.initial_parameters:
                 data_plot.mark_frequency(
-                    ulog.initial_parameters['IMU_GYRO_NF_FREQ'],
-                    'IMU_GYRO_NF_FREQ', 70)
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # angular_acceleration FFT (for filter & output noise analysis)
-    data_plot = DataPlotFFT(data, plot_config, 'vehicle_angular_acceleration',
-                            title='Angular Acceleration FFT')
-    data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
-                        colors3, ['Roll accel', 'Pitch accel', 'Yaw accel'])
-    if not data_plot.had_error:
-        if 'IMU_DGYRO_CUTOFF' in ulog.initial_parameters:
-            data_plot.mark_frequency(
-                ulog.initial_parameters['IMU_DGYRO_CUTOFF'],
-                'IMU_DGYRO_CUTOFF')
-        if 'IMU_GYRO_NF_FREQ' in ulog.initial_parameters:
-            if  ulog.initial_parameters['IMU_GYRO_NF_FREQ'] > 0:
+                    ulog.initial_parameters['IMU_GYRO_CUTOFF'],
+                    'IMU_GYRO_CUTOFF', 20)
+            if 'IMU_GYRO_NF_FREQ' in ulog.initial_parameters:
+                if  ulog.initial_parameters['IMU_GYRO_NF_FREQ'] > 0:
+                    data_plot.mark_frequency(
+                        ulog.initial_parameters['IMU_GYRO_NF_FREQ'],
+                        'IMU_GYRO_NF_FREQ', 70)
+
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        # angular_acceleration FFT (for filter & output noise analysis)
+        data_plot = DataPlotFFT(data, plot_config, 'vehicle_angular_acceleration',
+                                title='Angular Acceleration FFT')
+        data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
+                            colors3, ['Roll accel', 'Pitch accel', 'Yaw accel'])
+        if not data_plot.had_error:
+            if 'IMU_DGYRO_CUTOFF' in ulog.initial_parameters:
                 data_plot.mark_frequency(
-                    ulog.initial_parameters['IMU_GYRO_NF_FREQ'],
-                    'IMU_GYRO_NF_FREQ', 70)
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    # actuator controls 1 (torque + thrust)
-    # (only present on VTOL, Fixed-wing config)
-    data_plot = DataPlot(data, plot_config, actuator_controls_1.torque_sp_topic,
-                         y_start=0, title='Actuator Controls 1 (VTOL in Fixed-Wing mode)',
-                         plot_height='small', changed_params=changed_params, topic_instance=1,
-                         x_range=x_range)
-    data_plot.add_graph(actuator_controls_1.torque_axes_field_names,
-                        colors8[0:3], ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
-    data_plot.change_dataset(actuator_controls_1.thrust_sp_topic,
-                             actuator_controls_1.topic_instance)
-    if actuator_controls_1.thrust_x is not None:
-        data_plot.add_graph([lambda data: ('thrust', actuator_controls_1.thrust_x)],
-                            colors8[3:4], ['Thrust (forward)'], mark_nan=True)
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    if dynamic_control_alloc:
-
-        # actuator motors, actuator servos
-        actuator_output_plots = [("actuator_motors", "Motor"), ("actuator_servos", "Servo")]
-        for topic_name, plot_name in actuator_output_plots:
-
-            data_plot = DataPlot(data, plot_config, topic_name,
-                                 y_range=Range1d(-1, 1), title=plot_name+' Outputs',
-                                 plot_height='small', changed_params=changed_params,
-                                 x_range=x_range)
-            num_actuator_outputs = 12
-            if data_plot.dataset:
-                for i in range(num_actuator_outputs):
-                    try:
-                        output_data = data_plot.dataset.data['control['+str(i)+']']
-                    except KeyError:
-                        num_actuator_outputs = i
-                        break
+                    ulog.initial_parameters['IMU_DGYRO_CUTOFF'],
+                    'IMU_DGYRO_CUTOFF')
+            if 'IMU_GYRO_NF_FREQ' in ulog.initial_parameters:
+                if  ulog.initial_parameters['IMU_GYRO_NF_FREQ'] > 0:
+                    data_plot.mark_frequency(
+                        ulog.initial_parameters['IMU_GYRO_NF_FREQ'],
+                        'IMU_GYRO_NF_FREQ', 70)
 
-                    if np.isnan(output_data).all():
-                        num_actuator_outputs = i
-                        break
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
-                if num_actuator_outputs > 0:
-                    data_plot.add_graph(['control['+str(i)+']'
-                                         for i in range(num_actuator_outputs)],
+    if show('control'):
+        # actuator controls 1 (torque + thrust)
+        # (only present on VTOL, Fixed-wing config)
+        data_plot = DataPlot(data, plot_config, actuator_controls_1.torque_sp_topic,
+                             y_start=0, title='Actuator Controls 1 (VTOL in Fixed-Wing mode)',
+                             plot_height='small', changed_params=changed_params, topic_instance=1,
+                             x_range=x_range)
+        data_plot.add_graph(actuator_controls_1.torque_axes_field_names,
+                            colors8[0:3], ['Roll', 'Pitch', 'Yaw'], mark_nan=True)
+        data_plot.change_dataset(actuator_controls_1.thrust_sp_topic,
+                                 actuator_controls_1.topic_instance)
+        if actuator_controls_1.thrust_x is not None:
+            data_plot.add_graph([lambda data: ('thrust', actuator_controls_1.thrust_x)],
+                                colors8[3:4], ['Thrust (forward)'], mark_nan=True)
+        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+        if dynamic_control_alloc:
+
+            # actuator motors, actuator servos
+            actuator_output_plots = [("actuator_motors", "Motor"), ("actuator_servos", "Servo")]
+            for topic_name, plot_name in actuator_output_plots:
+
+                data_plot = DataPlot(data, plot_config, topic_name,
+                                     y_range=Range1d(-1, 1), title=plot_name+' Outputs',
+                                     plot_height='small', changed_params=changed_params,
+                                     x_range=x_range)
+                num_actuator_outputs = 12
+                if data_plot.dataset:
+                    for i in range(num_actuator_outputs):
+                        try:
+                            output_data = data_plot.dataset.data['control['+str(i)+']']
+                        except KeyError:
+                            num_actuator_outputs = i
+                            break
+
+                        if np.isnan(output_data).all():
+                            num_actuator_outputs = i
+                            break
+
+                    if num_actuator_outputs > 0:
+                        data_plot.add_graph(['control['+str(i)+']'
+                                             for i in range(num_actuator_outputs)],
+                                            [colors8[i % 8] for i in range(num_actuator_outputs)],
+                                            [plot_name+' '+str(i+1)
+                                             for i in range(num_actuator_outputs)])
+                        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+                        if data_plot.finalize() is not None: plots.append(data_plot)
+
+        else:
+
+            actuator_output_plots = [(0, "Actuator Outputs (Main)"), (1, "Actuator Outputs (AUX)"),
+                                     (2, "Actuator Outputs (EXTRA)")]
+            for topic_instance, plot_name in actuator_output_plots:
+
+                data_plot = DataPlot(data, plot_config, 'actuator_outputs',
+                                     y_start=0, title=plot_name, plot_height='small',
+                                     changed_params=changed_params, topic_instance=topic_instance,
+                                     x_range=x_range)
+                num_actuator_outputs = 16
+                # only plot if at least one of the outputs is not constant
+                all_constant = True
+                if data_plot.dataset:
+                    num_actuator_outputs = min(np.amax(data_plot.dataset.data['noutputs']),
+                                               num_actuator_outputs)
+
+                    for i in range(num_actuator_outputs):
+                        output_data = data_plot.dataset.data['output['+str(i)+']']
+                        if not np.all(output_data == output_data[0]):
+                            all_constant = False
+
+                if not all_constant:
+                    data_plot.add_graph(['output['+str(i)+']' for i in range(num_actuator_outputs)],
                                         [colors8[i % 8] for i in range(num_actuator_outputs)],
-                                        [plot_name+' '+str(i+1)
-                                         for i in range(num_actuator_outputs)])
+                                        ['Output '+str(i) for i in range(num_actuator_outputs)],
+                                        mark_nan=True)
                     plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+
                     if data_plot.finalize() is not None: plots.append(data_plot)
 
-    else:
+    if show('vibration'):
+        # raw acceleration
+        data_plot = DataPlot(data, plot_config, 'sensor_combined',
+                             y_axis_label='[m/s^2]', title='Raw Acceleration',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(['accelerometer_m_s2[0]', 'accelerometer_m_s2[1]',
+                             'accelerometer_m_s2[2]'], colors3, ['X', 'Y', 'Z'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
-        actuator_output_plots = [(0, "Actuator Outputs (Main)"), (1, "Actuator Outputs (AUX)"),
-                                 (2, "Actuator Outputs (EXTRA)")]
-        for topic_instance, plot_name in actuator_output_plots:
+        # Vibration Metrics
+        data_plot = DataPlot(data, plot_config, 'vehicle_imu_status',
+                             title='Vibration Metrics',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range, y_start=0, topic_instance=0)
+        data_plot.add_graph(['accel_vibration_metric'], colors8[0:1],
+                             ['Accel 0 Vibration Level [m/s^2]'])
 
-            data_plot = DataPlot(data, plot_config, 'actuator_outputs',
-                                 y_start=0, title=plot_name, plot_height='small',
-                                 changed_params=changed_params, topic_instance=topic_instance,
-                                 x_range=x_range)
-            num_actuator_outputs = 16
-            # only plot if at least one of the outputs is not constant
-            all_constant = True
-            if data_plot.dataset:
-                num_actuator_outputs = min(np.amax(data_plot.dataset.data['noutputs']),
-                                           num_actuator_outputs)
-
-                for i in range(num_actuator_outputs):
-                    output_data = data_plot.dataset.data['output['+str(i)+']']
-                    if not np.all(output_data == output_data[0]):
-                        all_constant = False
-
-            if not all_constant:
-                data_plot.add_graph(['output['+str(i)+']' for i in range(num_actuator_outputs)],
-                                    [colors8[i % 8] for i in range(num_actuator_outputs)],
-                                    ['Output '+str(i) for i in range(num_actuator_outputs)],
-                                    mark_nan=True)
-                plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+        data_plot.change_dataset('vehicle_imu_status', 1)
+        data_plot.add_graph(['accel_vibration_metric'], colors8[1:2],
+                                ['Accel 1 Vibration Level [m/s^2]'])
+
+        data_plot.change_dataset('vehicle_imu_status', 2)
+        data_plot.add_graph(['accel_vibration_metric'], colors8[2:3],
+                                ['Accel 2 Vibration Level [m/s^2]'])
+
+        data_plot.change_dataset('vehicle_imu_status', 3)
+        data_plot.add_graph(['accel_vibration_metric'], colors8[3:4],
+                                ['Accel 3 Vibration Level [rad/s]'])
+
+        data_plot.add_horizontal_background_boxes(
+            ['green', 'orange', 'red'], [4.905, 9.81])
+
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+        # Acceleration Spectrogram
+        data_plot = DataPlotSpec(data, plot_config, 'sensor_combined',
+                                 y_axis_label='[Hz]', title='Acceleration Power Spectral Density',
+                                 plot_height='small', x_range=x_range)
+        data_plot.add_graph(['accelerometer_m_s2[0]', 'accelerometer_m_s2[1]',
+                             'accelerometer_m_s2[2]'],
+                            ['X', 'Y', 'Z'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        # Filtered Gyro (angular velocity) Spectrogram
+        data_plot = DataPlotSpec(data, plot_config, 'vehicle_angular_velocity',
+                                 y_axis_label='[Hz]',
+                                 title='Angular velocity Power Spectral Density',
+                                 plot_height='small', x_range=x_range)
+        data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
+                            ['rollspeed', 'pitchspeed', 'yawspeed'])
+
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        # Filtered angular acceleration Spectrogram
+        data_plot = DataPlotSpec(data, plot_config, 'vehicle_angular_acceleration',
+                                 y_axis_label='[Hz]',
+                                 title='Angular acceleration Power Spectral Density',
+                                 plot_height='small', x_range=x_range)
+        data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
+                            ['roll accel', 'pitch accel', 'yaw accel'])
+
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        # raw angular speed
+        data_plot = DataPlot(data, plot_config, 'sensor_combined',
+                             y_axis_label='[deg/s]', title='Raw Angular Speed (Gyroscope)',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph([
+            lambda data: ('gyro_rad[0]', np.rad2deg(data['gyro_rad[0]'])),
+            lambda data: ('gyro_rad[1]', np.rad2deg(data['gyro_rad[1]'])),
+            lambda data: ('gyro_rad[2]', np.rad2deg(data['gyro_rad[2]']))],
+                            colors3, ['X', 'Y', 'Z'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
+        # expand the FIFO topics of all IMU instances (concurrently)
+        fifo_topics = add_virtual_fifo_topics(
+            ulog, [(topic_name, instance)
+                   for topic_name in ['sensor_accel_fifo', 'sensor_gyro_fifo']
+                   for instance in range(3)])
+
+        # FIFO accel
+        for instance in range(3):
+            if ('sensor_accel_fifo', instance) in fifo_topics:
+                # Raw data
+                data_plot = DataPlot(data, plot_config, 'sensor_accel_fifo_virtual',
+                                     y_axis_label='[m/s^2]',
+                                     title=f'Raw Acceleration (FIFO, IMU{instance})',
+                                     plot_height='small', changed_params=changed_params,
+                                     x_range=x_range, topic_instance=instance)
+                data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'])
                 if data_plot.finalize() is not None: plots.append(data_plot)
 
-    # raw acceleration
-    data_plot = DataPlot(data, plot_config, 'sensor_combined',
-                         y_axis_label='[m/s^2]', title='Raw Acceleration',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['accelerometer_m_s2[0]', 'accelerometer_m_s2[1]',
-                         'accelerometer_m_s2[2]'], colors3, ['X', 'Y', 'Z'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    # Vibration Metrics
-    data_plot = DataPlot(data, plot_config, 'vehicle_imu_status',
-                         title='Vibration Metrics',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range, y_start=0, topic_instance=0)
-    data_plot.add_graph(['accel_vibration_metric'], colors8[0:1],
-                         ['Accel 0 Vibration Level [m/s^2]'])
-
-    data_plot.change_dataset('vehicle_imu_status', 1)
-    data_plot.add_graph(['accel_vibration_metric'], colors8[1:2],
-                            ['Accel 1 Vibration Level [m/s^2]'])
-
-    data_plot.change_dataset('vehicle_imu_status', 2)
-    data_plot.add_graph(['accel_vibration_metric'], colors8[2:3],
-                            ['Accel 2 Vibration Level [m/s^2]'])
-
-    data_plot.change_dataset('vehicle_imu_status', 3)
-    data_plot.add_graph(['accel_vibration_metric'], colors8[3:4],
-                            ['Accel 3 Vibration Level [rad/s]'])
-
-    data_plot.add_horizontal_background_boxes(
-        ['green', 'orange', 'red'], [4.905, 9.81])
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    # Acceleration Spectrogram
-    data_plot = DataPlotSpec(data, plot_config, 'sensor_combined',
-                             y_axis_label='[Hz]', title='Acceleration Power Spectral Density',
-                             plot_height='small', x_range=x_range)
-    data_plot.add_graph(['accelerometer_m_s2[0]', 'accelerometer_m_s2[1]', 'accelerometer_m_s2[2]'],
-                        ['X', 'Y', 'Z'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # Filtered Gyro (angular velocity) Spectrogram
-    data_plot = DataPlotSpec(data, plot_config, 'vehicle_angular_velocity',
-                             y_axis_label='[Hz]', title='Angular velocity Power Spectral Density',
-                             plot_height='small', x_range=x_range)
-    data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
-                        ['rollspeed', 'pitchspeed', 'yawspeed'])
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # Filtered angular acceleration Spectrogram
-    data_plot = DataPlotSpec(data, plot_config, 'vehicle_angular_acceleration',
-                             y_axis_label='[Hz]',
-                             title='Angular acceleration Power Spectral Density',
-                             plot_height='small', x_range=x_range)
-    data_plot.add_graph(['xyz[0]', 'xyz[1]', 'xyz[2]'],
-                        ['roll accel', 'pitch accel', 'yaw accel'])
-
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # raw angular speed
-    data_plot = DataPlot(data, plot_config, 'sensor_combined',
-                         y_axis_label='[deg/s]', title='Raw Angular Speed (Gyroscope)',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph([
-        lambda data: ('gyro_rad[0]', np.rad2deg(data['gyro_rad[0]'])),
-        lambda data: ('gyro_rad[1]', np.rad2deg(data['gyro_rad[1]'])),
-        lambda data: ('gyro_rad[2]', np.rad2deg(data['gyro_rad[2]']))],
-                        colors3, ['X', 'Y', 'Z'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-    # FIFO accel
-    for instance in range(3):
-        if add_virtual_fifo_topic_data(ulog, 'sensor_accel_fifo', instance):
-            # Raw data
-            data_plot = DataPlot(data, plot_config, 'sensor_accel_fifo_virtual',
-                                 y_axis_label='[m/s^2]',
-                                 title=f'Raw Acceleration (FIFO, IMU{instance})',
-                                 plot_height='small', changed_params=changed_params,
-                                 x_range=x_range, topic_instance=instance)
-            data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'])
-            if data_plot.finalize() is not None: plots.append(data_plot)
+                # power spectral density
+                data_plot = DataPlotSpec(data, plot_config, 'sensor_accel_fifo_virtual',
+                                         y_axis_label='[Hz]',
+                                         title=(f'Acceleration Power Spectral Density'
+                                                f'(FIFO, IMU{instance})'),
+                                         plot_height='normal', x_range=x_range,
+                                         topic_instance=instance)
+                data_plot.add_graph(['x', 'y', 'z'], ['X', 'Y', 'Z'])
+                if data_plot.finalize() is not None: plots.append(data_plot)
 
-            # power spectral density
-            data_plot = DataPlotSpec(data, plot_config, 'sensor_accel_fifo_virtual',
-                                     y_axis_label='[Hz]',
-                                     title=(f'Acceleration Power Spectral Density'
-                                            f'(FIFO, IMU{instance})'),
-                                     plot_height='normal', x_range=x_range, topic_instance=instance)
-            data_plot.add_graph(['x', 'y', 'z'], ['X', 'Y', 'Z'])
-            if data_plot.finalize() is not None: plots.append(data_plot)
+                # sampling regularity
+                data_plot = DataPlot(data, plot_config, 'sensor_accel_fifo',
+                                     y_range=Range1d(0, 25e3), y_axis_label='[us]',
+                                     title=('Sampling Regularity of Sensor Data'
+                                            f' (FIFO, IMU{instance})'),
+                                     plot_height='small',
+                                     changed_params=changed_params,
+                                     x_range=x_range, topic_instance=instance)
+                sensor_accel_fifo = data.get_dataset('sensor_accel_fifo').data
+                sampling_diff = np.diff(sensor_accel_fifo['timestamp'])
+                min_sampling_diff = np.amin(sampling_diff)
+                plot_dropouts(data_plot.bokeh_plot, ulog.dropouts, min_sampling_diff)
+                data_plot.add_graph([lambda data: ('timediff', np.append(sampling_diff, 0))],
+                                    [colors3[2]], ['delta t (between 2 logged samples)'])
+                if data_plot.finalize() is not None: plots.append(data_plot)
 
-            # sampling regularity
-            data_plot = DataPlot(data, plot_config, 'sensor_accel_fifo', y_range=Range1d(0, 25e3),
-                                 y_axis_label='[us]',
-                                 title=f'Sampling Regularity of Sensor Data (FIFO, IMU{instance})',
-                                 plot_height='small',
-                                 changed_params=changed_params,
-                                 x_range=x_range, topic_instance=instance)
-            sensor_accel_fifo = ulog.get_dataset('sensor_accel_fifo').data
-            sampling_diff = np.diff(sensor_accel_fifo['timestamp'])
-            min_sampling_diff = np.amin(sampling_diff)
-            plot_dropouts(data_plot.bokeh_plot, ulog.dropouts, min_sampling_diff)
-            data_plot.add_graph([lambda data: ('timediff', np.append(sampling_diff, 0))],
-                                [colors3[2]], ['delta t (between 2 logged samples)'])
-            if data_plot.finalize() is not None: plots.append(data_plot)
+        # FIFO gyro
+        for instance in range(3):
+            if ('sensor_gyro_fifo', instance) in fifo_topics:
+                # Raw data
+                data_plot = DataPlot(data, plot_config, 'sensor_gyro_fifo_virtual',
+                                     y_axis_label='[deg/s]',
+                                     title=f'Raw Gyro (FIFO, IMU{instance})',
+                                     plot_height='small', changed_params=changed_params,
+                                     x_range=x_range, topic_instance=instance)
+                data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'])
+                data_plot.add_graph([
+                    lambda data: ('x', np.rad2deg(data['x'])),
+                    lambda data: ('y', np.rad2deg(data['y'])),
+                    lambda data: ('z', np.rad2deg(data['z']))],
+                                    colors3, ['X', 'Y', 'Z'])
+                if data_plot.finalize() is not None: plots.append(data_plot)
 
-    # FIFO gyro
-    for instance in range(3):
-        if add_virtual_fifo_topic_data(ulog, 'sensor_gyro_fifo', instance):
-            # Raw data
-            data_plot = DataPlot(data, plot_config, 'sensor_gyro_fifo_virtual',
-                                 y_axis_label='[deg/s]', title=f'Raw Gyro (FIFO, IMU{instance})',
-                                 plot_height='small', changed_params=changed_params,
-                                 x_range=x_range, topic_instance=instance)
-            data_plot.add_graph(['x', 'y', 'z'], colors3, ['X', 'Y', 'Z'])
-            data_plot.add_graph([
-                lambda data: ('x', np.rad2deg(data['x'])),
-                lambda data: ('y', np.rad2deg(data['y'])),
-                lambda data: ('z', np.rad2deg(data['z']))],
-                                colors3, ['X', 'Y', 'Z'])
-            if data_plot.finalize() is not None: plots.append(data_plot)
+                # power spectral density
+                data_plot = DataPlotSpec(data, plot_config, 'sensor_gyro_fifo_virtual',
+                                         y_axis_label='[Hz]',
+                                         title=f'Gyro Power Spectral Density (FIFO, IMU{instance})',
+                                         plot_height='normal', x_range=x_range,
+                                         topic_instance=instance)
+                data_plot.add_graph(['x', 'y', 'z'], ['X', 'Y', 'Z'])
+                if data_plot.finalize() is not None: plots.append(data_plot)
 
-            # power spectral density
-            data_plot = DataPlotSpec(data, plot_config, 'sensor_gyro_fifo_virtual',
-                                     y_axis_label='[Hz]',
-                                     title=f'Gyro Power Spectral Density (FIFO, IMU{instance})',
-                                     plot_height='normal', x_range=x_range, topic_instance=instance)
-            data_plot.add_graph(['x', 'y', 'z'], ['X', 'Y', 'Z'])
-            if data_plot.finalize() is not None: plots.append(data_plot)
 
+    if show('sensors'):
+        # magnetic field strength
+        data_plot = DataPlot(data, plot_config, magnetometer_ga_topic,
+                             y_axis_label='[gauss]', title='Raw Magnetic Field Strength',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(['magnetometer_ga[0]', 'magnetometer_ga[1]',
+                             'magnetometer_ga[2]'], colors3,
+                            ['X', 'Y', 'Z'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
-    # magnetic field strength
-    data_plot = DataPlot(data, plot_config, magnetometer_ga_topic,
-                         y_axis_label='[gauss]', title='Raw Magnetic Field Strength',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['magnetometer_ga[0]', 'magnetometer_ga[1]',
-                         'magnetometer_ga[2]'], colors3,
-                        ['X', 'Y', 'Z'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # distance sensor
-    data_plot = DataPlot(data, plot_config, 'distance_sensor',
-                         y_start=0, y_axis_label='[m]', title='Distance Sensor',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['current_distance', 'variance'], colors3[0:2],
-                        ['Distance', 'Variance'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-
-    # gps uncertainty
-    # the accuracy values can be really large if there is no fix, so we limit the
-    # y axis range to some sane values
-    data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
-                         title='GPS Uncertainty', y_range=Range1d(0, 40),
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['eph', 'epv', 'satellites_used', 'fix_type'], colors8[::2],
-                        ['Horizontal position accuracy [m]', 'Vertical position accuracy [m]',
-                         'Num Satellites used', 'GPS Fix'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # gps noise & jamming
-    data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
-                         y_start=0, title='GPS Noise & Jamming',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['noise_per_ms', 'jamming_indicator'], colors3[0:2],
-                        ['Noise per ms', 'Jamming Indicator'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # thrust and magnetic field
-    data_plot = DataPlot(data, plot_config, magnetometer_ga_topic,
-                         y_start=0, title='Thrust and Magnetic Field', plot_height='small',
-                         changed_params=changed_params, x_range=x_range)
-    data_plot.add_graph(
-        [lambda data: ('len_mag', np.sqrt(data['magnetometer_ga[0]']**2 +
-                                          data['magnetometer_ga[1]']**2 +
-                                          data['magnetometer_ga[2]']**2))],
-        colors3[0:1], ['Norm of Magnetic Field'])
-    data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
-    if actuator_controls_0.thrust is not None:
-        data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust)],
-                            colors3[1:2], ['Thrust'])
-    if is_vtol and not dynamic_control_alloc:
-        data_plot.change_dataset(actuator_controls_1.thrust_sp_topic)
-        if actuator_controls_1.thrust_x is not None:
-            data_plot.add_graph([lambda data: ('thrust', actuator_controls_1.thrust_x)],
-                                colors3[2:3], ['Thrust (Fixed-wing'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-
-    # power
-    data_plot = DataPlot(data, plot_config, 'battery_status',
-                         y_start=0, title='Power',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['voltage_v', 'voltage_filtered_v',
-                         'current_a', lambda data: ('discharged_mah', data['discharged_mah']/100),
-                         lambda data: ('remaining', data['remaining']*10)],
-                        colors8[::2]+colors8[1:2],
-                        ['Battery Voltage [V]', 'Battery Voltage filtered [V]',
-                         'Battery Current [A]', 'Discharged Amount [mAh / 100]',
-                         'Battery remaining [0=empty, 10=full]'])
-    data_plot.change_dataset('system_power')
-    if data_plot.dataset:
-        if 'voltage5v_v' in data_plot.dataset.data and \
-                        np.amax(data_plot.dataset.data['voltage5v_v']) > 0.0001:
-            data_plot.add_graph(['voltage5v_v'], colors8[7:8], ['5 V'])
-        if 'sensors3v3[0]' in data_plot.dataset.data and \
-                        np.amax(data_plot.dataset.data['sensors3v3[0]']) > 0.0001:
-            data_plot.add_graph(['sensors3v3[0]'], colors8[5:6], ['3.3 V'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    #Temperature
-    data_plot = DataPlot(data, plot_config, 'sensor_baro',
-                         y_start=0, y_axis_label='[C]', title='Temperature',
-                         plot_height='small', changed_params=changed_params,
-                         x_range=x_range)
-    data_plot.add_graph(['temperature'], colors8[0:1],
-                        ['Baro temperature'])
-    data_plot.change_dataset('sensor_accel')
-    data_plot.add_graph(['temperature'], colors8[2:3],
-                        ['Accel temperature'])
-    data_plot.change_dataset('airspeed')
-    data_plot.add_graph(['air_temperature_celsius'], colors8[4:5],
-                        ['Airspeed temperature'])
-    data_plot.change_dataset('battery_status')
-    data_plot.add_graph(['temperature'], colors8[6:7],
-                        ['Battery temperature'])
-    if data_plot.finalize() is not None: plots.append(data_plot)
-
-
-    # estimator flags
-    try:
-        data_plot = DataPlot(data, plot_config, 'estimator_status',
-                             y_start=0, title='Estimator Flags',
+
+        # distance sensor
+        data_plot = DataPlot(data, plot_config, 'distance_sensor',
+                             y_start=0, y_axis_label='[m]', title='Distance Sensor',
                              plot_height='small', changed_params=changed_params,
                              x_range=x_range)
-        estimator_status = ulog.get_dataset('estimator_status').data
-        plot_data = []
-        plot_labels = []
-        input_data = [
-            ('Health Flags (vel, pos, hgt)', estimator_status['health_flags']),
-            ('Timeout Flags (vel, pos, hgt)', estimator_status['timeout_flags']),
-            ('Velocity Check Bit', (estimator_status['innovation_check_flags'])&0x1),
-            ('Horizontal Position Check Bit', (estimator_status['innovation_check_flags']>>1)&1),
-            ('Vertical Position Check Bit', (estimator_status['innovation_check_flags']>>2)&1),
-            ('Mag X, Y, Z Check Bits', (estimator_status['innovation_check_flags']>>3)&0x7),
-            ('Yaw Check Bit', (estimator_status['innovation_check_flags']>>6)&1),
-            ('Airspeed Check Bit', (estimator_status['innovation_check_flags']>>7)&1),
-            ('Synthetic Sideslip Check Bit', (estimator_status['innovation_check_flags']>>8)&1),
-            ('Height to Ground Check Bit', (estimator_status['innovation_check_flags']>>9)&1),
-            ('Optical Flow X, Y Check Bits', (estimator_status['innovation_check_flags']>>10)&0x3),
-            ]
-        # filter: show only the flags that have non-zero samples
-        for cur_label, cur_data in input_data:
-            if np.amax(cur_data) > 0.1:
-                data_label = 'flags_'+str(len(plot_data)) # just some unique string
-                plot_data.append(lambda d, data=cur_data, label=data_label: (label, data))
-                plot_labels.append(cur_label)
-                if len(plot_data) >= 8: # cannot add more than that
-                    break
-
-        if len(plot_data) == 0:
-            # add the plot even in the absence of any problem, so that the user
-            # can validate that (otherwise it's ambiguous: it could be that the
-            # estimator_status topic is not logged)
-            plot_data = [lambda d: ('flags', input_data[0][1])]
-            plot_labels = [input_data[0][0]]
-        data_plot.add_graph(plot_data, colors8[0:len(plot_data)], plot_labels)
+        data_plot.add_graph(['current_distance', 'variance'], colors3[0:2],
+                            ['Distance', 'Variance'])
         if data_plot.finalize() is not None: plots.append(data_plot)
-    except (KeyError, IndexError) as error:
-        print('Error in estimator plot: '+str(error))
 
 
-    # Failsafe flags
-    try:
-        data_plot = DataPlot(data, plot_config, 'vehicle_status',
-                             y_start=0, title='Failsafe Flags',
-                             plot_height='normal', changed_params=changed_params,
+
+        # gps uncertainty
+        # the accuracy values can be really large if there is no fix, so we limit the
+        # y axis range to some sane values
+        data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
+                             title='GPS Uncertainty', y_range=Range1d(0, 40),
+                             plot_height='small', changed_params=changed_params,
                              x_range=x_range)
-        data_plot.add_graph(['failsafe', 'failsafe_and_user_took_over'], [colors8[0], colors8[1]],
-                            ['In Failsafe', 'User Took Over'])
-        num_graphs = 2
-        skip_if_always_set = ['auto_mission_missing', 'offboard_control_signal_lost']
-
-        data_plot.change_dataset('failsafe_flags')
-        if data_plot.dataset is not None:
-            failsafe_flags = data_plot.dataset.data
-            for failsafe_field in failsafe_flags:
-                if failsafe_field == 'timestamp' or failsafe_field.startswith('mode_req_'):
-                    continue
-                cur_data = failsafe_flags[failsafe_field]
-                # filter: show only the flags that are set at some point
-                if np.amax(cur_data) >= 1:
-                    if failsafe_field in skip_if_always_set and np.amin(cur_data) >= 1:
-                        continue
-                    data_plot.add_graph([failsafe_field], [colors8[num_graphs % 8]],
-                                        [failsafe_field.replace('_', ' ')])
-                    num_graphs += 1
-            plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-            if data_plot.finalize() is not None: plots.append(data_plot)
-    except (KeyError, IndexError) as error:
-        print('Error in failsafe plot: '+str(error))
+        data_plot.add_graph(['eph', 'epv', 'satellites_used', 'fix_type'], colors8[::2],
+                            ['Horizontal position accuracy [m]', 'Vertical position accuracy [m]',
+                             'Num Satellites used', 'GPS Fix'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
 
-    # cpu load
-    data_plot = DataPlot(data, plot_config, 'cpuload',
-                         title='CPU & RAM', plot_height='small', y_range=Range1d(0, 1),
-                         changed_params=changed_params, x_range=x_range)
-    data_plot.add_graph(['ram_usage', 'load'], [colors3[1], colors3[2]],
-                        ['RAM Usage', 'CPU Load'])
-    data_plot.add_span('load', line_color=colors3[2])
-    data_plot.add_span('ram_usage', line_color=colors3[1])
-    plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
-    if data_plot.finalize() is not None: plots.append(data_plot)
+        # gps noise & jamming
+        data_plot = DataPlot(data, plot_config, 'vehicle_gps_position',
+                             y_start=0, title='GPS Noise & Jamming',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(['noise_per_ms', 'jamming_indicator'], colors3[0:2],
+                            ['Noise per ms', 'Jamming Indicator'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
 
-    # sampling: time difference
-    try:
-        data_plot = DataPlot(data, plot_config, 'sensor_combined', y_range=Range1d(0, 25e3),
-                             y_axis_label='[us]',
-                             title='Sampling Regularity of Sensor Data', plot_height='small',
+        # thrust and magnetic field
+        data_plot = DataPlot(data, plot_config, magnetometer_ga_topic,
+                             y_start=0, title='Thrust and Magnetic Field', plot_height='small',
                              changed_params=changed_params, x_range=x_range)
-        sensor_combined = ulog.get_dataset('sensor_combined').data
-        sampling_diff = np.diff(sensor_combined['timestamp'])
-        min_sampling_diff = np.amin(sampling_diff)
+        data_plot.add_graph(
+            [lambda data: ('len_mag', np.sqrt(data['magnetometer_ga[0]']**2 +
+                                              data['magnetometer_ga[1]']**2 +
+                                              data['magnetometer_ga[2]']**2))],
+            colors3[0:1], ['Norm of Magnetic Field'])
+        data_plot.change_dataset(actuator_controls_0.thrust_sp_topic)
+        if actuator_controls_0.thrust is not None:
+            data_plot.add_graph([lambda data: ('thrust', actuator_controls_0.thrust)],
+                                colors3[1:2], ['Thrust'])
+        if is_vtol and not dynamic_control_alloc:
+            data_plot.change_dataset(actuator_controls_1.thrust_sp_topic)
+            if actuator_controls_1.thrust_x is not None:
+                data_plot.add_graph([lambda data: ('thrust', actuator_controls_1.thrust_x)],
+                                    colors3[2:3], ['Thrust (Fixed-wing'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
 
-        plot_dropouts(data_plot.bokeh_plot, ulog.dropouts, min_sampling_diff)
 
-        data_plot.add_graph([lambda data: ('timediff', np.append(sampling_diff, 0))],
-                            [colors3[2]], ['delta t (between 2 logged samples)'])
-        data_plot.change_dataset('estimator_status')
-        data_plot.add_graph([lambda data: ('time_slip', data['time_slip']*1e6)],
-                            [colors3[1]], ['Estimator time slip (cumulative)'])
+
+    if show('power'):
+        # power
+        data_plot = DataPlot(data, plot_config, 'battery_status',
+                             y_start=0, title='Power',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(['voltage_v', 'voltage_filtered_v',
+                             'current_a',
+                             lambda data: ('discharged_mah', data['discharged_mah']/100),
+                             lambda data: ('remaining', data['remaining']*10)],
+                            colors8[::2]+colors8[1:2],
+                            ['Battery Voltage [V]', 'Battery Voltage filtered [V]',
+                             'Battery Current [A]', 'Discharged Amount [mAh / 100]',
+                             'Battery remaining [0=empty, 10=full]'])
+        data_plot.change_dataset('system_power')
+        if data_plot.dataset:
+            if 'voltage5v_v' in data_plot.dataset.data and \
+                            np.amax(data_plot.dataset.data['voltage5v_v']) > 0.0001:
+                data_plot.add_graph(['voltage5v_v'], colors8[7:8], ['5 V'])
+            if 'sensors3v3[0]' in data_plot.dataset.data and \
+                            np.amax(data_plot.dataset.data['sensors3v3[0]']) > 0.0001:
+                data_plot.add_graph(['sensors3v3[0]'], colors8[5:6], ['3.3 V'])
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        #Temperature
+        data_plot = DataPlot(data, plot_config, 'sensor_baro',
+                             y_start=0, y_axis_label='[C]', title='Temperature',
+                             plot_height='small', changed_params=changed_params,
+                             x_range=x_range)
+        data_plot.add_graph(['temperature'], colors8[0:1],
+                            ['Baro temperature'])
+        data_plot.change_dataset('sensor_accel')
+        data_plot.add_graph(['temperature'], colors8[2:3],
+                            ['Accel temperature'])
+        data_plot.change_dataset('airspeed')
+        data_plot.add_graph(['air_temperature_celsius'], colors8[4:5],
+                            ['Airspeed temperature'])
+        data_plot.change_dataset('battery_status')
+        data_plot.add_graph(['temperature'], colors8[6:7],
+                            ['Battery temperature'])
         if data_plot.finalize() is not None: plots.append(data_plot)
-    except:
-        pass
 
 
+    if show('estimator'):
+        # estimator flags
+        try:
+            data_plot = DataPlot(data, plot_config, 'estimator_status',
+                                 y_start=0, title='Estimator Flags',
+                                 plot_height='small', changed_params=changed_params,
+                                 x_range=x_range)
+            estimator_status = data.get_dataset('estimator_status').data
+            plot_data = []
+            plot_labels = []
+            input_data = [
+                ('Health Flags (vel, pos, hgt)', estimator_status['health_flags']),
+                ('Timeout Flags (vel, pos, hgt)', estimator_status['timeout_flags']),
+                ('Velocity Check Bit', (estimator_status['innovation_check_flags'])&0x1),
+                ('Horizontal Position Check Bit',
+                 (estimator_status['innovation_check_flags']>>1)&1),
+                ('Vertical Position Check Bit', (estimator_status['innovation_check_flags']>>2)&1),
+                ('Mag X, Y, Z Check Bits', (estimator_status['innovation_check_flags']>>3)&0x7),
+                ('Yaw Check Bit', (estimator_status['innovation_check_flags']>>6)&1),
+                ('Airspeed Check Bit', (estimator_status['innovation_check_flags']>>7)&1),
+                ('Synthetic Sideslip Check Bit', (estimator_status['innovation_check_flags']>>8)&1),
+                ('Height to Ground Check Bit', (estimator_status['innovation_check_flags']>>9)&1),
+                ('Optical Flow X, Y Check Bits',
+                 (estimator_status['innovation_check_flags']>>10)&0x3),
+                ]
+            # filter: show only the flags that have non-zero samples
+            for cur_label, cur_data in input_data:
+                if np.amax(cur_data) > 0.1:
+                    data_label = 'flags_'+str(len(plot_data)) # just some unique string
+                    plot_data.append(lambda d, data=cur_data, label=data_label: (label, data))
+                    plot_labels.append(cur_label)
+                    if len(plot_data) >= 8: # cannot add more than that
+                        break
+
+            if len(plot_data) == 0:
+                # add the plot even in the absence of any problem, so that the user
+                # can validate that (otherwise it's ambiguous: it could be that the
+                # estimator_status topic is not logged)
+                plot_data = [lambda d: ('flags', input_data[0][1])]
+                plot_labels = [input_data[0][0]]
+            data_plot.add_graph(plot_data, colors8[0:len(plot_data)], plot_labels,
+                                use_change_points=True)
+            if data_plot.finalize() is not None: plots.append(data_plot)
+        except (KeyError, IndexError) as error:
+            print('Error in estimator plot: '+str(error))
+
+
+    if show('system'):
+        # Failsafe flags
+        try:
+            data_plot = DataPlot(data, plot_config, 'vehicle_status',
+                                 y_start=0, title='Failsafe Flags',
+                                 plot_height='normal', changed_params=changed_params,
+                                 x_range=x_range)
+            data_plot.add_graph(['failsafe', 'failsafe_and_user_took_over'],
+                                [colors8[0], colors8[1]],
+                                ['In Failsafe', 'User Took Over'], use_change_points=True)
+            num_graphs = 2
+            skip_if_always_set = ['auto_mission_missing', 'offboard_control_signal_lost']
+
+            data_plot.change_dataset('failsafe_flags')
+            if data_plot.dataset is not None:
+                failsafe_flags = data_plot.dataset.data
+                for failsafe_field in failsafe_flags:
+                    if failsafe_field == 'timestamp' or failsafe_field.startswith('mode_req_'):
+                        continue
+                    cur_data = failsafe_flags[failsafe_field]
+                    # filter: show only the flags that are set at some point
+                    if np.amax(cur_data) >= 1:
+                        if failsafe_field in skip_if_always_set and np.amin(cur_data) >= 1:
+                            continue
+                        data_plot.add_graph([failsafe_field], [colors8[num_graphs % 8]],
+                                            [failsafe_field.replace('_', ' ')],
+                                            use_change_points=True)
+                        num_graphs += 1
+                plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+                if data_plot.finalize() is not None: plots.append(data_plot)
+        except (KeyError, IndexError) as error:
+            print('Error in failsafe plot: '+str(error))
+
+
+        # cpu load
+        data_plot = DataPlot(data, plot_config, 'cpuload',
+                             title='CPU & RAM', plot_height='small', y_range=Range1d(0, 1),
+                             changed_params=changed_params, x_range=x_range)
+        data_plot.add_graph(['ram_usage', 'load'], [colors3[1], colors3[2]],
+                            ['RAM Usage', 'CPU Load'])
+        data_plot.add_span('load', line_color=colors3[2])
+        data_plot.add_span('ram_usage', line_color=colors3[1])
+        plot_flight_modes_background(data_plot, flight_mode_changes, vtol_states)
+        if data_plot.finalize() is not None: plots.append(data_plot)
+
+
+        # sampling: time difference
+        try:
+            data_plot = DataPlot(data, plot_config, 'sensor_combined', y_range=Range1d(0, 25e3),
+                                 y_axis_label='[us]',
+                                 title='Sampling Regularity of Sensor Data', plot_height='small',
+                                 changed_params=changed_params, x_range=x_range)
+            sensor_combined = data.get_dataset('sensor_combined').data
+            sampling_diff = np.diff(sensor_combined['timestamp'])
+            min_sampling_diff = np.amin(sampling_diff)
+
+            plot_dropouts(data_plot.bokeh_plot, ulog.dropouts, min_sampling_diff)
+
+            data_plot.add_graph([lambda data: ('timediff', np.append(sampling_diff, 0))],
+                                [colors3[2]], ['delta t (between 2 logged samples)'])
+            data_plot.change_dataset('estimator_status')
+            data_plot.add_graph([lambda data: ('time_slip', data['time_slip']*1e6)],
+                                [colors3[1]], ['Estimator time slip (cumulative)'])
+            if data_plot.finalize() is not None: plots.append(data_plot)
+        except:
+            pass
+
+
+
+    # add the results of the plot computations (spectrograms and FFTs), which
+    # run concurrently in the compute threads. Plots without results are removed.
+    plots = [plot for plot in plots
+             if not isinstance(plot, DataPlot) or plot.complete_computations()]
 
     # exchange all DataPlot's with the bokeh_plot and handle parameter changes
 
     param_changes_button = Button(label="Hide Parameter Changes", width=170)
     param_change_labels = []
-    # FIXME: this should be a CustomJS callback, not on the server. However this
-    # did not work for me.
-    def param_changes_button_clicked():
-        """ callback to show/hide parameter changes """
-        for label in param_change_labels:
-            if label.visible:
-                param_changes_button.label = 'Show Parameter Changes'
-                label.visible = False
-                label.text_alpha = 0 # label.visible does not work, so we use this instead
-            else:
-                param_changes_button.label = 'Hide Parameter Changes'
-                label.visible = True
-                label.text_alpha = 1
-    param_changes_button.on_click(param_changes_button_clicked)
-
 
     user_agent = curdoc().session_context.request.headers.get("User-Agent", "")
-    is_mobile = re.search(r'Mobile|iP(hone|od|ad)|Android|BlackBerry|'
-            r'IEMobile|Kindle|NetFront|Silk-Accelerated|(hpw|web)OS|Fennec|'
-            r'Minimo|Opera M(obi|ini)|Blazer|Dolfin|'
-            r'Dolphin|Skyfire|Zune', user_agent)
+    is_mobile = is_mobile_user_agent(user_agent)
 
     jinja_plot_data = []
     for i in range(len(plots)):
@@ -1033,11 +1134,16 @@ def generate_plots(ulog, px4_ulog, db_data, vehicle_data, link_to_3d_page,
                 'fragment': fragment,
                 'title': plot_title
                 })
-        if is_mobile is not None and hasattr(plots[i], 'toolbar'):
+        if is_mobile and hasattr(plots[i], 'toolbar'):
             # Disable panning on mobile by default
             plots[i].toolbar.active_drag = None
 
 
+    setup_param_changes_button(param_changes_button, param_change_labels)
+    add_restore_callback(curdoc(), restore_param_changes_button, {
+        'button': param_changes_button.id,
+        'labels': [label.id for label in param_change_labels]})
+
     # changed parameters
     plots.append(get_changed_parameters(ulog, plot_width))
 
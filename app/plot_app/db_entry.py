@@ -5,7 +5,7 @@ from html import escape
 from pyulog import *
 from pyulog.px4 import *
 
-from helper import get_log_filename, load_ulog_file
+from helper import get_log_filename, load_ulog_file_metadata
 
 #pylint: disable=missing-docstring, too-few-public-methods
 
@@ -58,6 +58,11 @@ class DBData:
 class DBDataGenerated:
     """ information from the generated DB entry """
 
+    # LogsGenerated table columns, in the order of to_db_row()
+    db_columns = ['Id', 'Duration', 'Mavtype', 'Estimator', 'AutostartId', 'Hardware',
+                  'Software', 'NumLoggedErrors', 'NumLoggedWarnings', 'FlightModes',
+                  'SoftwareVersion', 'UUID', 'FlightModeDurations', 'StartTime']
+
     def __init__(self):
         self.start_time_utc = 0
         self.duration_s = 0
@@ -82,11 +87,12 @@ class DBDataGenerated:
 
     @classmethod
     def from_log_file(cls, log_id):
-        """ initialize from a log file """
+        """ initialize from a log file (only vehicle_status and
+        vehicle_gps_position are decoded) """
         obj = cls()
 
         ulog_file_name = get_log_filename(log_id)
-        ulog = load_ulog_file(ulog_file_name)
+        ulog = load_ulog_file_metadata(ulog_file_name)
         px4_ulog = PX4ULog(ulog)
 
         # extract information
@@ -143,6 +149,15 @@ class DBDataGenerated:
 
         return obj
 
+    def to_db_row(self, log_id):
+        """ get the values for the LogsGenerated table (see db_columns) """
+        return [log_id, self.duration_s, self.mav_type, self.estimator,
+                self.sys_autostart_id, self.sys_hw, self.ver_sw,
+                self.num_logged_errors, self.num_logged_warnings,
+                ','.join(map(str, self.flight_modes)), self.ver_sw_release,
+                self.vehicle_uuid, self.flight_mode_durations_str(),
+                self.start_time_utc]
+
     def to_json_dict(self):
         jsondict = {}
         jsondict['duration_s'] = int(self.duration_s)
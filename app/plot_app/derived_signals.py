@@ -0,0 +1,129 @@
+""" Memoized signals derived from the logged data """
+import copy
+from functools import partial
+import threading
+
+import numpy as np
+
+from timing_report import timed
+
+
+# topics with an attitude quaternion: key: topic name, value: field name suffix
+# (same as PX4ULog.add_roll_pitch_yaw())
+_ATTITUDE_TOPICS = {
+    'vehicle_attitude': '',
+    'vehicle_vision_attitude': '',
+    'vehicle_attitude_groundtruth': '',
+    'vehicle_attitude_setpoint': '_d',
+    }
+
+# COMPATIBILITY: renamed fields, key: topic name, value: list of (old, new).
+# If several old fields map to the same new field, the last one wins.
+_RENAMED_FIELDS = {
+    'system_power': [
+        ('voltage5V_v', 'voltage5v_v'), # old (prior to PX4/Firmware:213aa93)
+        ('voltage3V3_v', 'sensors3v3[0]'), # old (prior to PX4/Firmware:213aa93)
+        ('voltage3v3_v', 'sensors3v3[0]'),
+        ],
+    'tecs_status': [
+        ('airspeed_sp', 'true_airspeed_sp'), # old (prior to PX4-Autopilot/pull/16585)
+        ],
+    }
+
+
+class DerivedSignals:
+    """
+    Memoized signals derived from the data of a log. The RAM cache keeps one
+    instance per cached log, which is shared by all sessions and pages showing
+    the log, so that each signal is computed only once.
+    The returned arrays are shared as well and must not be modified.
+    """
+
+    def __init__(self):
+        self._signals = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0 # memory footprint of the arrays
+
+    def get(self, key, compute):
+        """ get a signal, compute() is called if it is not memoized yet.
+        Exceptions are not memoized.
+        :param key: hashable key that identifies the signal
+        """
+        with self._lock:
+            if key in self._signals:
+                return self._signals[key]
+        with timed('analysis', 'derived signal: ' + str(key[0] if isinstance(key, tuple) else key)):
+            value = compute()
+        with self._lock:
+            if key not in self._signals:
+                self._signals[key] = value
+                self.nbytes += _get_nbytes(value)
+            return self._signals[key]
+
+
+def _get_nbytes(value):
+    """ get the size of the arrays of a signal (arrays, or dicts, lists and
+    tuples of arrays) """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_get_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_get_nbytes(item) for item in value)
+    return 0
+
+
+def get_derived_signals(ulog):
+    """ get the DerivedSignals of a ULog object (logs loaded through the RAM
+    cache share them with the cache entry) """
+    signals = getattr(ulog, 'derived_signals', None)
+    if signals is None:
+        signals = DerivedSignals()
+        ulog.derived_signals = signals
+    return signals
+
+
+def resample(time_array, data, desired_time):
+    """ resample data at the timestamps desired_time (linear interpolation,
+    outside of time_array the first/last value is used) """
+    return np.interp(desired_time, time_array, data)
+
+
+def roll_pitch_yaw(dataset, suffix=''):
+    """ convert the quaternion of a topic to euler angles
+    (same as PX4ULog.add_roll_pitch_yaw())
+    :return: dict with the 'roll', 'pitch' and 'yaw' fields (+ suffix)
+    """
+    q = [dataset.data['q'+suffix+'['+str(i)+']'] for i in range(4)]
+    with np.errstate(invalid='ignore'): # arcsin of rounding errors > 1
+        roll = np.arctan2(2.0 * (q[0] * q[1] + q[2] * q[3]),
+                          1.0 - 2.0 * (q[1] * q[1] + q[2] * q[2]))
+        pitch = np.arcsin(2.0 * (q[0] * q[2] - q[3] * q[1]))
+        yaw = np.arctan2(2.0 * (q[0] * q[3] + q[1] * q[2]),
+                         1.0 - 2.0 * (q[2] * q[2] + q[3] * q[3]))
+    return {'roll'+suffix: roll, 'pitch'+suffix: pitch, 'yaw'+suffix: yaw}
+
+
+def get_derived_dataset(dataset, signals):
+    """ get a topic with the derived fields (roll, pitch and yaw) added and
+    the renamed fields of old logs converted to the current names.
+    :param signals: DerivedSignals of the log
+    :return: dataset if there is nothing to change, otherwise a (shallow) copy
+    """
+    renamed_fields = [(old_name, new_name) for old_name, new_name
+                      in _RENAMED_FIELDS.get(dataset.name, []) if old_name in dataset.data]
+    suffix = _ATTITUDE_TOPICS.get(dataset.name)
+    if suffix is not None and 'q'+suffix+'[0]' not in dataset.data:
+        suffix = None
+    if len(renamed_fields) == 0 and suffix is None:
+        return dataset
+
+    derived_dataset = copy.copy(dataset)
+    derived_dataset.data = dict(dataset.data)
+    for old_name, new_name in renamed_fields:
+        derived_dataset.data[new_name] = derived_dataset.data.pop(old_name)
+    if suffix is not None:
+        derived_dataset.data.update(signals.get(
+            ('roll_pitch_yaw', dataset.name, dataset.multi_id),
+            partial(roll_pitch_yaw, dataset, suffix)))
+    return derived_dataset
@@ -1,9 +1,242 @@
-""" Class for server-side dynamic data downsampling """
+""" Classes for server-side dynamic data downsampling """
 
 from timeit import default_timer as timer
+import weakref
 import numpy as np
+from bokeh.io import curdoc
 from bokeh.models import ColumnDataSource
+from compact_data import compact_plot_data
+from config import get_downsampling_method
 from helper import print_timing
+from render_cache import add_restore_callback
+from timing_report import get_timing_report, timed
+from zoom_scheduler import get_zoom_scheduler
+
+# density on startup: density used for initializing the plot. The smaller this
+# is, the less data needs to be loaded on page load (this must still be >=
+# min_density of DynamicDownsample).
+STARTUP_DENSITY = 3
+
+# 'auto' downsampling method: use the envelope if downsampling by step would
+# reduce the value range of a field by more than this fraction
+_AUTO_ENVELOPE_RANGE_LOSS = 0.02
+
+# bucket size of the finest level of the envelope pyramids (smaller buckets are
+# selected from the samples directly)
+_PYRAMID_MIN_BUCKET_SIZE = 4
+
+# envelope pyramids of the data fields, key: id of the array (an entry is
+# removed when its array is deleted)
+_envelope_pyramids = {}
+
+
+def get_downsampling_indices(data, x_key, max_num_data_points):
+    """ select the samples to keep for downsampling data to (at most)
+    max_num_data_points samples, with the configured method:
+    - 'step': every N-th sample
+    - 'envelope': the samples with the minimum and maximum value of each field
+      per bucket of samples (and the first and last sample), so that spikes
+      and the envelope of noisy data are preserved. All fields keep the same
+      samples, the number of buckets is reduced with the number of fields.
+    - 'auto': 'envelope' if 'step' would lose extremes (noisy data or
+      spikes), 'step' otherwise
+    :param data: dict of numpy arrays
+    :return: tuple of (slice or index array of the samples, step size). The
+             step size is 1 if the data is not downsampled or for the envelope
+             (the last sample is always kept).
+    """
+    num_samples = len(data[x_key])
+    if num_samples <= max_num_data_points:
+        return slice(None), 1
+    step_size = int(num_samples / max_num_data_points)
+    fields = [values for key, values in data.items()
+              if key != x_key and values.dtype.kind in 'biuf']
+    if _get_method(fields, step_size) != 'envelope':
+        return slice(None, None, step_size), step_size
+    return _get_envelope_indices(fields, num_samples, max_num_data_points), 1
+
+
+def get_change_point_indices(data, x_key):
+    """ select the samples where any of the fields changes its value, and the
+    first and last sample. Rendered as step lines (mode 'after'), these show
+    exactly the same as all samples (NaN runs are kept by their first sample).
+    :param data: dict of numpy arrays
+    :return: index array
+    """
+    num_samples = len(data[x_key])
+    if num_samples <= 2:
+        return np.arange(num_samples)
+    changed = np.zeros(num_samples - 1, dtype=bool)
+    for key, values in data.items():
+        if key == x_key:
+            continue
+        different = values[1:] != values[:-1]
+        if values.dtype.kind == 'f':
+            different &= ~(np.isnan(values[1:]) & np.isnan(values[:-1]))
+        changed |= different
+    return np.unique(np.concatenate(([0], np.flatnonzero(changed) + 1, [num_samples - 1])))
+
+
+def _get_method(fields, step_size):
+    """ get the downsampling method for the numeric fields of the data
+    ('auto' is resolved for the given step size)
+    :return: 'step' or 'envelope'
+    """
+    method = get_downsampling_method()
+    if method == 'auto':
+        method = 'envelope' if any(_step_loses_extremes(values, step_size)
+                                   for values in fields) else 'step'
+    if method != 'envelope' or len(fields) == 0:
+        return 'step'
+    return 'envelope'
+
+
+def _get_envelope_indices(fields, num_samples, max_num_data_points):
+    """ envelope downsampling of all samples (see get_downsampling_indices())
+    :return: index array
+    """
+    num_buckets = max(1, int(max_num_data_points / (2 * len(fields))))
+    bucket_size = -(-num_samples // num_buckets) # (rounded up)
+    num_buckets = -(-num_samples // bucket_size)
+    num_padding = num_buckets * bucket_size - num_samples
+    bucket_offsets = np.arange(num_buckets) * bucket_size
+    indices = [np.array([0, num_samples - 1])]
+    for values in fields:
+        buckets = np.pad(values, (0, num_padding), mode='edge').reshape(
+            num_buckets, bucket_size)
+        indices.extend(_get_bucket_extremes(buckets, bucket_offsets))
+    indices = np.unique(np.minimum(np.concatenate(indices), num_samples - 1))
+    return indices[indices >= 0] # (-1: bucket without NaN's)
+
+
+def _get_bucket_extremes(buckets, bucket_offsets):
+    """ get the index of the minimum and the maximum value per row of buckets,
+    ignoring NaN's. In buckets that contain NaN's, the first NaN is selected
+    as well, so that the gap in the data is still shown.
+    :param bucket_offsets: index of the first sample of each bucket
+    :return: list of index arrays: min, max and, if there are NaN's, the NaN
+             indices (-1 for the buckets without NaN's)
+    """
+    is_nan = np.isnan(buckets)
+    if not is_nan.any():
+        return [bucket_offsets + np.argmin(buckets, axis=1),
+                bucket_offsets + np.argmax(buckets, axis=1)]
+    # (as nanargmin() and nanargmax(), but an all-NaN bucket selects its first
+    # NaN instead of raising)
+    return [bucket_offsets + np.argmin(np.where(is_nan, np.inf, buckets), axis=1),
+            bucket_offsets + np.argmax(np.where(is_nan, -np.inf, buckets), axis=1),
+            np.where(is_nan.any(axis=1), bucket_offsets + np.argmax(is_nan, axis=1), -1)]
+
+
+def _get_envelope_pyramid(values):
+    """ get the level-of-detail pyramid of a field for envelope downsampling
+    (built on first use and shared by all plots of the array): per level, the
+    indices of the minimum and the maximum value per bucket of samples (NaN's
+    are ignored), with a bucket size of _PYRAMID_MIN_BUCKET_SIZE * 2^level.
+    Each level is reduced from the previous one, so building it is O(n).
+    :return: list of (min indices, max indices, NaN indices) tuples, finest
+             level first. The NaN indices are the index of a NaN per bucket (-1
+             if there is none), or None if the field has no NaN's.
+    """
+    key = id(values)
+    pyramid = _envelope_pyramids.get(key)
+    if pyramid is None:
+        with timed('stage', 'envelope pyramid'):
+            pyramid = _build_envelope_pyramid(values)
+        _envelope_pyramids[key] = pyramid
+        weakref.finalize(values, _envelope_pyramids.pop, key, None)
+    return pyramid
+
+
+def _build_envelope_pyramid(values):
+    num_samples = len(values)
+    index_type = np.int32 if num_samples < 2**31 else np.int64
+    bucket_size = _PYRAMID_MIN_BUCKET_SIZE
+    num_buckets = -(-num_samples // bucket_size)
+    buckets = np.pad(values, (0, num_buckets * bucket_size - num_samples),
+                     mode='edge').reshape(num_buckets, bucket_size)
+    bucket_offsets = np.arange(num_buckets, dtype=index_type) * bucket_size
+    extremes = [np.minimum(indices, num_samples - 1).astype(index_type)
+                for indices in _get_bucket_extremes(buckets, bucket_offsets)]
+    min_indices, max_indices = extremes[0], extremes[1]
+    nan_indices = extremes[2] if len(extremes) > 2 else None
+    pyramid = [(min_indices, max_indices, nan_indices)]
+    while len(min_indices) > 1:
+        min_indices = _merge_buckets(values, min_indices, np.less_equal)
+        max_indices = _merge_buckets(values, max_indices, np.greater_equal)
+        if nan_indices is not None:
+            nan_indices = _merge_nan_buckets(nan_indices)
+        pyramid.append((min_indices, max_indices, nan_indices))
+    return pyramid
+
+
+def _merge_buckets(values, indices, compare):
+    """ reduce pairs of neighboring buckets to the sample that compares True
+    (or is not NaN) """
+    if len(indices) % 2 == 1:
+        indices = np.append(indices, indices[-1])
+    first, second = indices[0::2], indices[1::2]
+    first_values, second_values = values[first], values[second]
+    keep_first = compare(first_values, second_values)
+    if values.dtype.kind == 'f':
+        keep_first |= np.isnan(second_values)
+    return np.where(keep_first, first, second)
+
+
+def _merge_nan_buckets(nan_indices):
+    """ reduce pairs of neighboring buckets to a NaN index (-1 if none) """
+    if len(nan_indices) % 2 == 1:
+        nan_indices = np.append(nan_indices, -1)
+    first, second = nan_indices[0::2], nan_indices[1::2]
+    return np.where(first >= 0, first, second)
+
+
+def _get_envelope_range_indices(fields, start, end, max_num_data_points):
+    """ envelope downsampling of the samples [start, end) of the fields to
+    about max_num_data_points samples, using the pyramids of the fields. This
+    is O(number of selected samples + log n), independent of the number of
+    samples in the range.
+    :param fields: list of numeric numpy arrays (all with the same length)
+    :return: index array (into the full arrays)
+    """
+    num_samples = end - start
+    num_buckets = max(1, int(max_num_data_points / (2 * len(fields))))
+    if num_samples < num_buckets * _PYRAMID_MIN_BUCKET_SIZE:
+        # small range: select from the samples directly
+        return start + _get_envelope_indices([values[start:end] for values in fields],
+                                             num_samples, max_num_data_points)
+
+    # the finest level with at most num_buckets buckets in the range (plus the
+    # partially covered buckets at both ends)
+    level = int(np.ceil(np.log2(num_samples / (num_buckets * _PYRAMID_MIN_BUCKET_SIZE))))
+    indices = [np.array([start, end - 1])]
+    for values in fields:
+        pyramid = _get_envelope_pyramid(values)
+        level = min(level, len(pyramid) - 1)
+        bucket_size = _PYRAMID_MIN_BUCKET_SIZE << level
+        first_bucket, last_bucket = start // bucket_size, -(-end // bucket_size)
+        min_indices, max_indices, nan_indices = pyramid[level]
+        indices.append(min_indices[first_bucket:last_bucket])
+        indices.append(max_indices[first_bucket:last_bucket])
+        if nan_indices is not None:
+            indices.append(nan_indices[first_bucket:last_bucket])
+    indices = np.unique(np.concatenate(indices))
+    # the partially covered buckets can have their extremes outside the range
+    # (this also removes the -1 of the buckets without NaN's)
+    return indices[(indices >= start) & (indices < end)]
+
+
+def _step_loses_extremes(values, step_size):
+    """ check if downsampling by step visibly reduces the value range """
+    values = values.astype(np.float64, copy=False)
+    value_min, value_max = np.fmin.reduce(values), np.fmax.reduce(values)
+    value_range = value_max - value_min
+    if not value_range > 0: # (also if all NaN)
+        return False
+    step_values = values[::step_size]
+    range_loss = (value_max - np.fmax.reduce(step_values)) + \
+        (np.fmin.reduce(step_values) - value_min)
+    return range_loss > value_range * _AUTO_ENVELOPE_RANGE_LOSS
 
 
 class DynamicDownsample:
@@ -12,9 +245,14 @@ class DynamicDownsample:
         Initializes the plot with a fixed number of samples per pixel and then
         dynamically loads samples when zooming in or out based on density
         thresholds.
-        Currently uses a very simple downsampling by picking every N-th sample
+        The samples are selected with get_downsampling_indices(). On zoom
+        updates, the range is looked up with a binary search in the x values
+        (which are expected to be sorted) and the envelope is selected from
+        precomputed pyramids, so that an update is independent of the total
+        number of samples.
     """
-    def __init__(self, bokeh_plot, data, x_key):
+    def __init__(self, bokeh_plot, data, x_key, data_source=None, last_step_size=1,
+                 *, name=None, timestamp_offset=0):
         """ Initialize and setup callback
 
         Args:
@@ -22,23 +260,33 @@ class DynamicDownsample:
             data (dict) : data source of the plots, contains all samples. Arrays
                           are expected to be numpy
             x_key (str): key for x axis in data
+            data_source (ColumnDataSource): existing, already downsampled
+                          data source (shared with another plot, or restored
+                          from the render cache)
+            last_step_size (int): step size of the existing data source
+            name (str): name of the data (for the timing report)
+            timestamp_offset (int): offset of the sent 'timestamp' field (see
+                          get_timestamp_offset())
         """
         self.bokeh_plot = bokeh_plot
+        self.name = name
+        self.timestamp_offset = timestamp_offset
         self.x_key = x_key
         self.data = data
-        self.last_step_size = 1
+        self.last_step_size = last_step_size
 
         # parameters
         # minimum number of samples/pixel. Below that, we load new data
         self.min_density = 2
-        # density on startup: density used for initializing the plot. The
-        # smaller this is, the less data needs to be loaded on page load (this
-        # must still be >= min_density).
-        self.startup_density = 3
+        # density on startup (see STARTUP_DENSITY)
+        self.startup_density = STARTUP_DENSITY
         # when loading new data, number of samples/pixel is set to this value
         self.init_density = 5
         # when loading new data, add a percentage of data on both sides
         self.range_margin = 0.2
+        # numeric fields for envelope downsampling on zoom updates (empty for
+        # step downsampling), determined on the first update
+        self._envelope_fields = None
 
         # create a copy of the initial data
         self.init_data = {}
@@ -47,18 +295,35 @@ class DynamicDownsample:
             self.init_data[k] = data[k]
             self.cur_data[k] = data[k]
 
-        # first downsampling
-        self.downsample(self.cur_data, self.bokeh_plot.width *
-                        self.startup_density)
-        self.data_source = ColumnDataSource(data=self.cur_data)
+        if data_source is None:
+            # first downsampling
+            self.downsample(self.cur_data, self.bokeh_plot.width *
+                            self.startup_density)
+            self.data_source = ColumnDataSource(data=compact_plot_data(
+                self.cur_data, timestamp_offset))
+        else:
+            self.data_source = data_source
+            self.cur_data = dict(data_source.data)
+            if x_key == 'timestamp' and timestamp_offset != 0:
+                # the sent timestamps are relative to the offset
+                self.cur_data[x_key] = np.asarray(self.cur_data[x_key], dtype=np.int64) + \
+                    timestamp_offset
+        # the initial data source can be shared by several plots, so it is
+        # never modified. The plot gets its own data source on the first update.
+        self._initial_data_source = True
+        add_restore_callback(curdoc(), restore_dynamic_downsample, {
+            'plot': bokeh_plot.id, 'data_source': self.data_source.id,
+            'x_key': x_key, 'data': self.init_data,
+            'last_step_size': self.last_step_size, 'name': name,
+            'timestamp_offset': timestamp_offset})
 
-        # register the callbacks
-        bokeh_plot.x_range.on_change('start', self.x_range_change_cb)
-        bokeh_plot.x_range.on_change('end', self.x_range_change_cb)
+        # register the zoom updates
+        get_zoom_scheduler().add(self, bokeh_plot.x_range)
 
 
-    def x_range_change_cb(self, attr, old, new):
-        """ bokeh server-side callback when plot x-range changes (zooming) """
+    def update_range(self):
+        """ update the data source for the current x-range of the plot (called
+        by the ZoomScheduler when zooming) """
         cb_start_time = timer()
 
         new_range = [self.bokeh_plot.x_range.start, self.bokeh_plot.x_range.end]
@@ -74,9 +339,11 @@ class DynamicDownsample:
                 (new_range[1] > cur_range[1] and cur_range[1] < init_x[-self.last_step_size]):
             need_update = True # zooming out / panning
 
-        visible_points = ((new_range[0] < cur_x) & (cur_x < new_range[1])).sum()
+        visible_points = np.searchsorted(cur_x, new_range[1]) - \
+            np.searchsorted(cur_x, new_range[0], side='right')
         if visible_points / plot_width < self.min_density:
-            visible_points_all_data = ((new_range[0] < init_x) & (init_x < new_range[1])).sum()
+            visible_points_all_data = np.searchsorted(init_x, new_range[1]) - \
+                np.searchsorted(init_x, new_range[0], side='right')
             if visible_points_all_data > visible_points:
                 need_update = True
             # else: reached maximum zoom level
@@ -90,26 +357,248 @@ class DynamicDownsample:
             new_range[0] -= drange * self.range_margin
             new_range[1] += drange * self.range_margin
             num_data_points = plot_width * self.init_density * (1 + 2*self.range_margin)
-            indices = np.logical_and(init_x > new_range[0], init_x < new_range[1])
+            start = np.searchsorted(init_x, new_range[0], side='right')
+            end = np.searchsorted(init_x, new_range[1])
+            if end <= start:
+                return # no data in the range
 
-            self.cur_data = {}
-            for k,value in self.init_data.items():
-                self.cur_data[k] = value[indices]
+            self.cur_data = self._downsample_range(start, end, num_data_points)
 
-            # downsample
-            self.downsample(self.cur_data, num_data_points)
-
-            self.data_source.data = self.cur_data
+            if self._initial_data_source:
+                self._initial_data_source = False
+                data_source = ColumnDataSource(data=compact_plot_data(
+                    self.cur_data, self.timestamp_offset))
+                for renderer in self.bokeh_plot.renderers:
+                    if getattr(renderer, 'data_source', None) is self.data_source:
+                        renderer.data_source = data_source
+                self.data_source = data_source
+            else:
+                self.data_source.data = compact_plot_data(self.cur_data,
+                                                          self.timestamp_offset)
 
+            timing_report = get_timing_report()
+            if timing_report is not None:
+                timing_report.add_points(self.name or 'zoom update',
+                                         len(self.cur_data) * len(self.cur_data[self.x_key]))
             print_timing("Data update", cb_start_time)
 
 
+    def _downsample_range(self, start, end, max_num_data_points):
+        """ downsample the samples [start, end) of the initial data
+        :return: dict of the downsampled data
+        """
+        if self._envelope_fields is None:
+            init_x = self.init_data[self.x_key]
+            fields = [values for key, values in self.init_data.items()
+                      if key != self.x_key and values.dtype.kind in 'biuf']
+            startup_step_size = max(1, int(len(init_x) /
+                                           (self.bokeh_plot.width * self.startup_density)))
+            self._envelope_fields = fields if \
+                _get_method(fields, startup_step_size) == 'envelope' else []
+
+        num_samples = end - start
+        if num_samples <= max_num_data_points:
+            self.last_step_size = 1
+            return {k: value[start:end] for k, value in self.init_data.items()}
+        if len(self._envelope_fields) == 0:
+            self.last_step_size = int(num_samples / max_num_data_points)
+            return {k: value[start:end:self.last_step_size]
+                    for k, value in self.init_data.items()}
+        indices = _get_envelope_range_indices(self._envelope_fields, start, end,
+                                              max_num_data_points)
+        self.last_step_size = 1
+        return {k: value[indices] for k, value in self.init_data.items()}
+
     def downsample(self, data, max_num_data_points):
         """ downsampling with a given maximum number of samples """
         if len(data[self.x_key]) > max_num_data_points:
-            step_size = int(len(data[self.x_key]) / max_num_data_points)
-            self.last_step_size = step_size
+            indices, self.last_step_size = get_downsampling_indices(
+                data, self.x_key, max_num_data_points)
             for k in data:
-                data[k] = data[k][::step_size]
+                data[k] = data[k][indices]
+
+
+def restore_dynamic_downsample(doc, state):
+    """ re-create the downsampling of a document restored from the render cache """
+    DynamicDownsample(
+        doc.get_model_by_id(state['plot']), state['data'], state['x_key'],
+        data_source=doc.get_model_by_id(state['data_source']),
+        last_step_size=state['last_step_size'], name=state.get('name'),
+        timestamp_offset=state.get('timestamp_offset', 0))
+
+
+def get_track_indices(x, y, tolerance):
+    """ select the samples of a 2D track, so that it is drawn with a deviation
+    of at most about tolerance: a sample is kept if it is in another cell than
+    the previous sample, on a grid with the tolerance as cell size (and the
+    first and last sample are kept). NaN samples are kept.
+    :return: index array
+    """
+    num_samples = len(x)
+    if num_samples <= 2 or not tolerance > 0:
+        return np.arange(num_samples)
+    cell_x = np.floor(x / tolerance)
+    cell_y = np.floor(y / tolerance)
+    keep = np.empty(num_samples, dtype=bool)
+    keep[0] = True
+    keep[1:] = (cell_x[1:] != cell_x[:-1]) | (cell_y[1:] != cell_y[:-1])
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+class DynamicTrackDownsample:
+    """ server-side dynamic downsampling of 2D tracks (e.g. positions, drawn
+        as line or circles) using numpy data sources.
+        The track is simplified with a tolerance below a pixel (see
+        get_track_indices()), so that it looks the same as with all samples.
+        When zooming in, the samples of the visible area (plus a margin) are
+        loaded with the tolerance of the new zoom level, from precomputed
+        levels of detail.
+    """
+    def __init__(self, bokeh_plot, data, x_key, y_key, data_source=None, *, name=None):
+        """ Initialize and setup callback
+
+        Args:
+            bokeh_plot (bokeh.plotting.figure) : plot for downsampling. The x
+                          and y ranges must already be set
+            data (dict) : data source of the plots, contains all samples. Arrays
+                          are expected to be numpy
+            x_key (str): key for x axis in data
+            y_key (str): key for y axis in data
+            data_source (ColumnDataSource): existing, already downsampled
+                          data source (restored from the render cache)
+            name (str): name of the data (for the timing report)
+        """
+        self.bokeh_plot = bokeh_plot
+        self.name = name
+        self.x_key = x_key
+        self.y_key = y_key
+        self.data = data
+
+        # parameters
+        # maximum deviation of the drawn track from the samples [pixels]
+        self.tolerance = 0.5
+        # when loading new data, add a percentage of the visible area on all sides
+        self.range_margin = 0.5
+        # number of levels of detail below the initial one (each has half the
+        # tolerance of the previous one)
+        self.num_levels = 8
+
+        x, y = data[x_key], data[y_key]
+        # (infinite if there are no valid samples)
+        self._extent = [np.fmin.reduce(x, initial=np.inf), np.fmax.reduce(x, initial=-np.inf),
+                        np.fmin.reduce(y, initial=np.inf), np.fmax.reduce(y, initial=-np.inf)]
+        self._init_tolerance = self._get_pixel_size(self._get_view() or self._extent) * \
+            self.tolerance
+        self._levels = None # list of (tolerance, indices), built on the first update
+        self._level_tolerance = self._init_tolerance # of the current data
+        self._box = None # area of the current data [x0, x1, y0, y1] (None: all)
+
+        if data_source is None:
+            indices = get_track_indices(x, y, self._init_tolerance)
+            self.data_source = ColumnDataSource(data=compact_plot_data(
+                {key: values[indices] for key, values in data.items()}))
+            self._add_points()
+        else:
+            self.data_source = data_source
+        add_restore_callback(curdoc(), restore_dynamic_track_downsample, {
+            'plot': bokeh_plot.id, 'data_source': self.data_source.id,
+            'x_key': x_key, 'y_key': y_key, 'data': data, 'name': name})
+
+        # register the zoom updates
+        get_zoom_scheduler().add(self, bokeh_plot.x_range)
+        get_zoom_scheduler().add(self, bokeh_plot.y_range)
+
+
+    def update_range(self):
+        """ update the data source for the current view of the plot (called
+        by the ZoomScheduler when zooming) """
+        cb_start_time = timer()
+
+        view = self._get_view()
+        if view is None:
+            return
+        tolerance = self._get_pixel_size(view) * self.tolerance
+        if self._levels is None:
+            with timed('stage', 'track levels'):
+                self._levels = self._build_levels()
+        # the coarsest level that is precise enough
+        level_tolerance, indices = next(level for level in reversed(self._levels)
+                                        if level[0] <= tolerance)
+
+        if level_tolerance == self._level_tolerance and self._contains(view):
+            return
+
+        margin_x = (view[1] - view[0]) * self.range_margin
+        margin_y = (view[3] - view[2]) * self.range_margin
+        box = [view[0] - margin_x, view[1] + margin_x, view[2] - margin_y, view[3] + margin_y]
+        x, y = self.data[self.x_key], self.data[self.y_key]
+        if indices is not None:
+            x, y = x[indices], y[indices]
+        inside = (x >= box[0]) & (x <= box[1]) & (y >= box[2]) & (y <= box[3])
+        # keep the neighbors, so that lines leaving the area are drawn
+        selected = inside.copy()
+        selected[1:] |= inside[:-1]
+        selected[:-1] |= inside[1:]
+        positions = np.flatnonzero(selected)
+        sample_indices = positions if indices is None else indices[positions]
+        data = {key: values[sample_indices] for key, values in self.data.items()}
+        # break the line where samples outside the area are left out
+        breaks = np.flatnonzero(np.diff(positions) > 1) + 1
+        if len(breaks) > 0:
+            data = {key: np.insert(values.astype(np.float64), breaks, np.nan)
+                    for key, values in data.items()}
+
+        self.data_source.data = compact_plot_data(data)
+        self._level_tolerance = level_tolerance
+        self._box = box
+        self._add_points()
+        print_timing("Track update", cb_start_time)
+
+
+    def _get_view(self):
+        """ get the visible area [x0, x1, y0, y1] (None if not known yet) """
+        x_range, y_range = self.bokeh_plot.x_range, self.bokeh_plot.y_range
+        view = [x_range.start, x_range.end, y_range.start, y_range.end]
+        if None in view or not np.all(np.isfinite(view)):
+            return None
+        return view
+
+    def _get_pixel_size(self, view):
+        return max((view[1] - view[0]) / self.bokeh_plot.width,
+                   (view[3] - view[2]) / self.bokeh_plot.height)
+
+    def _contains(self, view):
+        """ check if the current data covers the visible part of the track """
+        if self._box is None:
+            return True
+        return self._box[0] <= max(view[0], self._extent[0]) and \
+            self._box[1] >= min(view[1], self._extent[1]) and \
+            self._box[2] <= max(view[2], self._extent[2]) and \
+            self._box[3] >= min(view[3], self._extent[3])
+
+    def _build_levels(self):
+        """ levels of detail, from all samples (tolerance 0) to the initial
+        tolerance. Each level is simplified from the previous one. """
+        x, y = self.data[self.x_key], self.data[self.y_key]
+        levels = [(0, None)]
+        indices = np.arange(len(x))
+        for level in range(self.num_levels, -1, -1):
+            tolerance = self._init_tolerance / 2**level
+            indices = indices[get_track_indices(x[indices], y[indices], tolerance)]
+            levels.append((tolerance, indices))
+        return levels
+
+    def _add_points(self):
+        timing_report = get_timing_report()
+        if timing_report is not None:
+            data = self.data_source.data
+            timing_report.add_points(self.name or 'track update',
+                                     len(data) * len(data[self.x_key]))
 
 
+def restore_dynamic_track_downsample(doc, state):
+    """ re-create the track downsampling of a document restored from the render cache """
+    DynamicTrackDownsample(
+        doc.get_model_by_id(state['plot']), state['data'], state['x_key'], state['y_key'],
+        data_source=doc.get_model_by_id(state['data_source']), name=state['name'])
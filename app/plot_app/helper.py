@@ -6,7 +6,10 @@ import re
 import os
 import traceback
 import sys
-from functools import lru_cache
+from functools import lru_cache, partial
+from concurrent.futures import Future
+import multiprocessing
+import threading
 from urllib.request import urlretrieve
 import xml.etree.ElementTree # airframe parsing
 import shutil
@@ -14,12 +17,18 @@ import uuid
 
 from pyulog import *
 from pyulog.px4 import *
-from scipy.interpolate import interp1d
 
 from config_tables import *
+from lazy_ulog import LazyULog
+from derived_signals import get_derived_signals, resample
+from topic_registry import get_topic_registry
+from compact_ulog import CompactULog
+from timing_report import timed
+from ulog_cache import load_cached_ulog, store_cached_ulog, ulog_cache_lock, \
+    ULogMemoryCache, get_memory_budget
 from config import get_log_filepath, get_airframes_filename, get_airframes_url, \
                    get_parameters_filename, get_parameters_url, \
-                   get_log_cache_size, debug_print_timing, \
+                   debug_print_timing, \
                    get_releases_filename
 
 #pylint: disable=line-too-long, global-variable-not-assigned,invalid-name,global-statement
@@ -285,44 +294,145 @@ class ULogException(Exception):
     """
     pass
 
-@lru_cache(maxsize=get_log_cache_size())
-def load_ulog_file(file_name):
-    """ load an ULog file
+# topics loaded by load_ulog_file(): only the messages we really need
+ulog_msg_filter = ['battery_status', 'distance_sensor', 'estimator_status',
+                   'sensor_combined', 'cpuload',
+                   'vehicle_gps_position', 'vehicle_local_position',
+                   'vehicle_local_position_setpoint',
+                   'vehicle_global_position', 'actuator_controls_0',
+                   'actuator_controls_1', 'actuator_outputs',
+                   'vehicle_angular_velocity', 'vehicle_attitude', 'vehicle_attitude_setpoint',
+                   'vehicle_rates_setpoint', 'rc_channels',
+                   'position_setpoint_triplet', 'vehicle_attitude_groundtruth',
+                   'vehicle_local_position_groundtruth', 'vehicle_visual_odometry',
+                   'vehicle_status', 'airspeed', 'airspeed_validated', 'manual_control_setpoint',
+                   'rate_ctrl_status', 'vehicle_air_data',
+                   'vehicle_magnetometer', 'system_power', 'tecs_status',
+                   'sensor_baro', 'sensor_accel', 'sensor_accel_fifo',
+                   'sensor_gyro_fifo', 'vehicle_angular_acceleration',
+                   'ekf2_timestamps', 'manual_control_switches', 'event',
+                   'vehicle_imu_status', 'actuator_motors', 'actuator_servos',
+                   'vehicle_thrust_setpoint', 'vehicle_torque_setpoint',
+                   'failsafe_flags']
+
+# The reason to put the cache into helper is that the main module gets
+# (re)loaded on each page request. Thus the caching would not work there.
+# The cache holds CompactULog objects.
+__ulog_cache = ULogMemoryCache(get_memory_budget())
+
+def get_worker_process_context():
+    """ get the multiprocessing context for the background worker processes
+    (ingest and prefetching). The workers are forked from a fork server, as
+    forking the (multithreaded) server process directly is not safe. The
+    workers import serve.py, but do not start a server. """
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['helper'])
+    return context
+
+def set_num_server_processes(num_processes):
+    """ set the number of server processes (serve.py --num-procs): they share
+    the configured RAM cache memory. Call this before the processes are
+    forked. """
+    __ulog_cache.set_max_bytes(get_memory_budget(num_processes))
+
+__in_flight_loads = {} # key: file name, value: Future of the load in progress
+__in_flight_lock = threading.Lock()
+
+def load_ulog_file(file_name, time_range=None):
+    """ load an ULog file (cached).
+    The returned object is a new copy for each call (the cache stores a compact
+    representation). Derived fields (e.g. roll, pitch and yaw) are not added to
+    the data, use the topic registry (get_topic_registry()) to access them. They
+    are computed once per cached log.
+    :param time_range: None or tuple of (start, end) timestamps in us (each
+                       can be None): only load the data within that range
     :return: ULog object
     """
-    # The reason to put this method into helper is that the main module gets
-    # (re)loaded on each page request. Thus the caching would not work there.
-
-    # load only the messages we really need
-    msg_filter = ['battery_status', 'distance_sensor', 'estimator_status',
-                  'sensor_combined', 'cpuload',
-                  'vehicle_gps_position', 'vehicle_local_position',
-                  'vehicle_local_position_setpoint',
-                  'vehicle_global_position', 'actuator_controls_0',
-                  'actuator_controls_1', 'actuator_outputs',
-                  'vehicle_angular_velocity', 'vehicle_attitude', 'vehicle_attitude_setpoint',
-                  'vehicle_rates_setpoint', 'rc_channels',
-                  'position_setpoint_triplet', 'vehicle_attitude_groundtruth',
-                  'vehicle_local_position_groundtruth', 'vehicle_visual_odometry',
-                  'vehicle_status', 'airspeed', 'airspeed_validated', 'manual_control_setpoint',
-                  'rate_ctrl_status', 'vehicle_air_data',
-                  'vehicle_magnetometer', 'system_power', 'tecs_status',
-                  'sensor_baro', 'sensor_accel', 'sensor_accel_fifo',
-                  'sensor_gyro_fifo', 'vehicle_angular_acceleration',
-                  'ekf2_timestamps', 'manual_control_switches', 'event',
-                  'vehicle_imu_status', 'actuator_motors', 'actuator_servos',
-                  'vehicle_thrust_setpoint', 'vehicle_torque_setpoint',
-                  'failsafe_flags']
+    compact_ulog = _load_compact_ulog_file(file_name, time_range)
+    with timed('load', 'copy from RAM cache'):
+        return compact_ulog.to_ulog()
+
+def _load_compact_ulog_file(file_name, time_range):
+    """ get an ULog file from the RAM cache or load it.
+    Concurrent calls for the same file (from other threads) wait for the load
+    in progress and share its result (or exception).
+    :return: CompactULog object
+    """
+    cache_key = file_name if time_range is None else (file_name, tuple(time_range))
+    with timed('load', 'RAM cache lookup'):
+        compact_ulog = __ulog_cache.get(cache_key)
+    if compact_ulog is not None:
+        return compact_ulog
+
+    with __in_flight_lock:
+        in_flight = __in_flight_loads.get(cache_key)
+        if in_flight is None:
+            in_flight = Future()
+            __in_flight_loads[cache_key] = in_flight
+            is_loading = True
+        else:
+            is_loading = False
+    if not is_loading:
+        with timed('load', 'wait for concurrent load'):
+            return in_flight.result()
+
     try:
-        ulog = ULog(file_name, msg_filter, disable_str_exceptions=False)
-    except FileNotFoundError:
-        print("Error: file %s not found" % file_name)
+        if time_range is None:
+            ulog = _load_ulog_file(file_name)
+        else:
+            ulog = _load_ulog_file_time_range(file_name, time_range)
+        with timed('load', 'compact'):
+            compact_ulog = CompactULog(ulog)
+        __ulog_cache.put(cache_key, compact_ulog)
+        in_flight.set_result(compact_ulog)
+    except BaseException as error:
+        # failures are not cached: the next call tries again
+        in_flight.set_exception(error)
         raise
+    finally:
+        with __in_flight_lock:
+            del __in_flight_loads[cache_key]
+    return compact_ulog
 
-    # catch all other exceptions and turn them into an ULogException
-    except Exception as error:
-        traceback.print_exception(*sys.exc_info())
-        raise ULogException() from error
+def _load_ulog_file(file_name):
+    """ load an ULog file from the disk cache or by parsing it
+    :return: ULog object
+    """
+    # try the (persistent) disk cache first
+    with timed('load', 'disk cache'):
+        ulog = load_cached_ulog(file_name, ulog_msg_filter)
+    if ulog is not None:
+        return ulog
+
+    if not os.path.exists(file_name):
+        print("Error: file %s not found" % file_name)
+        raise FileNotFoundError(file_name)
+
+    # only one process parses the log, the others wait and use the cache entry
+    with ulog_cache_lock(file_name):
+        ulog = load_cached_ulog(file_name, ulog_msg_filter)
+        if ulog is not None:
+            return ulog
+
+        try:
+            with timed('load', 'parse'):
+                ulog = ULog(file_name, ulog_msg_filter, disable_str_exceptions=False)
+        except FileNotFoundError:
+            print("Error: file %s not found" % file_name)
+            raise
+
+        # catch all other exceptions and turn them into an ULogException
+        except Exception as error:
+            traceback.print_exception(*sys.exc_info())
+            raise ULogException() from error
+
+        with timed('load', 'store disk cache'):
+            store_cached_ulog(file_name, ulog, ulog_msg_filter)
+
+    # use the memory-mapped version, so that the data is shared between processes
+    cached_ulog = load_cached_ulog(file_name, ulog_msg_filter)
+    if cached_ulog is not None:
+        ulog = cached_ulog
 
     # filter messages with timestamp = 0 (these are invalid).
     # The better way is not to publish such messages in the first place, and fix
@@ -336,6 +446,79 @@ def load_ulog_file(file_name):
 
     return ulog
 
+def cache_ulog_file(file_name):
+    """ load an ULog file into the disk cache only (not into RAM) """
+    _load_ulog_file(file_name)
+
+def _load_ulog_file_time_range(file_name, time_range):
+    """ load the data of an ULog file within a time range (only the messages
+    within the range are decoded)
+    :return: ULog object
+    """
+    try:
+        with timed('load', 'decode time range'):
+            ulog = LazyULog(file_name, ulog_msg_filter, disable_str_exceptions=False,
+                            time_range=time_range)
+            ulog.data_list # decode all topics # pylint: disable=pointless-statement
+        return ulog
+    except FileNotFoundError:
+        print("Error: file %s not found" % file_name)
+        raise
+
+    # catch all other exceptions and turn them into an ULogException
+    except Exception as error:
+        traceback.print_exception(*sys.exc_info())
+        raise ULogException() from error
+
+def load_ulog_file_topics(file_name, topic_names, time_range=None):
+    """ load an ULog file for callers that only need a few topics: the topic
+    data is decoded on first access (get_dataset()), and only for topic_names.
+    Uses the disk cache if the log is already cached.
+    :param time_range: None or tuple of (start, end) timestamps in us (each
+                       can be None): only load the data within that range
+    :return: ULog object (not cached in RAM)
+    """
+    if time_range is None and \
+            all(topic_name in ulog_msg_filter for topic_name in topic_names):
+        ulog = load_cached_ulog(file_name, ulog_msg_filter)
+        if ulog is not None:
+            return ulog
+
+    try:
+        return LazyULog(file_name, topic_names, disable_str_exceptions=False,
+                        time_range=time_range)
+    except FileNotFoundError:
+        print("Error: file %s not found" % file_name)
+        raise
+
+    # catch all other exceptions and turn them into an ULogException
+    except Exception as error:
+        traceback.print_exception(*sys.exc_info())
+        raise ULogException() from error
+
+def load_ulog_file_metadata(file_name):
+    """ load the metadata of an ULog file: info, parameters, logged messages,
+    start and last timestamp (as with load_ulog_file()). The file is scanned
+    without decoding the data messages, the topic data is only decoded on
+    access (get_dataset()). Uses the disk cache if the log is already cached.
+    :return: ULog object (not cached in RAM)
+    """
+    ulog = load_cached_ulog(file_name, ulog_msg_filter)
+    if ulog is not None:
+        return ulog
+
+    try:
+        # same filter as load_ulog_file(), so that last_timestamp matches
+        return LazyULog(file_name, ulog_msg_filter, disable_str_exceptions=False)
+    except FileNotFoundError:
+        print("Error: file %s not found" % file_name)
+        raise
+
+    # catch all other exceptions and turn them into an ULogException
+    except Exception as error:
+        traceback.print_exception(*sys.exc_info())
+        raise ULogException() from error
+
 class ActuatorControls:
     """
         Compatibility for actuator control topics
@@ -350,24 +533,10 @@ class ActuatorControls:
             self._thrust_sp_topic = 'vehicle_thrust_setpoint'
             self._torque_axes_field_names = ['xyz[0]', 'xyz[1]', 'xyz[2]']
             try:
-                # thrust is always instance 0
-                thrust_sp = ulog.get_dataset('vehicle_thrust_setpoint', 0)
-                self._thrust = np.sqrt(thrust_sp.data['xyz[0]']**2 + \
-                        thrust_sp.data['xyz[1]']**2 + thrust_sp.data['xyz[2]']**2)
-                self._thrust_x = thrust_sp.data['xyz[0]']
-                self._thrust_z_neg = -thrust_sp.data['xyz[2]']
-                if instance != 0: # We must resample thrust to the desired instance
-                    def _resample(time_array, data, desired_time):
-                        """ resample data at a given time to a vector of desired_time """
-                        data_f = interp1d(time_array, data, fill_value='extrapolate')
-                        return data_f(desired_time)
-                    thrust_sp_instance = ulog.get_dataset('vehicle_thrust_setpoint', instance)
-                    self._thrust = _resample(thrust_sp.data['timestamp'], self._thrust,
-                                             thrust_sp_instance.data['timestamp'])
-                    self._thrust_x = _resample(thrust_sp.data['timestamp'], self._thrust_x,
-                                               thrust_sp_instance.data['timestamp'])
-                    self._thrust_z_neg = _resample(thrust_sp.data['timestamp'], self._thrust_z_neg,
-                                                   thrust_sp_instance.data['timestamp'])
+                self._thrust, self._thrust_x, self._thrust_z_neg = \
+                    get_derived_signals(ulog).get(
+                        ('thrust_setpoint', instance),
+                        partial(self._get_thrust_setpoint, get_topic_registry(ulog), instance))
             except:
                 self._thrust = None
         else:
@@ -376,7 +545,7 @@ class ActuatorControls:
             self._thrust_sp_topic = 'actuator_controls_'+str(instance)
             self._torque_axes_field_names = ['control[0]', 'control[1]', 'control[2]']
             try:
-                torque_sp = ulog.get_dataset(self._torque_sp_topic)
+                torque_sp = get_topic_registry(ulog).get_dataset(self._torque_sp_topic)
                 self._thrust = torque_sp.data['control[3]']
                 if instance == 0:
                     # for FW this would be in X direction
@@ -386,6 +555,25 @@ class ActuatorControls:
             except:
                 self._thrust = None
 
+    @staticmethod
+    def _get_thrust_setpoint(topic_registry, instance):
+        """ get the thrust (norm, x, -z) of the vehicle_thrust_setpoint topic,
+        resampled to the timestamps of the given instance """
+        # thrust is always instance 0
+        thrust_sp = topic_registry.get_dataset('vehicle_thrust_setpoint', 0)
+        thrust = np.sqrt(thrust_sp.data['xyz[0]']**2 + \
+                thrust_sp.data['xyz[1]']**2 + thrust_sp.data['xyz[2]']**2)
+        thrust_x = thrust_sp.data['xyz[0]']
+        thrust_z_neg = -thrust_sp.data['xyz[2]']
+        if instance != 0: # We must resample thrust to the desired instance
+            thrust_sp_instance = topic_registry.get_dataset('vehicle_thrust_setpoint', instance)
+            time_array = thrust_sp.data['timestamp']
+            desired_time = thrust_sp_instance.data['timestamp']
+            thrust = resample(time_array, thrust, desired_time)
+            thrust_x = resample(time_array, thrust_x, desired_time)
+            thrust_z_neg = resample(time_array, thrust_z_neg, desired_time)
+        return thrust, thrust_x, thrust_z_neg
+
     @property
     def topic_instance(self):
         """ get the topic instance """
@@ -422,6 +610,13 @@ class ActuatorControls:
         return self._thrust_z_neg
 
 
+def is_mobile_user_agent(user_agent):
+    """ check if a browser user agent string is from a mobile device """
+    return re.search(r'Mobile|iP(hone|od|ad)|Android|BlackBerry|'
+                     r'IEMobile|Kindle|NetFront|Silk-Accelerated|(hpw|web)OS|Fennec|'
+                     r'Minimo|Opera M(obi|ini)|Blazer|Dolfin|'
+                     r'Dolphin|Skyfire|Zune', user_agent) is not None
+
 def get_lat_lon_alt_deg(ulog: ULog, vehicle_gps_position_dataset: ULog.Data):
     """
     Get (lat, lon, alt) tuple in degrees and altitude in meters
@@ -493,13 +688,26 @@ def get_flight_mode_changes(ulog):
         flight_mode_changes = []
     return flight_mode_changes
 
+def is_ulog_file_in_ram_cache(file_name):
+    """ check if an ULog file is in the RAM cache """
+    return __ulog_cache.contains(file_name)
+
 def print_cache_info():
     """ print information about the ulog cache """
-    print(load_ulog_file.cache_info())
+    info = __ulog_cache.info()
+    stored_bytes = info['resident_bytes'] + info['mapped_bytes']
+    print('ULog cache: hits={hits}, misses={misses}, evictions={evictions}, '
+          'entries={entries}, resident={resident_mb:.1f} MB / {max_mb:.1f} MB, '
+          'mapped={mapped_mb:.1f} MB, compaction={ratio:.2f}x'.format(
+              resident_mb=info['resident_bytes'] / 1024**2,
+              max_mb=info['max_bytes'] / 1024**2,
+              mapped_mb=info['mapped_bytes'] / 1024**2,
+              ratio=info['original_bytes'] / stored_bytes if stored_bytes > 0 else 1,
+              **info))
 
 def clear_ulog_cache():
     """ clear/invalidate the ulog cache """
-    load_ulog_file.cache_clear()
+    __ulog_cache.clear()
 
 def validate_error_ids(err_ids):
     """
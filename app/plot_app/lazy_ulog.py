@@ -0,0 +1,254 @@
+""" ULog file access with per-topic, on-demand decoding """
+from array import array
+import mmap
+import struct
+
+import numpy as np
+from pyulog import ULog
+
+#pylint: disable=protected-access
+
+_MSG_HEADER = struct.Struct('<HB')
+_MSG_TYPE_DATA = ord('D')
+
+
+class _ScanFallback(Exception):
+    """ the file needs the full parser (corrupt or appended data) """
+
+
+class LazyULog(ULog):
+    """
+    ULog object that scans the file once to build an index of the data message
+    offsets per topic. The topic data is only decoded on first access via
+    get_dataset() (or when accessing data_list, for all topics in the filter).
+
+    Everything else (info, parameters, logged messages, dropouts, ...) is
+    available right after construction, as with ULog.
+    Corrupt files and files with appended data are parsed with the regular
+    ULog parser.
+
+    With a time_range (tuple of start and end timestamp in us, either can be
+    None), only the data messages within that range are decoded. The last
+    message before the start is kept as well, so that states (e.g. the flight
+    mode) are known at the start of the range. start_timestamp and
+    last_timestamp are limited to the range.
+    """
+
+    def __init__(self, log_file, message_name_filter_list=None,
+                 disable_str_exceptions=True, time_range=None):
+        super().__init__(None, message_name_filter_list, disable_str_exceptions)
+        self._file_name = log_file
+        self._file_buffer = None
+        self._topic_offsets = {} # key=msg_id, value=np.array of data message offsets
+        self._time_range = time_range
+        try:
+            self._scan_file(message_name_filter_list)
+        except _ScanFallback:
+            ULog.__init__(self, log_file, message_name_filter_list, disable_str_exceptions)
+            self._topic_offsets = {}
+            if time_range is not None:
+                self._apply_time_range()
+
+    @property
+    def data_list(self):
+        """ all topics (that match the filter), decodes them if necessary """
+        for msg_id in list(self._topic_offsets):
+            self._decode_topic(msg_id)
+        return self._data_list
+
+    def get_topic_names(self):
+        """ get the sorted list of available topic names (without decoding them) """
+        names = {subscription.message_name for subscription in self._subscriptions.values()
+                 if subscription.msg_id in self._topic_offsets}
+        names.update(data.name for data in self._data_list)
+        return sorted(names)
+
+    def get_dataset(self, name, multi_instance=0):
+        """ get a specific dataset, decodes it on first access.
+
+        :param name: name of the dataset
+        :param multi_instance: the multi_id, defaults to the first
+        :raises KeyError, IndexError, ValueError: if name or instance not found
+        """
+        for msg_id, subscription in self._subscriptions.items():
+            if subscription.message_name == name and \
+                    subscription.multi_id == multi_instance:
+                self._decode_topic(msg_id)
+        return [elem for elem in self._data_list
+                if elem.name == name and elem.multi_id == multi_instance][0]
+
+    def _get_time_range_mask(self, timestamps):
+        """ get the mask of the timestamps within the time range, including the
+        last one before the start """
+        range_start, range_end = self._time_range
+        mask = np.ones(len(timestamps), dtype=bool)
+        if range_end is not None:
+            mask &= timestamps <= range_end
+        if range_start is not None:
+            before_start = timestamps < range_start
+            mask &= ~before_start
+            before_indices = np.nonzero(before_start)[0]
+            if len(before_indices) > 0:
+                mask[before_indices[-1]] = True
+        return mask
+
+    def _limit_timestamps_to_range(self):
+        range_start, range_end = self._time_range
+        if range_start is not None and range_start > self._start_timestamp:
+            self._start_timestamp = range_start
+        if range_end is not None and range_end < self._last_timestamp:
+            self._last_timestamp = range_end
+        self._last_timestamp = max(self._last_timestamp, self._start_timestamp)
+
+    def _apply_time_range(self):
+        """ limit already decoded data to the time range """
+        for data in self._data_list:
+            mask = self._get_time_range_mask(data.data['timestamp'])
+            data.data = {key: value[mask] for key, value in data.data.items()}
+        self._limit_timestamps_to_range()
+
+    def _decode_topic(self, msg_id):
+        offsets = self._topic_offsets.pop(msg_id, None)
+        if offsets is None:
+            return
+        if len(offsets) == 0: # nothing within the time range
+            if not self._topic_offsets:
+                self._file_buffer = None
+            return
+        subscription = self._subscriptions[msg_id]
+        item_size = subscription.dtype.itemsize
+        buf = self._file_buffer
+        subscription.buffer = bytearray().join(
+            [buf[offset:offset+item_size] for offset in (offsets + 2).tolist()])
+        self._data_list.append(ULog.Data(subscription))
+        subscription.buffer = bytearray()
+        self._data_list.sort(key=lambda ds: (ds.name, ds.multi_id))
+        if not self._topic_offsets:
+            self._file_buffer = None # all decoded: release the file mapping
+
+    def _scan_file(self, message_name_filter_list):
+        with open(self._file_name, 'rb') as file_handle:
+            self._file_handle = file_handle
+            self._read_file_header()
+            self._last_timestamp = self._start_timestamp
+            self._read_file_definitions()
+            data_start = file_handle.tell()
+            del self._file_handle
+            if self.has_data_appended and len(self._appended_offsets) > 0:
+                raise _ScanFallback()
+            buf = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = self._MessageHeader()
+        data_offsets = array('q')
+        # non-data messages that depend on the last timestamp at their position:
+        # (index into data_offsets, message type, payload)
+        timestamp_dependent = []
+        end = len(buf)
+        pos = data_start
+        unpack_header = _MSG_HEADER.unpack_from
+        while pos + 3 <= end:
+            msg_size, msg_type = unpack_header(buf, pos)
+            payload_start = pos + 3
+            pos = payload_start + msg_size
+            if pos > end:
+                break # file is most likely cut
+            if msg_type == _MSG_TYPE_DATA:
+                data_offsets.append(payload_start)
+                continue
+
+            header.msg_size = msg_size
+            header.msg_type = msg_type
+            data = buf[payload_start:pos]
+            try:
+                if msg_type == self.MSG_TYPE_INFO:
+                    msg_info = self._MessageInfo(data, header)
+                    self._msg_info_dict[msg_info.key] = msg_info.value
+                    self._msg_info_dict_types[msg_info.key] = msg_info.type
+                elif msg_type == self.MSG_TYPE_INFO_MULTIPLE:
+                    msg_info = self._MessageInfo(data, header, is_info_multiple=True)
+                    self._add_message_info_multiple(msg_info)
+                elif msg_type in (self.MSG_TYPE_PARAMETER, self.MSG_TYPE_DROPOUT):
+                    timestamp_dependent.append((len(data_offsets), msg_type, data))
+                elif msg_type == self.MSG_TYPE_PARAMETER_DEFAULT:
+                    msg_param = self._MessageParameterDefault(data, header)
+                    self._add_parameter_default(msg_param)
+                elif msg_type == self.MSG_TYPE_ADD_LOGGED_MSG:
+                    msg_add_logged = self._MessageAddLogged(data, header,
+                                                            self._message_formats)
+                    if (message_name_filter_list is None or
+                            msg_add_logged.message_name in message_name_filter_list):
+                        self._subscriptions[msg_add_logged.msg_id] = msg_add_logged
+                    else:
+                        self._filtered_message_ids.add(msg_add_logged.msg_id)
+                elif msg_type == self.MSG_TYPE_LOGGING:
+                    self._logged_messages.append(self.MessageLogging(data, header))
+                elif msg_type == self.MSG_TYPE_LOGGING_TAGGED:
+                    msg_log_tagged = self.MessageLoggingTagged(data, header)
+                    self._logged_messages_tagged.setdefault(
+                        msg_log_tagged.tag, []).append(msg_log_tagged)
+                elif msg_type == self.MSG_TYPE_SYNC:
+                    self._sync_seq_cnt = self._sync_seq_cnt + 1
+                elif msg_type == 0 or msg_size == 0 or msg_size > 10000:
+                    raise _ScanFallback() # corrupt: needs resynchronization
+            except (IndexError, struct.error) as error:
+                raise _ScanFallback() from error
+
+        self._file_buffer = buf
+        self._index_data_messages(np.frombuffer(data_offsets, dtype=np.int64),
+                                  timestamp_dependent)
+
+    def _index_data_messages(self, offsets, timestamp_dependent):
+        """ split the data message offsets by topic, validate them and get the
+        timestamps required for last_timestamp, dropouts and parameter changes """
+        file_data = np.frombuffer(self._file_buffer, dtype=np.uint8)
+        msg_ids = file_data[offsets].astype(np.uint16) | \
+                (file_data[offsets + 1].astype(np.uint16) << 8)
+        msg_sizes = (file_data[offsets - 3].astype(np.int64) |
+                     (file_data[offsets - 2].astype(np.int64) << 8)) - 2
+        message_timestamps = np.zeros(len(offsets), dtype=np.uint64)
+
+        for msg_id in np.unique(msg_ids).tolist():
+            indices = np.nonzero(msg_ids == msg_id)[0]
+            subscription = self._subscriptions.get(msg_id)
+            if subscription is None:
+                if msg_id not in self._filtered_message_ids:
+                    self._missing_message_ids.add(msg_id)
+                    self._file_corrupt = True
+                    print('Warning: no subscription found for message id {:}. Continuing,'
+                          ' but file is most likely corrupt'.format(msg_id))
+                continue
+            sizes = msg_sizes[indices]
+            valid = (sizes >= subscription.dtype.itemsize) & \
+                    (sizes <= subscription.max_data_size)
+            if not np.all(valid):
+                self._file_corrupt = True
+                indices = indices[valid]
+            if len(indices) == 0:
+                continue
+            topic_offsets = offsets[indices]
+            timestamp_offsets = topic_offsets + 2 + subscription.timestamp_offset
+            timestamp_bytes = file_data[timestamp_offsets[:, None] + np.arange(8)]
+            topic_timestamps = timestamp_bytes.view('<u8').ravel()
+            message_timestamps[indices] = topic_timestamps
+            if self._time_range is not None:
+                topic_offsets = topic_offsets[self._get_time_range_mask(topic_timestamps)]
+            self._topic_offsets[msg_id] = topic_offsets
+
+        # last_timestamp is the running maximum over all (filtered) data messages
+        running_max = np.maximum.accumulate(
+            np.concatenate(([self._start_timestamp], message_timestamps)).astype(np.uint64))
+        self._last_timestamp = int(running_max[-1])
+
+        header = self._MessageHeader()
+        for index, msg_type, data in timestamp_dependent:
+            timestamp = int(running_max[index])
+            header.msg_size = len(data)
+            header.msg_type = msg_type
+            if msg_type == self.MSG_TYPE_PARAMETER:
+                msg_info = self._MessageInfo(data, header)
+                self._changed_parameters.append((timestamp, msg_info.key, msg_info.value))
+            else:
+                self._dropouts.append(self.MessageDropout(data, header, timestamp))
+
+        if self._time_range is not None:
+            self._limit_timestamps_to_range()
@@ -4,6 +4,7 @@ a Leaflet map via jinja arguments """
 from colors import HTML_color_to_RGB
 from config_tables import flight_modes_table
 from helper import get_lat_lon_alt_deg
+from topic_registry import get_topic_registry
 
 #pylint: disable=consider-using-enumerate
 
@@ -23,7 +24,7 @@ def ulog_to_polyline(ulog, flight_mode_changes):
             if rgb[i] > 255: rgb[i] = 255
 
         return "#" + "".join(map(lambda x: format(x, '02x'), rgb))
-    cur_data = ulog.get_dataset('vehicle_gps_position')
+    cur_data = get_topic_registry(ulog).get_dataset('vehicle_gps_position')
     pos_lat, pos_lon, _ = get_lat_lon_alt_deg(ulog, cur_data)
     pos_t = cur_data.data['timestamp']
 
@@ -15,10 +15,15 @@ from bokeh.models.widgets import Div
 from helper import *
 from config import *
 from colors import HTML_color_to_RGB
+from compact_data import print_compaction_stats
 from db_entry import *
-from configured_plots import generate_plots
+from configured_plots import generate_plots, parse_plot_sections, get_plot_sections_topics
 from pid_analysis_plots import get_pid_analysis_plots
+from plotting import enable_lazy_plots
 from statistics_plots import StatisticsPlots
+from timing_report import start_timing_report, timed
+from render_cache import get_render_cache_key, restore_rendered_document, \
+    store_rendered_document
 
 #pylint: disable=invalid-name, redefined-outer-name
 
@@ -87,12 +92,27 @@ else:
     # show the plots of a single log
 
     start_time = timer()
+    timing_report = start_timing_report(curdoc())
 
     ulog_file_name = 'test.ulg'
 
     ulog_file_name = os.path.join(get_log_filepath(), ulog_file_name)
     error_message = ''
     log_id = ''
+    time_range = None
+    render_cache_key = None
+
+    # check which plots to show: 'default', 'pid_analysis' or a list of plot
+    # sections (e.g. 'attitude,rates')
+    plots_page = 'default'
+    plot_sections = None
+    if GET_arguments is not None and 'plots' in GET_arguments:
+        plots_args = GET_arguments['plots']
+        if len(plots_args) == 1:
+            plots_page = str(plots_args[0], 'utf-8')
+    if plots_page not in ('default', 'pid_analysis'):
+        plot_sections = parse_plot_sections(plots_page)
+        plots_page = 'default' if plot_sections is None else ','.join(plot_sections)
 
     try:
 
@@ -105,9 +125,24 @@ else:
                 print('GET[log]={}'.format(log_id))
                 ulog_file_name = get_log_filename(log_id)
 
-        ulog = load_ulog_file(ulog_file_name)
-        px4_ulog = PX4ULog(ulog)
-        px4_ulog.add_roll_pitch_yaw()
+        # optional time range (in seconds, as shown in the plots): only load
+        # and plot the data within [t0, t1]
+        if GET_arguments is not None and ('t0' in GET_arguments or 't1' in GET_arguments):
+            time_range = tuple(
+                int(float(GET_arguments[arg][0]) * 1e6) if arg in GET_arguments else None
+                for arg in ['t0', 't1'])
+            print('GET[t0, t1]={}'.format(time_range))
+
+        with timed('stage', 'load log'):
+            if plot_sections is not None and \
+                    (time_range is not None or not is_ulog_file_in_ram_cache(ulog_file_name)):
+                # only decode the topics of the shown plots
+                ulog = load_ulog_file_topics(ulog_file_name,
+                                             get_plot_sections_topics(plot_sections),
+                                             time_range)
+            else:
+                ulog = load_ulog_file(ulog_file_name, time_range)
+            px4_ulog = PX4ULog(ulog)
 
     except ULogException:
         error_message = ('A parsing error occured when trying to read the file - '
@@ -115,6 +150,19 @@ else:
     except:
         print("Error loading file:", sys.exc_info()[0], sys.exc_info()[1])
         error_message = 'An error occured when trying to read the file.'
+        # the log is removed if the processing of the upload failed
+        try:
+            con = sqlite3.connect(get_db_filename())
+            cur = con.cursor()
+            cur.execute("select Error from IngestJobs where Id = ? and Status = 'failed'",
+                        [log_id])
+            db_tuple = cur.fetchone()
+            if db_tuple is not None:
+                error_message = 'Processing the uploaded file failed: ' + db_tuple[0]
+            cur.close()
+            con.close()
+        except sqlite3.Error:
+            pass
 
 
     print_timing("Data Loading", start_time)
@@ -179,17 +227,34 @@ else:
             return (title, error_message, plots)
 
 
-        # check which plots to show
-        plots_page = 'default'
-        if GET_arguments is not None and 'plots' in GET_arguments:
-            plots_args = GET_arguments['plots']
-            if len(plots_args) == 1:
-                plots_page = str(plots_args[0], 'utf-8')
-        if plots_page == 'pid_analysis':
+        if timing_report is not None:
+            timing_report.page = plots_page
+            timing_report.log_id = log_id
+
+        # lazily rendered pages are incomplete, so the render cache and the
+        # lazy plots cannot be used together (only the PID analysis page is
+        # cached then, see the config)
+        lazy_plots = plots_page != 'pid_analysis' and get_lazy_plots_enabled()
+
+        # the plots of a log only change with the DB data (and the code)
+        if log_id != '' and time_range is None and not lazy_plots:
+            user_agent = curdoc().session_context.request.headers.get("User-Agent", "")
+            render_cache_key = get_render_cache_key(
+                log_id, ulog_file_name, plots_page, db_data.to_json_dict(),
+                vars(vehicle_data) if vehicle_data is not None else None,
+                is_mobile_user_agent(user_agent))
+        if render_cache_key is not None and \
+                restore_rendered_document(log_id, render_cache_key, curdoc()):
+            print('Restored plots from the render cache')
+            plots = None
+            title = curdoc().title
+            render_cache_key = None # nothing to store
+        elif plots_page == 'pid_analysis':
             try:
                 link_to_main_plots = '?log='+log_id
-                plots = get_pid_analysis_plots(ulog, px4_ulog, db_data,
-                                               link_to_main_plots)
+                with timed('stage', 'generate plots'):
+                    plots = get_pid_analysis_plots(ulog, px4_ulog, db_data,
+                                                   link_to_main_plots)
 
                 title = 'Flight Review - '+px4_ulog.get_mav_type()
 
@@ -226,9 +291,14 @@ else:
             link_to_3d_page = '3d?log='+log_id
             link_to_pid_analysis_page = '?plots=pid_analysis&log='+log_id
 
+            if lazy_plots:
+                enable_lazy_plots(curdoc())
+
             try:
-                plots = generate_plots(ulog, px4_ulog, db_data, vehicle_data,
-                                       link_to_3d_page, link_to_pid_analysis_page)
+                with timed('stage', 'generate plots'):
+                    plots = generate_plots(ulog, px4_ulog, db_data, vehicle_data,
+                                           link_to_3d_page, link_to_pid_analysis_page,
+                                           sections=plot_sections)
 
                 title = 'Flight Review - '+px4_ulog.get_mav_type()
 
@@ -246,9 +316,15 @@ else:
         div = Div(text="<h3>Error</h3><p>"+error_message+"</p>", width=int(plot_width*0.9))
         plots = [column(div, width=int(plot_width*0.9))]
 
-    # layout
-    layout = column(plots)
-    curdoc().add_root(layout)
-    curdoc().title = title
+    if plots is not None:
+        # layout
+        layout = column(plots)
+        curdoc().add_root(layout)
+        curdoc().title = title
+
+        if render_cache_key is not None and \
+                not curdoc().template_variables.get('internal_error', False):
+            store_rendered_document(log_id, render_cache_key, curdoc())
 
     print_timing("Plotting", start_time)
+    print_compaction_stats(curdoc())
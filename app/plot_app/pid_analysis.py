@@ -350,7 +350,7 @@ def plot_pid_response(trace, data, plot_config, label='Rate'):
     """Plot PID response for one axis
 
     :param trace: Trace object
-    :param data: ULog.data_list
+    :param data: TopicRegistry of the log
     """
 
     def _color_palette(hue, N=20):
@@ -1,14 +1,18 @@
 """ This contains PID analysis plots """
+from functools import partial
+
 from bokeh.io import curdoc
 from bokeh.models.widgets import Div
 from bokeh.layouts import column
-from scipy.interpolate import interp1d
 
 from config import plot_width, plot_config, colors3
+from derived_signals import get_derived_signals, resample
 from helper import get_flight_mode_changes, ActuatorControls
 from pid_analysis import Trace, plot_pid_response
 from plotting import *
 from plotted_tables import get_heading_html
+from timing_report import timed
+from topic_registry import get_topic_registry
 
 #pylint: disable=cell-var-from-loop, undefined-loop-variable,
 
@@ -17,10 +21,12 @@ def get_pid_analysis_plots(ulog, px4_ulog, db_data, link_to_main_plots):
     get all bokeh plots shown on the PID analysis page
     :return: list of bokeh plots
     """
-    def _resample(time_array, data, desired_time):
-        """ resample data at a given time to a vector of desired_time """
-        data_f = interp1d(time_array, data, fill_value='extrapolate')
-        return data_f(desired_time)
+    derived_signals = get_derived_signals(ulog)
+    def _resample(key, time_array, data, desired_time):
+        """ resample data at a given time to a vector of desired_time (memoized
+        per log, key identifies the resampled signal) """
+        return derived_signals.get(('pid_analysis', ) + key,
+                                   partial(resample, time_array, data, desired_time))
 
     page_intro = """
 <p>
@@ -45,33 +51,33 @@ The analysis may take a while...
         'PID Analysis') + page_intro
 
     plots = []
-    data = ulog.data_list
+    data = get_topic_registry(ulog)
     flight_mode_changes = get_flight_mode_changes(ulog)
     x_range_offset = (ulog.last_timestamp - ulog.start_timestamp) * 0.05
     x_range = Range1d(ulog.start_timestamp - x_range_offset, ulog.last_timestamp + x_range_offset)
 
     # COMPATIBILITY support for old logs
-    if any(elem.name == 'vehicle_angular_velocity' for elem in data):
+    if data.has_topic('vehicle_angular_velocity'):
         rate_topic_name = 'vehicle_angular_velocity'
         rate_field_names = ['xyz[0]', 'xyz[1]', 'xyz[2]']
     else: # old
         rate_topic_name = 'rate_ctrl_status'
         rate_field_names = ['rollspeed', 'pitchspeed', 'yawspeed']
-    dynamic_control_alloc = any(elem.name in ('actuator_motors', 'actuator_servos')
-                                for elem in data)
+    dynamic_control_alloc = data.has_topic('actuator_motors', 'actuator_servos')
     actuator_controls_0 = ActuatorControls(ulog, dynamic_control_alloc, 0)
 
     # required PID response data
     pid_analysis_error = False
     try:
         # Rate
-        rate_data = ulog.get_dataset(rate_topic_name)
+        rate_data = data.get_dataset(rate_topic_name)
         gyro_time = rate_data.data['timestamp']
 
-        vehicle_rates_setpoint = ulog.get_dataset('vehicle_rates_setpoint')
-        actuator_controls_0_data = ulog.get_dataset(actuator_controls_0.thrust_sp_topic)
-        throttle = _resample(actuator_controls_0_data.data['timestamp'],
-                             actuator_controls_0.thrust * 100, gyro_time)
+        vehicle_rates_setpoint = data.get_dataset('vehicle_rates_setpoint')
+        actuator_controls_0_data = data.get_dataset(actuator_controls_0.thrust_sp_topic)
+        throttle = _resample(('throttle', rate_topic_name),
+                             actuator_controls_0_data.data['timestamp'],
+                             actuator_controls_0.thrust, gyro_time) * 100
         time_seconds = gyro_time / 1e6
     except (KeyError, IndexError, ValueError) as error:
         print(type(error), ":", error)
@@ -85,9 +91,9 @@ The analysis may take a while...
     has_attitude = True
     try:
         # Attitude (optional)
-        vehicle_attitude = ulog.get_dataset('vehicle_attitude')
+        vehicle_attitude = data.get_dataset('vehicle_attitude')
         attitude_time = vehicle_attitude.data['timestamp']
-        vehicle_attitude_setpoint = ulog.get_dataset('vehicle_attitude_setpoint')
+        vehicle_attitude_setpoint = data.get_dataset('vehicle_attitude_setpoint')
     except (KeyError, IndexError, ValueError) as error:
         print(type(error), ":", error)
         has_attitude = False
@@ -129,7 +135,7 @@ The analysis may take a while...
         data_plot.change_dataset('vehicle_rates_setpoint')
         data_plot.add_graph([lambda data: (axis, np.rad2deg(data[axis]))],
                             colors3[1:2], [axis_name+' Rate Setpoint'],
-                            mark_nan=True, use_step_lines=True)
+                            mark_nan=True, use_change_points=True)
         axis_letter = axis[0].upper()
         rate_int_limit = '(*100)'
         # this param is MC/VTOL only (it will not exist on FW)
@@ -148,11 +154,13 @@ The analysis may take a while...
         if not pid_analysis_error:
             try:
                 gyro_rate = np.rad2deg(rate_data.data[rate_field_names[index]])
-                setpoint = _resample(vehicle_rates_setpoint.data['timestamp'],
-                                     np.rad2deg(vehicle_rates_setpoint.data[axis]),
-                                     gyro_time)
-                trace = Trace(axis, time_seconds, gyro_rate, setpoint, throttle)
-                plots.append(plot_pid_response(trace, ulog.data_list, plot_config).bokeh_plot)
+                setpoint = np.rad2deg(_resample(
+                    ('rates_setpoint', rate_topic_name, axis),
+                    vehicle_rates_setpoint.data['timestamp'],
+                    vehicle_rates_setpoint.data[axis], gyro_time))
+                with timed('analysis', 'pid step response: rate'):
+                    trace = Trace(axis, time_seconds, gyro_rate, setpoint, throttle)
+                plots.append(plot_pid_response(trace, data, plot_config).bokeh_plot)
             except Exception as e:
                 print(type(e), axis, ":", e)
                 div = Div(text="<p><b>Error</b>: PID analysis failed. Possible "
@@ -164,8 +172,9 @@ The analysis may take a while...
 
     # attitude
     if not pid_analysis_error and has_attitude:
-        throttle = _resample(actuator_controls_0_data.data['timestamp'],
-                             actuator_controls_0.thrust * 100, attitude_time)
+        throttle = _resample(('throttle', 'vehicle_attitude'),
+                             actuator_controls_0_data.data['timestamp'],
+                             actuator_controls_0.thrust, attitude_time) * 100
         time_seconds = attitude_time / 1e6
     # don't plot yaw, as yaw is mostly controlled directly by rate
     for index, axis in enumerate(['roll', 'pitch']):
@@ -175,11 +184,13 @@ The analysis may take a while...
         if not pid_analysis_error and has_attitude:
             try:
                 attitude_estimated = np.rad2deg(vehicle_attitude.data[axis])
-                setpoint = _resample(vehicle_attitude_setpoint.data['timestamp'],
-                                     np.rad2deg(vehicle_attitude_setpoint.data[axis+'_d']),
-                                     attitude_time)
-                trace = Trace(axis, time_seconds, attitude_estimated, setpoint, throttle)
-                plots.append(plot_pid_response(trace, ulog.data_list, plot_config,
+                setpoint = np.rad2deg(_resample(
+                    ('attitude_setpoint', axis),
+                    vehicle_attitude_setpoint.data['timestamp'],
+                    vehicle_attitude_setpoint.data[axis+'_d'], attitude_time))
+                with timed('analysis', 'pid step response: angle'):
+                    trace = Trace(axis, time_seconds, attitude_estimated, setpoint, throttle)
+                plots.append(plot_pid_response(trace, data, plot_config,
                                                'Angle').bokeh_plot)
             except Exception as e:
                 print(type(e), axis, ":", e)
@@ -0,0 +1,141 @@
+""" Expensive analyses of the plot pages (spectrograms, FFTs, FIFO expansion).
+These are pure functions on numpy arrays (no bokeh models), so that they can run
+concurrently in the compute thread pool (numpy, scipy and FFTW release the GIL).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+import scipy
+import scipy.fftpack
+import scipy.signal
+import pyfftw
+
+from config import get_plot_compute_threads
+
+
+def _get_num_threads():
+    num_threads = get_plot_compute_threads()
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+    return num_threads
+
+# (the threads are only started on the first use)
+_EXECUTOR = ThreadPoolExecutor(max_workers=_get_num_threads(),
+                               thread_name_prefix='plot_compute')
+
+
+def get_compute_executor():
+    """ get the (shared) thread pool for the plot computations """
+    return _EXECUTOR
+
+
+def compute_spectrogram(timestamps, field_data, max_num_data_points, *,
+                        window, window_length, noverlap):
+    """ calculate the summed spectrogram of several fields
+    (Note: logging dropouts are not taken into account here)
+    :param timestamps: timestamps in [us]
+    :param field_data: list of data arrays
+    :param max_num_data_points: downsample the time axis to this size
+    :return: tuple of (time [us], frequency, image [dB])
+    """
+    # calculate the sampling frequency
+    delta_t = ((timestamps[-1] - timestamps[0]) * 1.0e-6) / len(timestamps)
+    if delta_t < 0.000001: # avoid division by zero
+        raise ValueError('invalid timestamps')
+    sampling_frequency = int(1.0 / delta_t)
+    if sampling_frequency < 100: # require min sampling freq
+        raise ValueError('sampling frequency too low ({:} Hz)'.format(sampling_frequency))
+
+    sum_psd = None
+    for data in field_data:
+        frequency, time, psd = scipy.signal.spectrogram(
+            data, fs=sampling_frequency, window=window,
+            nperseg=window_length, noverlap=noverlap, scaling='density')
+        if sum_psd is None:
+            sum_psd = psd
+        else:
+            sum_psd += psd
+
+    # scale time to microseconds and add start time as offset
+    time = time * 1.0e6 + timestamps[0]
+
+    image = 10 * np.log10(sum_psd)
+    # Bokeh/JSON can't handle -inf.
+    # Replace any -inf values with the smallest finite number in the
+    # dataset. We aren't using something like INT_MIN because we
+    # don't want to mess up scaling too much.
+    if -np.inf in image:
+        finite_min = np.min(np.ma.masked_invalid(image))
+        image[image == -np.inf] = finite_min
+
+    if len(time) > max_num_data_points:
+        step_size = int(len(time) / max_num_data_points)
+        time = time[::step_size]
+        image = image[:, ::step_size]
+    return time, frequency, image
+
+
+def compute_fft(timestamps, field_data, mean_start_freq, max_num_data_points):
+    """ calculate the amplitude spectrum of several fields
+    (Note: logging dropouts are not taken into account here)
+    :param timestamps: timestamps in [us]
+    :param field_data: list of data arrays
+    :param mean_start_freq: the mean amplitude is calculated above this frequency
+    :param max_num_data_points: downsample the spectra to this size
+    :return: tuple of (max frequency, list of (frequencies, amplitudes, mean))
+    """
+    data_len = len(timestamps)
+    # calculate the sampling frequency
+    delta_t = ((timestamps[-1] - timestamps[0]) * 1.0e-6) / data_len
+    sampling_frequency = 1.0 / delta_t
+    if sampling_frequency < 100 or sampling_frequency == float("inf"): # require min sampling freq
+        raise ValueError('sampling frequency too low ({:} Hz)'.format(sampling_frequency))
+
+    # we use fftw instead of scipy.fft, because it is much faster for
+    # input lengths that factorize into large primes.
+    pyfftw.interfaces.cache.enable()
+
+    freqs = scipy.fftpack.fftfreq(data_len, delta_t)
+    mean_indices = np.argwhere(freqs >= mean_start_freq).flatten()
+    spectra = []
+    for data in field_data:
+        # call FFTW with reduced setup effort (which is faster for our
+        # use-case with varying input lengths)
+        fft_values = 2/data_len*abs(pyfftw.interfaces.numpy_fft.fft(
+            data, planner_effort='FFTW_ESTIMATE'))
+        mean_fft_value = np.mean(fft_values[mean_indices])
+        fft_plot_values = fft_values[:len(freqs)//2]
+        freqs_plot = freqs[:len(freqs)//2]
+        # downsample if necessary
+        if len(fft_plot_values) > max_num_data_points:
+            step_size = int(len(fft_plot_values) / max_num_data_points)
+            fft_plot_values = fft_plot_values[::step_size]
+            freqs_plot = freqs_plot[::step_size]
+        spectra.append((freqs_plot, fft_plot_values, mean_fft_value))
+    return np.max(freqs), spectra
+
+
+def expand_fifo_samples(data):
+    """ expand the samples arrays of a FIFO topic into individual samples
+    :param data: dict of the FIFO topic fields
+    :return: dict with the 'timestamp', 'timestamp_sample', 'x', 'y' and 'z'
+             arrays of the individual samples
+    """
+    t = data['timestamp_sample']
+    dt = data['dt']
+    samples = data['samples'].astype(np.int64)
+    # index of the message and of the sample within the message, per sample
+    msg_index = np.repeat(np.arange(len(t)), samples)
+    sample_index = np.arange(len(msg_index)) - np.repeat(np.cumsum(samples) - samples, samples)
+    max_samples = np.max(samples) if len(samples) > 0 else 0
+
+    sample_offset = (samples[msg_index] - sample_index - 1).astype(dt.dtype)
+    t_new = (t[msg_index] - sample_offset * dt[msg_index]).astype(t.dtype)
+    expanded = {'timestamp': t_new, 'timestamp_sample': t_new}
+    scale = data['scale'][msg_index]
+    for axis in ['x', 'y', 'z']:
+        axis_data = np.stack([data[axis+'['+str(s)+']'] for s in range(max_samples)], axis=-1) \
+            if max_samples > 0 else np.zeros((len(t), 0))
+        expanded[axis] = (axis_data[msg_index, sample_index] * scale).astype(np.float64)
+    return expanded
@@ -16,6 +16,7 @@ from helper import (
     get_total_flight_time, error_labels_table
     )
 from events import get_logged_events
+from topic_registry import get_topic_registry
 
 #pylint: disable=consider-using-enumerate,too-many-statements
 
@@ -60,7 +61,7 @@ def get_heading_html(ulog, px4_ulog, db_data, link_to_3d_page,
         sys_name = escape(ulog.msg_info_dict['sys_name']) + ' '
 
     if link_to_3d_page is not None and \
-        any(elem.name == 'vehicle_gps_position' for elem in ulog.data_list):
+        get_topic_registry(ulog).has_topic('vehicle_gps_position'):
         link_to_3d = ("<a class='btn btn-outline-primary' href='"+
                       link_to_3d_page+"'>Open 3D View</a>")
     else:
@@ -138,7 +139,7 @@ def get_info_table_html(ulog, px4_ulog, db_data, vehicle_data, vtol_states):
     # logging start time & date
     try:
         # get the first non-zero timestamp
-        gps_data = ulog.get_dataset('vehicle_gps_position')
+        gps_data = get_topic_registry(ulog).get_dataset('vehicle_gps_position')
         indices = np.nonzero(gps_data.data['time_utc_usec'])
         if len(indices[0]) > 0:
             # we use the timestamp from the log and then convert it with JS to
@@ -227,7 +228,7 @@ SDLOG_UTC_OFFSET: {}'''.format(utctimestamp.strftime('%d-%m-%Y %H:%M'), utc_offs
     table_text_right = []
     try:
 
-        local_pos = ulog.get_dataset('vehicle_local_position')
+        local_pos = get_topic_registry(ulog).get_dataset('vehicle_local_position')
         pos_x = local_pos.data['x']
         pos_y = local_pos.data['y']
         pos_z = local_pos.data['z']
@@ -288,7 +289,7 @@ SDLOG_UTC_OFFSET: {}'''.format(utctimestamp.strftime('%d-%m-%Y %H:%M'), utc_offs
 
             table_text_right.append(('', '')) # spacing
 
-        vehicle_attitude = ulog.get_dataset('vehicle_attitude')
+        vehicle_attitude = get_topic_registry(ulog).get_dataset('vehicle_attitude')
         roll = vehicle_attitude.data['roll']
         pitch = vehicle_attitude.data['pitch']
         if len(roll) > 0:
@@ -308,7 +309,7 @@ SDLOG_UTC_OFFSET: {}'''.format(utctimestamp.strftime('%d-%m-%Y %H:%M'), utc_offs
 
         table_text_right.append(('', '')) # spacing
 
-        battery_status = ulog.get_dataset('battery_status')
+        battery_status = get_topic_registry(ulog).get_dataset('battery_status')
         battery_current = battery_status.data['current_a']
         if len(battery_current) > 0:
             max_current = np.amax(battery_current)
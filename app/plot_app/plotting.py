@@ -1,6 +1,12 @@
 """ methods an classes used for plotting (wrappers around bokeh plots) """
+import asyncio
 import copy
+import functools
+from timeit import default_timer as timer
+import weakref
 
+from bokeh.document import without_document_lock
+from bokeh.io import curdoc
 from bokeh.plotting import figure
 #pylint: disable=line-too-long, arguments-differ, unused-import
 from bokeh.models import (
@@ -16,20 +22,50 @@ from bokeh.models.widgets import DataTable, DateFormatter, TableColumn
 from bokeh import events
 
 import numpy as np
-import scipy
-import scipy.signal
-import pyfftw
 
+from compact_data import compact_plot_data, print_compaction_stats, \
+    get_timestamp_field, get_timestamp_offset
 from config import debug_verbose_output
-from downsampling import DynamicDownsample
+from downsampling import DynamicTrackDownsample, get_change_point_indices
+from plot_compute import (
+    get_compute_executor, compute_spectrogram, compute_fft, expand_fifo_samples
+    )
 from helper import (
     map_projection, WGS84_to_mercator, flight_modes_table, vtol_modes_table, get_lat_lon_alt_deg
     )
+from shared_data_sources import get_shared_data_sources
+from timing_report import get_timing_report, timed
+from topic_registry import get_topic_registry
+from zoom_scheduler import hold_document
 
 
 TOOLS = "pan,wheel_zoom,box_zoom,reset,save"
 ACTIVE_SCROLL_TOOLS = "wheel_zoom"
 
+# documents for which the DataPlot's are rendered lazily
+_lazy_plot_documents = weakref.WeakSet()
+
+
+def enable_lazy_plots(doc):
+    """ render the DataPlot's that are created for a document lazily: the plots
+    are initially empty, and the data is processed and added once the client
+    requests it (when the plot is scrolled into view, see main.js) """
+    _lazy_plot_documents.add(doc)
+
+
+def _lazy_data_method(method):
+    """ decorator for the DataPlot methods that add data (with field_names as
+    first argument). In lazy mode the call is recorded and executed when the
+    plot is rendered. The field names are expanded right away, so that missing
+    data is still detected here and the field functions see the current values
+    of the variables they use. """
+    @functools.wraps(method)
+    def wrapper(self, field_names, *args, **kwargs):
+        if self._defer_call(method, field_names, args, kwargs): # pylint: disable=protected-access
+            return None
+        return method(self, field_names, *args, **kwargs)
+    return wrapper
+
 
 def plot_dropouts(p, dropouts, min_value, show_hover_tooltips=False):
     """ plot small rectangles with given min_value offset """
@@ -59,42 +95,52 @@ def plot_dropouts(p, dropouts, min_value, show_hover_tooltips=False):
 def add_virtual_fifo_topic_data(ulog, topic_name, instance=0):
     """ adds a virtual topic by expanding the FIFO samples array into individual
         samples, so it can be used for normal plotting.
-        new topic name: topic_name+'_virtual'
+        new topic name: topic_name+'_virtual'. It is added to the topic
+        registry (the ULog object is not modified).
         :return: True if topic data was added
     """
-    try:
-        cur_dataset = copy.deepcopy(ulog.get_dataset(topic_name, instance))
-        cur_dataset.name = topic_name+'_virtual'
-        t = cur_dataset.data['timestamp_sample']
-        dt = cur_dataset.data['dt']
-        samples = cur_dataset.data['samples']
-        scale = cur_dataset.data['scale']
-        total_samples = 0
-        for i in range(len(t)):
-            total_samples += samples[i]
-        t_new = np.zeros(total_samples, t.dtype)
-        xyz_new = [np.zeros(total_samples, np.float64) for i in range(3)]
-        sample = 0
-        # TODO: this could be faster...
-        for i, _ in enumerate(t):
-            for s in range(samples[i]):
-                t_new[sample+s] = t[i]-(samples[i]-s-1)*dt[i]
-                for j, axis in enumerate(['x', 'y', 'z']):
-                    data_point = cur_dataset.data[axis+'['+str(s)+']'][i] * scale[i]
-                    xyz_new[j][sample+s] = data_point
-            sample += samples[i]
-        cur_dataset.data['timestamp'] = t_new
-        cur_dataset.data['timestamp_sample'] = t_new
-        cur_dataset.data['x'] = xyz_new[0]
-        cur_dataset.data['y'] = xyz_new[1]
-        cur_dataset.data['z'] = xyz_new[2]
-        ulog.data_list.append(cur_dataset)
-        return True
-    except (KeyError, IndexError, ValueError) as error:
-        # log does not contain the value we are looking for
-        if debug_verbose_output():
-            print(type(error), "(fifo data):", error)
-        return False
+    return len(add_virtual_fifo_topics(ulog, [(topic_name, instance)])) > 0
+
+
+def add_virtual_fifo_topics(ulog, topics):
+    """ same as add_virtual_fifo_topic_data() for several topics, which are
+        expanded concurrently in the compute thread pool.
+        :param topics: list of (topic_name, instance)
+        :return: list of the (topic_name, instance) that were added
+    """
+    topic_registry = get_topic_registry(ulog)
+    computations = []
+    for topic_name, instance in topics:
+        cur_dataset = topic_registry.find_dataset(topic_name, instance)
+        if cur_dataset is not None:
+            computations.append((cur_dataset, get_compute_executor().submit(
+                _timed_call, get_timing_report(), 'fifo expansion: ' + topic_name,
+                expand_fifo_samples, cur_dataset.data)))
+
+    added_topics = []
+    for cur_dataset, future in computations:
+        try:
+            expanded = future.result()
+        except (KeyError, IndexError, ValueError) as error:
+            # log does not contain the value we are looking for
+            if debug_verbose_output():
+                print(type(error), "(fifo data):", error)
+            continue
+        # shallow copy: the arrays of the original topic are not modified
+        virtual_dataset = copy.copy(cur_dataset)
+        virtual_dataset.data = dict(cur_dataset.data)
+        virtual_dataset.data.update(expanded)
+        virtual_dataset.name = cur_dataset.name+'_virtual'
+        topic_registry.add_topic(virtual_dataset)
+        added_topics.append((cur_dataset.name, cur_dataset.multi_id))
+    return added_topics
+
+
+def _timed_call(timing_report, name, function, *args):
+    """ call function(*args) and add its duration to the timing report as
+    analysis (for functions running in the compute thread pool) """
+    with timed('analysis', name, timing_report):
+        return function(*args)
 
 
 def plot_parameter_changes(p, plots_height, changed_parameters):
@@ -256,7 +302,7 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
     """
 
     try:
-        cur_dataset = ulog.get_dataset('vehicle_gps_position')
+        cur_dataset = get_topic_registry(ulog).get_dataset('vehicle_gps_position')
         t = cur_dataset.data['timestamp']
         indices = cur_dataset.data['fix_type'] > 2 # use only data with a fix
         t = t[indices]
@@ -300,13 +346,14 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
 
             # transform coordinates
             lon, lat = WGS84_to_mercator(lon, lat)
-            data_source = ColumnDataSource(data={'lat': lat, 'lon': lon})
 
             p = figure(tools=TOOLS, active_scroll=ACTIVE_SCROLL_TOOLS)
             p.width = plots_width
             p.height = plots_height
 
             plot_set_equal_aspect_ratio(p, lon, lat)
+            data_source = DynamicTrackDownsample(p, {'lat': lat, 'lon': lon}, 'lon', 'lat',
+                                                 name='vehicle_gps_position').data_source
 
             p.background_fill_color = "lightgray"
             p.axis.visible = False
@@ -350,7 +397,7 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
 
             # try to get the anchor position from the dataset
             try:
-                local_pos_data = ulog.get_dataset('vehicle_local_position')
+                local_pos_data = get_topic_registry(ulog).get_dataset('vehicle_local_position')
                 indices = np.nonzero(local_pos_data.data['ref_timestamp'])
                 if len(indices[0]) > 0:
                     anchor_lat = np.deg2rad(local_pos_data.data['ref_lat'][indices[0][0]])
@@ -360,7 +407,6 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
 
 
             lat, lon = map_projection(lat, lon, anchor_lat, anchor_lon)
-            data_source = ColumnDataSource(data={'lat': lat, 'lon': lon})
 
             if bokeh_plot is None:
                 p = figure(tools=TOOLS, active_scroll=ACTIVE_SCROLL_TOOLS,
@@ -371,6 +417,8 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
                 plot_set_equal_aspect_ratio(p, lon, lat)
             else:
                 p = bokeh_plot
+            data_source = DynamicTrackDownsample(p, {'lat': lat, 'lon': lon}, 'lon', 'lat',
+                                                 name='vehicle_gps_position').data_source
 
             # TODO: altitude line coloring
             p.line(x='lon', y='lat', source=data_source, line_width=2,
@@ -380,7 +428,7 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
         if setpoints:
             # draw (mission) setpoint as circles
             try:
-                cur_dataset = ulog.get_dataset('position_setpoint_triplet')
+                cur_dataset = get_topic_registry(ulog).get_dataset('position_setpoint_triplet')
                 lon = cur_dataset.data['current.lon'] # degrees
                 lat = cur_dataset.data['current.lat']
 
@@ -391,7 +439,12 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
                     lon = np.deg2rad(lon)
                     lat, lon = map_projection(lat, lon, anchor_lat, anchor_lon)
 
-                data_source = ColumnDataSource(data={'lat': lat, 'lon': lon})
+                if map_type == 'google':
+                    data_source = ColumnDataSource(data={'lat': lat, 'lon': lon})
+                else:
+                    data_source = DynamicTrackDownsample(
+                        p, {'lat': lat, 'lon': lon}, 'lon', 'lat',
+                        name='position_setpoint_triplet').data_source
 
                 p.circle(x='lon', y='lat', source=data_source,
                          line_width=2, size=6, line_color=config['mission_setpoint_color'],
@@ -413,6 +466,7 @@ def plot_map(ulog, config, map_type='plain', api_key=None, setpoints=False,
 class DataPlot:
     """
     Handle the bokeh plot generation from an ULog dataset
+    (data is the TopicRegistry of the log)
     """
 
 
@@ -430,7 +484,16 @@ class DataPlot:
         self._plot_height_name = plot_height
         self._data_name = data_name
         self._cur_dataset = None
+        self._dataset_index = 0 # incremented on each change_dataset()
         self._use_time_formatter = True
+        # recorded calls in lazy mode: list of (method, dataset, data_name,
+        # dataset_index, args, kwargs)
+        self._deferred_calls = [] if curdoc() in _lazy_plot_documents else None
+        self._loading_label = None # shown until a lazy plot is rendered
+        # running computations: list of (future, build function), see
+        # _add_computation()
+        self._computations = []
+        self._start_time = timer()
         try:
             self._p = figure(title=title, x_axis_label=x_axis_label,
                              y_axis_label=y_axis_label, tools=TOOLS,
@@ -447,8 +510,7 @@ class DataPlot:
                     plot_parameter_changes(self._p, self.plot_height,
                                            changed_params)
 
-            self._cur_dataset = [elem for elem in data
-                                 if elem.name == data_name and elem.multi_id == topic_instance][0]
+            self._cur_dataset = data.get_dataset(data_name, topic_instance)
 
             if y_start is not None:
                 # make sure y axis starts at y_start. We do it by adding an invisible circle
@@ -499,11 +561,11 @@ class DataPlot:
     def change_dataset(self, data_name, topic_instance=0):
         """ select a new dataset. Afterwards, call add_graph etc """
         self._data_name = data_name
+        self._dataset_index += 1
         if not self._had_error: self._previous_success = True
         self._had_error = False
         try:
-            self._cur_dataset = [elem for elem in self._data
-                                 if elem.name == data_name and elem.multi_id == topic_instance][0]
+            self._cur_dataset = self._data.get_dataset(data_name, topic_instance)
         except (KeyError, IndexError, ValueError) as error:
             if debug_verbose_output():
                 print(type(error), "("+self._data_name+"):", error)
@@ -511,8 +573,9 @@ class DataPlot:
             self._cur_dataset = None
 
 
+    @_lazy_data_method
     def add_graph(self, field_names, colors, legends, use_downsample=True,
-                  mark_nan=False, use_step_lines=False):
+                  mark_nan=False, use_step_lines=False, *, use_change_points=False):
         """ add 1 or more lines to a graph
 
         field_names can be a list of fields from the data set, or a list of
@@ -521,6 +584,10 @@ class DataPlot:
         :param mark_nan: if True, add an indicator to the plot when one of the graphs is NaN
         :param use_step_lines: if True, render step lines (after each point)
         instead of rendering a straight line to the next point
+        :param use_change_points: if True, only send the samples where one of
+        the fields changes (and the last one), rendered as step lines and not
+        downsampled. For flag or state signals that change only occasionally:
+        this is much less data, and short pulses are never lost.
         """
         if self._had_error: return
         try:
@@ -533,25 +600,21 @@ class DataPlot:
                 # look through the data to find NaN's and store their timestamps
                 nan_timestamps = set()
                 for key in field_names_expanded:
-                    nan_indexes = np.argwhere(np.isnan(data_set[key]))
-                    last_index = -2
-                    for ind in nan_indexes:
-                        if last_index + 1 != ind: # store only timestamps at the start of NaN
-                            nan_timestamps.add(data_set['timestamp'][ind][0])
-                        last_index = ind
+                    is_nan = np.isnan(data_set[key])
+                    # store only timestamps at the start of NaN
+                    nan_start = is_nan & np.concatenate(([True], ~is_nan[:-1]))
+                    nan_timestamps.update(data_set['timestamp'][nan_start].tolist())
 
                 nan_color = 'black'
-                for nan_timestamp in nan_timestamps:
-                    nan_line = Span(location=nan_timestamp,
-                                    dimension='height', line_color=nan_color,
-                                    line_dash='dashed', line_width=2)
-                    p.add_layout(nan_line)
                 if len(nan_timestamps) > 0:
                     y_values = [30] * len(nan_timestamps)
                     # NaN label: add a space to separate it from the line
                     names = [' NaN'] * len(nan_timestamps)
                     source = ColumnDataSource(data={'x': np.array(list(nan_timestamps)),
                                                     'names': names, 'y': y_values})
+                    # (a single glyph for all lines, not a Span per NaN)
+                    p.vspan(x='x', source=source, line_color=nan_color,
+                            line_dash='dashed', line_width=2)
                     # plot as text with a fixed screen-space y offset
                     labels = LabelSet(x='x', y='y', text='names',
                                       y_units='screen', level='glyph', text_color=nan_color,
@@ -559,22 +622,25 @@ class DataPlot:
                     p.add_layout(labels)
 
 
-            if use_downsample:
-                # we directly pass the data_set, downsample and then create the
-                # ColumnDataSource object, which is much faster than
-                # first creating ColumnDataSource, and then downsample
-                downsample = DynamicDownsample(p, data_set, 'timestamp')
-                data_source = downsample.data_source
-            else:
-                data_source = ColumnDataSource(data=data_set)
+            if use_change_points:
+                indices = get_change_point_indices(data_set, 'timestamp')
+                data_set = {key: values[indices] for key, values in data_set.items()}
+                use_step_lines = True
+                # downsampling could drop transitions
+                use_downsample = False
+
+            # (the data source is shared with other plots of the same data)
+            data_source = get_shared_data_sources().get_data_source(
+                p, data_set, use_downsample, name=self._data_name)
+            x = get_timestamp_field(get_timestamp_offset(data_set['timestamp']))
 
             for field_name, color, legend in zip(field_names_expanded, colors, legends):
                 if use_step_lines:
-                    p.step(x='timestamp', y=field_name, source=data_source,
+                    p.step(x=x, y=field_name, source=data_source,
                            legend_label=legend, line_width=2, line_color=color,
                            mode="after")
                 else:
-                    p.line(x='timestamp', y=field_name, source=data_source,
+                    p.line(x=x, y=field_name, source=data_source,
                            legend_label=legend, line_width=2, line_color=color)
 
         except (KeyError, IndexError, ValueError) as error:
@@ -582,6 +648,7 @@ class DataPlot:
                 print(type(error), "("+self._data_name+"):", error)
             self._had_error = True
 
+    @_lazy_data_method
     def add_circle(self, field_names, colors, legends):
         """ add circles
 
@@ -593,10 +660,12 @@ class DataPlot:
             data_set = {}
             data_set['timestamp'] = self._cur_dataset.data['timestamp']
             field_names_expanded = self._expand_field_names(field_names, data_set)
-            data_source = ColumnDataSource(data=data_set)
+            data_source = get_shared_data_sources().get_data_source(
+                p, data_set, name=self._data_name)
+            x = get_timestamp_field(get_timestamp_offset(data_set['timestamp']))
 
             for field_name, color, legend in zip(field_names_expanded, colors, legends):
-                p.circle(x='timestamp', y=field_name, source=data_source,
+                p.circle(x=x, y=field_name, source=data_source,
                          legend_label=legend, line_width=2, size=4, line_color=color,
                          fill_color=None)
 
@@ -664,8 +733,133 @@ class DataPlot:
         if self._had_error and not self._previous_success:
             return None
         self._setup_plot()
+        if self._deferred_calls:
+            # lazy mode: the client requests the data by setting the tags
+            self._p.tags = ['lazy']
+            self._p.on_change('tags', self._render_requested)
+            # placeholder until the data is added (this is also an annotation,
+            # so that bokeh does not warn about the missing renderers)
+            self._loading_label = Label(x=10, y=10, x_units='screen', y_units='screen',
+                                        text='Loading...', text_font_size='10pt',
+                                        text_color='gray')
+            self._p.add_layout(self._loading_label)
+        self._add_plot_timing('plot', self._start_time)
         return self._p
 
+    def _get_timing_name(self):
+        """ name of the plot in the timing report """
+        if self._p.title is not None and self._p.title.text: # pylint: disable=no-member
+            return self._p.title.text # pylint: disable=no-member
+        return self._data_name
+
+    def _add_plot_timing(self, category, start_time):
+        timing_report = get_timing_report()
+        if timing_report is not None:
+            timing_report.add_timing(category, self._get_timing_name(),
+                                     timer() - start_time)
+
+    def _defer_call(self, method, field_names, args, kwargs):
+        """ record a call in lazy mode (see _lazy_data_method)
+        :return: True if the call was recorded (or failed) """
+        if self._deferred_calls is None or self._had_error:
+            return False
+        try:
+            data_set = {}
+            field_names_expanded = self._expand_field_names(field_names, data_set)
+        except (KeyError, IndexError, ValueError) as error:
+            if debug_verbose_output():
+                print(type(error), "("+self._data_name+"):", error)
+            self._had_error = True
+            return True
+        dataset = copy.copy(self._cur_dataset)
+        dataset.data = dict(self._cur_dataset.data)
+        dataset.data.update(data_set)
+        self._deferred_calls.append((method, dataset, self._data_name, self._dataset_index,
+                                     (field_names_expanded, ) + args, kwargs))
+        return True
+
+    def _render_requested(self, attr, old, new):
+        if 'render' in new and self._deferred_calls:
+            self._render_deferred_calls()
+
+    def _render_deferred_calls(self):
+        """ execute the recorded calls of lazy mode (the plot is hidden if none
+        of them succeeds) """
+        self._start_time = timer()
+        deferred_calls = self._deferred_calls
+        self._deferred_calls = None
+        num_success = 0
+        cur_dataset_index = None
+        # the plot is in a live document: send the changes of the replay
+        # together (otherwise each add_layout() etc. sends a patch)
+        with hold_document(curdoc()):
+            for method, dataset, data_name, dataset_index, args, kwargs in deferred_calls:
+                if dataset_index != cur_dataset_index: # (same as change_dataset())
+                    cur_dataset_index = dataset_index
+                    self._had_error = False
+                self._cur_dataset = dataset
+                self._data_name = data_name
+                method(self, *args, **kwargs)
+                if not self._had_error:
+                    num_success += 1
+
+            if not self._computations:
+                self._finish_rendering(num_success)
+                return
+        # wait for the results without blocking the server (the document is
+        # not held meanwhile, so that other changes are not delayed)
+        curdoc().add_next_tick_callback(
+            functools.partial(self._wait_for_computations, curdoc(), num_success))
+
+    @without_document_lock
+    async def _wait_for_computations(self, doc, num_success):
+        futures = [asyncio.wrap_future(future) for future, _ in self._computations]
+        await asyncio.gather(*futures, return_exceptions=True)
+        doc.add_next_tick_callback(functools.partial(self._finish_rendering, num_success))
+
+    def _finish_rendering(self, num_success):
+        p = self._p
+        with hold_document(curdoc()):
+            p.center.remove(self._loading_label)
+            if num_success == 0 or not self.complete_computations():
+                p.visible = False
+            elif len(p.legend) > 0:
+                p.legend.click_policy = "hide"
+            p.tags = []
+        print_compaction_stats(curdoc())
+        # (including the time waiting for the computations)
+        self._add_plot_timing('lazy render', self._start_time)
+
+    def _add_computation(self, name, function, args, build):
+        """ start function(*args) in the compute thread pool. build(result) is
+        called with the result to add it to the plot, either from
+        complete_computations() or when rendering a lazy plot.
+        :param name: name of the analysis (for the timing report)
+        """
+        future = get_compute_executor().submit(
+            _timed_call, get_timing_report(), name + ': ' + self._get_timing_name(), function, *args)
+        self._computations.append((future, build))
+
+    def complete_computations(self):
+        """ wait for the computations and add their results to the plot.
+        Call this after finalize() (this is the build phase for the plots that
+        were not rendered lazily).
+        :return: False if all computations failed (the plot should not be shown)
+        """
+        computations = self._computations
+        self._computations = []
+        num_success = 0
+        for future, build in computations:
+            try:
+                build(future.result())
+                num_success += 1
+            except (KeyError, IndexError, ValueError, ZeroDivisionError) as error:
+                if debug_verbose_output():
+                    print(type(error), "(" + self._data_name + "):", error)
+        if len(self._p.legend) > 0:
+            self._p.legend.click_policy = "hide"
+        return num_success > 0 or len(computations) == 0
+
     @property
     def plot_height(self):
         """ get the height of the plot in screen pixels """
@@ -732,7 +926,7 @@ class DataPlot:
 class DataPlot2D(DataPlot):
     """
     A 2D plot (without map)
-    This does not do downsampling.
+    The tracks are simplified to the pixel size (see DynamicTrackDownsample).
     """
 
 
@@ -772,16 +966,18 @@ class DataPlot2D(DataPlot):
                 if np.count_nonzero(x) == 0 and np.count_nonzero(y) == 0:
                     raise ValueError()
 
-            data_source = ColumnDataSource(data={'x': x, 'y': y})
-
-            p.line(x="x", y="y", source=data_source, line_width=2,
-                   line_color=color, legend_label=legend)
-
             if self._is_first_graph:
                 self._is_first_graph = False
                 if self._equal_aspect:
                     plot_set_equal_aspect_ratio(p, x, y)
 
+            # (the ranges must be set before)
+            data_source = DynamicTrackDownsample(p, {'x': x, 'y': y}, 'x', 'y',
+                                                 name=self._data_name).data_source
+
+            p.line(x="x", y="y", source=data_source, line_width=2,
+                   line_color=color, legend_label=legend)
+
         except (KeyError, IndexError, ValueError) as error:
             if debug_verbose_output():
                 print(type(error), "("+self._data_name+"):", error)
@@ -809,6 +1005,7 @@ class DataPlotSpec(DataPlot):
                                            y_axis_label=y_axis_label, title=title, plot_height=plot_height,
                                            x_range=x_range, y_range=y_range, topic_instance=topic_instance)
 
+    @_lazy_data_method
     def add_graph(self, field_names, legends, window='hann', window_length=256, noverlap=128):
         """ add a spectrogram plot to the graph
 
@@ -830,86 +1027,47 @@ class DataPlotSpec(DataPlot):
             if 'timestamp_sample' in self._cur_dataset.data.keys():
                 timestamp_key = 'timestamp_sample'
 
-            data_set[timestamp_key] = self._cur_dataset.data[timestamp_key]
-
-            # calculate the sampling frequency
-            # (Note: logging dropouts are not taken into account here)
-            delta_t = ((data_set[timestamp_key][-1] - data_set[timestamp_key][0]) * 1.0e-6) / len(data_set[timestamp_key])
-            if delta_t < 0.000001: # avoid division by zero
-                self._had_error = True
-                return
-
-            sampling_frequency = int(1.0 / delta_t)
-
-            if sampling_frequency < 100: # require min sampling freq
-                self._had_error = True
-                return
-
             field_names_expanded = self._expand_field_names(field_names, data_set)
 
-            # calculate the spectrogram
-            psd = {}
-            for key in field_names_expanded:
-                frequency, time, psd[key] = scipy.signal.spectrogram(
-                    data_set[key], fs=sampling_frequency, window=window,
-                    nperseg=window_length, noverlap=noverlap, scaling='density')
-
-            # sum all psd's
-            key_it = iter(psd)
-            sum_psd = psd[next(key_it)]
-            for key in key_it:
-                sum_psd += psd[key]
-
-            # offset = int(((1024/2.0)/250.0)*1e6)
-            # scale time to microseconds and add start time as offset
-            time = time * 1.0e6 + self._cur_dataset.data[timestamp_key][0]
-
-            inner_image = 10 * np.log10(sum_psd)
-            # Bokeh/JSON can't handle -inf.
-            # Replace any -inf values with the smallest finite number in the
-            # dataset. We aren't using something like INT_MIN because we
-            # don't want to mess up scaling too much.
-            if -np.inf in inner_image:
-                finite_min = np.min(np.ma.masked_invalid(inner_image))
-                inner_image[inner_image == -np.inf] = finite_min
-            image = [inner_image]
-
-            title = self.title
-            for legend in legends:
-                title += " " + legend
-            title += " [dB]"
-
             # assume maximal data points per pixel at full resolution
             max_num_data_points = 2.0*self._config['plot_width']
-            if len(time) > max_num_data_points:
-                step_size = int(len(time) / max_num_data_points)
-                time = time[::step_size]
-                image[0] = image[0][:, ::step_size]
-
-            color_mapper = LinearColorMapper(palette="Viridis256", low=np.amin(image), high=np.amax(image))
-
-            self._p.y_range = Range1d(frequency[0], frequency[-1])
-            self._p.toolbar_location = 'above'
-            self._p.image(image=image, x=time[0], y=frequency[0], dw=(time[-1]-time[0]),
-                          dh=(frequency[-1]-frequency[0]), color_mapper=color_mapper)
-            color_bar = ColorBar(color_mapper=color_mapper,
-                                 major_label_text_font_size="5pt",
-                                 ticker=BasicTicker(desired_num_ticks=5),
-                                 formatter=PrintfTickFormatter(format="%f"),
-                                 title='[dB]',
-                                 label_standoff=6, border_line_color=None, location=(0, 0))
-            self._p.add_layout(color_bar, 'right')
-
-            # add plot zoom tool that only zooms in time axis
-            wheel_zoom = WheelZoomTool()
-            self._p.toolbar.tools = [PanTool(), wheel_zoom, BoxZoomTool(), ResetTool(), SaveTool()]   # updated_tools
-            self._p.toolbar.active_scroll = wheel_zoom
+            self._add_computation(
+                'spectrogram',
+                functools.partial(compute_spectrogram, window=window,
+                                  window_length=window_length, noverlap=noverlap),
+                (self._cur_dataset.data[timestamp_key],
+                 [data_set[key] for key in field_names_expanded], max_num_data_points),
+                self._add_spectrogram)
 
         except (KeyError, IndexError, ValueError, ZeroDivisionError) as error:
             if debug_verbose_output():
                 print(type(error), "(" + self._data_name + "):", error)
             self._had_error = True
 
+    def _add_spectrogram(self, result):
+        """ add the result of compute_spectrogram() to the plot """
+        time, frequency, inner_image = result
+        image = [compact_plot_data({'image': inner_image})['image']]
+
+        color_mapper = LinearColorMapper(palette="Viridis256", low=np.amin(image), high=np.amax(image))
+
+        self._p.y_range = Range1d(frequency[0], frequency[-1])
+        self._p.toolbar_location = 'above'
+        self._p.image(image=image, x=time[0], y=frequency[0], dw=(time[-1]-time[0]),
+                      dh=(frequency[-1]-frequency[0]), color_mapper=color_mapper)
+        color_bar = ColorBar(color_mapper=color_mapper,
+                             major_label_text_font_size="5pt",
+                             ticker=BasicTicker(desired_num_ticks=5),
+                             formatter=PrintfTickFormatter(format="%f"),
+                             title='[dB]',
+                             label_standoff=6, border_line_color=None, location=(0, 0))
+        self._p.add_layout(color_bar, 'right')
+
+        # add plot zoom tool that only zooms in time axis
+        wheel_zoom = WheelZoomTool()
+        self._p.toolbar.tools = [PanTool(), wheel_zoom, BoxZoomTool(), ResetTool(), SaveTool()]   # updated_tools
+        self._p.toolbar.active_scroll = wheel_zoom
+
 class DataPlotFFT(DataPlot):
     """
     An FFT plot.
@@ -928,6 +1086,7 @@ class DataPlotFFT(DataPlot):
                                           x_range=x_range, y_range=y_range, topic_instance=topic_instance)
         self._use_time_formatter = False
 
+    @_lazy_data_method
     def add_graph(self, field_names, colors, legends):
         """ add an FFT plot to the graph
 
@@ -946,59 +1105,38 @@ class DataPlotFFT(DataPlot):
             if 'timestamp_sample' in self._cur_dataset.data.keys():
                 timestamp_key = 'timestamp_sample'
 
-            data_set[timestamp_key] = self._cur_dataset.data[timestamp_key]
-            data_len = len(data_set[timestamp_key])
-
-            # calculate the sampling frequency
-            # (Note: logging dropouts are not taken into account here)
-            delta_t = ((data_set[timestamp_key][-1] - data_set[timestamp_key][0]) * 1.0e-6) / data_len
-            sampling_frequency = 1.0 / delta_t
-
-            if sampling_frequency < 100 or sampling_frequency == float("inf"): # require min sampling freq
-                self._had_error = True
-                return
-
             field_names_expanded = self._expand_field_names(field_names, data_set)
 
-
-            # we use fftw instead of scipy.fft, because it is much faster for
-            # input lengths that factorize into large primes.
-            pyfftw.interfaces.cache.enable()
-
-            freqs = scipy.fftpack.fftfreq(data_len, delta_t)
             mean_start_freq = 40
-            plot_data = []
-            for field_name, color, legend in zip(field_names_expanded, colors, legends):
-                # call FFTW with reduced setup effort (which is faster for our
-                # use-case with varying input lengths)
-                fft_values = 2/data_len*abs(pyfftw.interfaces.numpy_fft.fft(
-                    data_set[field_name], planner_effort='FFTW_ESTIMATE'))
-                mean_fft_value = np.mean(fft_values[np.argwhere(freqs >= mean_start_freq).flatten()])
-                legend = legend + " (mean above {:} Hz: {:.2f})".format(mean_start_freq, mean_fft_value)
-                plot_data.append((fft_values, mean_fft_value, legend, color))
-
-            for fft_values, mean_fft_value, legend, color in plot_data:
-                fft_plot_values = fft_values[:len(freqs)//2]
-                freqs_plot = freqs[:len(freqs)//2]
-                # downsample if necessary
-                max_num_data_points = 3.0*self._config['plot_width']
-                if len(fft_plot_values) > max_num_data_points:
-                    step_size = int(len(fft_plot_values) / max_num_data_points)
-                    fft_plot_values = fft_plot_values[::step_size]
-                    freqs_plot = freqs_plot[::step_size]
-                self._p.line(freqs_plot, fft_plot_values, # pylint: disable=too-many-function-args
-                             line_color=color, line_width=2, legend_label=legend, alpha=0.8)
-            # plot the mean lines above the fft graphs
-            for fft_values, mean_fft_value, legend, color in plot_data:
-                self._p.line([mean_start_freq, np.max(freqs)], # pylint: disable=too-many-function-args
-                             [mean_fft_value, mean_fft_value],
-                             line_color=color, line_width=2, legend_label=legend)
+            self._add_computation(
+                'fft', compute_fft,
+                (self._cur_dataset.data[timestamp_key],
+                 [data_set[key] for key in field_names_expanded],
+                 mean_start_freq, 3.0*self._config['plot_width']),
+                functools.partial(self._add_spectra, colors, legends, mean_start_freq))
 
         except (KeyError, IndexError, ValueError, ZeroDivisionError) as error:
             if debug_verbose_output():
                 print(type(error), "(" + self._data_name + "):", error)
             self._had_error = True
 
+    def _add_spectra(self, colors, legends, mean_start_freq, result):
+        """ add the result of compute_fft() to the plot """
+        max_freq, spectra = result
+        plot_data = []
+        for (freqs_plot, fft_plot_values, mean_fft_value), color, legend in \
+                zip(spectra, colors, legends):
+            legend = legend + " (mean above {:} Hz: {:.2f})".format(mean_start_freq, mean_fft_value)
+            plot_data.append((mean_fft_value, legend, color))
+            spectrum = compact_plot_data({'x': freqs_plot, 'y': fft_plot_values})
+            self._p.line(spectrum['x'], spectrum['y'], # pylint: disable=too-many-function-args
+                         line_color=color, line_width=2, legend_label=legend, alpha=0.8)
+        # plot the mean lines above the fft graphs
+        for mean_fft_value, legend, color in plot_data:
+            self._p.line([mean_start_freq, max_freq], # pylint: disable=too-many-function-args
+                         [mean_fft_value, mean_fft_value],
+                         line_color=color, line_width=2, legend_label=legend)
+
     def mark_frequency(self, frequency, label, y_screen_offset=0):
         """
         Add a vertical line with a label to mark a certain frequency
@@ -0,0 +1,130 @@
+""" Background prefetching of logs that are likely to be viewed soon """
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+
+from tornado.ioloop import PeriodicCallback
+import tornado.process
+
+from config import get_db_filename, get_prefetch_num_logs, get_ulog_disk_cache_enabled
+from helper import get_log_filename, cache_ulog_file, get_worker_process_context
+from ulog_cache import get_cached_ulog_size, read_cached_ulog
+
+# priorities (lower is more important)
+PRIORITY_UPLOAD = 0
+PRIORITY_BROWSE = 1
+PRIORITY_RECENT = 2
+
+RECENT_LOGS_INTERVAL_MS = 10*60*1000
+
+
+def _init_worker_process():
+    """ the worker process runs with the lowest priority """
+    try:
+        os.nice(19)
+    except OSError:
+        pass
+
+
+def prefetch_ulog_file(file_name):
+    """ prefetch a log, this runs in the worker process: parse it into the disk
+    cache (if not cached yet) and read the cache entry """
+    if get_cached_ulog_size(file_name) is None:
+        cache_ulog_file(file_name)
+    read_cached_ulog(file_name)
+
+
+class Prefetcher:
+    """
+    Prefetches logs into the ULog disk cache, so that the first viewer does
+    not have to wait for the parsing.
+
+    The work is done in a worker process with the lowest CPU priority, so that
+    it does not compete with interactive requests (and not for the GIL of the
+    server). The logs are not loaded into the RAM cache: the disk cache entries
+    are memory-mapped, and reading them in the worker puts them into the OS
+    page cache, which is shared by all server processes. A background thread
+    passes the queued logs to the worker, one at a time.
+    """
+
+    def __init__(self):
+        self._queue = queue.PriorityQueue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        # start the worker right away
+        self._executor = ProcessPoolExecutor(
+            max_workers=1, initializer=_init_worker_process,
+            mp_context=get_worker_process_context())
+        self._executor.submit(os.getpid)
+        self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+
+    def start(self):
+        """ start the prefetching thread """
+        self._thread.start()
+
+    def add(self, log_ids, priority):
+        """ add logs to prefetch """
+        with self._lock:
+            for log_id in log_ids:
+                if log_id in self._queued:
+                    continue
+                self._queued.add(log_id)
+                self._queue.put((priority, next(self._counter), log_id))
+
+    def _run(self):
+        while True:
+            _, _, log_id = self._queue.get()
+            with self._lock:
+                self._queued.discard(log_id)
+            try:
+                self._prefetch(log_id)
+            except Exception as error:
+                print('Prefetching {} failed: {}'.format(log_id, error))
+
+    def _prefetch(self, log_id):
+        file_name = get_log_filename(log_id)
+        if not os.path.exists(file_name):
+            return
+        self._executor.submit(prefetch_ulog_file, file_name).result()
+
+
+_prefetcher = {'prefetcher': None}
+
+def start_prefetcher():
+    """ start prefetching (if enabled), beginning with the recent public logs.
+    Must be called from the IOLoop thread. With multiple server processes
+    (--num-procs), only the first process prefetches, as the disk cache is
+    shared (the other ones ignore prefetch_logs()). """
+    if get_prefetch_num_logs() <= 0 or not get_ulog_disk_cache_enabled():
+        return
+    task_id = tornado.process.task_id()
+    if task_id is not None and task_id != 0:
+        return
+    prefetcher = Prefetcher()
+    prefetcher.start()
+    _prefetcher['prefetcher'] = prefetcher
+    prefetch_recent_logs()
+    PeriodicCallback(prefetch_recent_logs, RECENT_LOGS_INTERVAL_MS).start()
+
+def prefetch_logs(log_ids, priority):
+    """ prefetch logs in the background (no-op if prefetching is disabled) """
+    prefetcher = _prefetcher['prefetcher']
+    if prefetcher is not None:
+        prefetcher.add(log_ids[:get_prefetch_num_logs()], priority)
+
+def prefetch_recent_logs():
+    """ prefetch the most recently uploaded public logs """
+    if _prefetcher['prefetcher'] is None:
+        return
+    con = sqlite3.connect(get_db_filename())
+    cur = con.cursor()
+    cur.execute('select Id from Logs where Public = 1 and not Source = "CI" '
+                'order by Date desc limit ?', [get_prefetch_num_logs()])
+    log_ids = [db_tuple[0] for db_tuple in cur.fetchall()]
+    cur.close()
+    con.close()
+    prefetch_logs(log_ids, PRIORITY_RECENT)
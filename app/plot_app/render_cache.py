@@ -0,0 +1,195 @@
+""" Disk cache for fully built plot page documents """
+import copyreg
+from functools import lru_cache
+import glob
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+import weakref
+
+import bokeh
+import numpy as np
+from bokeh.core.serialization import Buffer
+from bokeh.document import Document
+
+from config import get_render_cache_filepath, get_render_cache_enabled, \
+    get_render_cache_size, get_render_cache_max_entry_size
+from timing_report import get_timing_report, timed
+
+# bump this whenever the stored format changes
+RENDER_CACHE_VERSION = 1
+
+# server-side state of the documents being built: key=Document,
+# value=list of (restore function, state)
+_restore_callbacks = weakref.WeakKeyDictionary()
+
+
+def add_restore_callback(doc, function, state):
+    """ register server-side state of a document that is not part of the
+    document itself (e.g. python callbacks). When the document is restored from
+    the cache, function(doc, state) is called to re-create it.
+    :param function: module-level function (must be picklable)
+    :param state: picklable state, models should be referenced by id
+    """
+    _restore_callbacks.setdefault(doc, []).append((function, state))
+
+
+@lru_cache(maxsize=1)
+def get_code_version():
+    """ get a hash over everything that affects the rendered documents: the
+    plotting code, the configuration and the bokeh version """
+    sha = hashlib.sha1()
+    sha.update('{}-{}'.format(RENDER_CACHE_VERSION, bokeh.__version__).encode('utf-8'))
+    cur_dir = os.path.dirname(os.path.realpath(__file__))
+    file_names = sorted(glob.glob(os.path.join(cur_dir, '*.py'))) + \
+        [os.path.join(cur_dir, '../config_default.ini'),
+         os.path.join(cur_dir, '../config_user.ini')]
+    for file_name in file_names:
+        if os.path.exists(file_name):
+            with open(file_name, 'rb') as source_file:
+                sha.update(source_file.read())
+    return sha.hexdigest()
+
+
+def get_render_cache_key(log_id, ulog_file_name, *args):
+    """ get the cache key of a plot page
+    :param args: everything else that affects the page (plots page, DB data, ...)
+    :return: key (str)
+    """
+    stat = os.stat(ulog_file_name)
+    key_data = [get_code_version(), log_id, stat.st_size, stat.st_mtime_ns] + list(args)
+    return hashlib.sha1(repr(key_data).encode('utf-8')).hexdigest()
+
+
+def _get_log_dir(log_id):
+    # log ids are validated, but in local mode they can be file paths
+    return os.path.join(get_render_cache_filepath(),
+                        hashlib.sha1(log_id.encode('utf-8')).hexdigest()[:16])
+
+
+def _get_file_name(log_id, key):
+    return os.path.join(_get_log_dir(log_id), key + '.pickle')
+
+
+def store_rendered_document(log_id, key, doc):
+    """ store a document (with template variables, title and the registered
+    server-side state) in the cache. Errors are not fatal. """
+    if not get_render_cache_enabled():
+        return
+    with timed('stage', 'store render cache', get_timing_report(doc)):
+        _store_rendered_document(log_id, key, doc)
+
+def _estimate_size(value, seen_ids):
+    """ estimate the size of a (nested) value in bytes from its arrays, buffers
+    and strings, counting each object once """
+    if id(value) in seen_ids:
+        return 0
+    if isinstance(value, (np.ndarray, Buffer)):
+        seen_ids.add(id(value))
+        return value.nbytes if isinstance(value, np.ndarray) else len(value.data)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_estimate_size(v, seen_ids) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_size(v, seen_ids) for v in value)
+    return 0
+
+def _store_rendered_document(log_id, key, doc):
+    file_name = _get_file_name(log_id, key)
+    temp_file_name = file_name + '.tmp' + str(uuid.uuid4())
+    try:
+        entry = {
+            'doc': doc.to_json(),
+            'title': doc.title,
+            'template_variables': dict(doc.template_variables),
+            'restore_callbacks': _restore_callbacks.get(doc, []),
+            }
+        # the full-resolution data of the downsampled plots dominates the size
+        entry_size = _estimate_size(entry, set())
+        max_entry_size = get_render_cache_max_entry_size() * 1024 * 1024
+        if entry_size > max_entry_size:
+            print('Not storing {} in the render cache: too large ({:.0f} MB)'.format(
+                log_id, entry_size / 1024 / 1024))
+            return
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(temp_file_name, 'wb') as cache_file:
+            pickler = pickle.Pickler(cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            # the (binary) array buffers of the document
+            pickler.dispatch_table = copyreg.dispatch_table.copy()
+            pickler.dispatch_table[Buffer] = lambda buf: (Buffer, (buf.id, buf.to_bytes()))
+            pickler.dump(entry)
+        os.replace(temp_file_name, file_name)
+    except Exception as error:
+        print('Failed to write render cache {}: {}'.format(file_name, error))
+        if os.path.exists(temp_file_name):
+            os.unlink(temp_file_name)
+        return
+    prune_render_cache()
+
+
+def restore_rendered_document(log_id, key, doc):
+    """ restore a cached document into doc (which must be empty)
+    :return: True on success, False if not cached
+    """
+    if not get_render_cache_enabled():
+        return False
+    with timed('stage', 'restore render cache', get_timing_report(doc)):
+        return _restore_rendered_document(log_id, key, doc)
+
+def _restore_rendered_document(log_id, key, doc):
+    file_name = _get_file_name(log_id, key)
+    try:
+        with open(file_name, 'rb') as cache_file:
+            entry = pickle.load(cache_file)
+        cached_doc = Document.from_json(entry['doc'])
+    except FileNotFoundError:
+        return False
+    except Exception as error: # corrupt entry
+        print('Failed to read render cache {}: {}'.format(file_name, error))
+        os.unlink(file_name)
+        return False
+
+    # mark as recently used (for pruning)
+    os.utime(file_name)
+
+    # move the models over to the session document
+    roots = list(cached_doc.roots)
+    cached_doc.clear()
+    for root in roots:
+        doc.add_root(root)
+    doc.title = entry['title']
+    doc.template_variables.update(entry['template_variables'])
+    for function, state in entry['restore_callbacks']:
+        function(doc, state)
+    return True
+
+
+def delete_rendered_documents(log_id):
+    """ remove all cached documents of a log (after it changed) """
+    shutil.rmtree(_get_log_dir(log_id), ignore_errors=True)
+
+
+def prune_render_cache():
+    """ remove least recently used entries until the cache fits into the
+    configured size """
+    max_size = get_render_cache_size() * 1024 * 1024
+    entries = [] # (last access time, size, path)
+    for file_name in glob.glob(os.path.join(get_render_cache_filepath(), '*', '*.pickle')):
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError: # deleted concurrently
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file_name))
+    total_size = sum(entry[1] for entry in entries)
+    entries.sort()
+    for _, size, file_name in entries:
+        if total_size <= max_size:
+            break
+        try:
+            os.unlink(file_name)
+        except FileNotFoundError:
+            pass
+        total_size -= size
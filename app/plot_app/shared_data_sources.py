@@ -0,0 +1,100 @@
+""" Data sources shared between the plots of a document """
+import weakref
+
+from bokeh.io import curdoc
+from bokeh.models import ColumnDataSource
+
+from compact_data import compact_plot_data, get_timestamp_offset
+from downsampling import DynamicDownsample, STARTUP_DENSITY, get_downsampling_indices
+from timing_report import get_timing_report
+
+_document_data_sources = weakref.WeakKeyDictionary()
+
+
+class SharedDataSources:
+    """
+    Data sources of a document. Plots that show data of the same topic instance
+    (the same timestamps) use the same ColumnDataSource, which contains the
+    fields of all these plots. So the timestamps and the fields that are shown
+    in several plots are only sent once to the client.
+    Fields are identified by name and array object: a plot with a different
+    array under an existing name (e.g. a unit conversion) gets another source.
+    The downsampled samples are selected with all the fields of a source (see
+    get_downsampling_indices()).
+    """
+
+    def __init__(self):
+        # key: (use_downsample, plot width, id of the timestamps), value: list
+        # of [data, ColumnDataSource, selected samples (slice or index array),
+        # downsampling step size]. The data is stored to keep the arrays (and
+        # thus their id's) alive.
+        self._data_sources = {}
+
+    def get_data_source(self, bokeh_plot, data, use_downsample=True, name=None):
+        """ get the ColumnDataSource for a plot, with the dynamic downsampling
+        set up if use_downsample is True (see DynamicDownsample)
+        :param data: dict of numpy arrays, with a 'timestamp' field
+        :param name: name of the data (for the timing report)
+        :return: ColumnDataSource, its timestamps are sent relative to
+                 get_timestamp_offset(data['timestamp'])
+        """
+        key = (use_downsample, bokeh_plot.width if use_downsample else None,
+               id(data['timestamp']))
+        timestamp_offset = get_timestamp_offset(data['timestamp'])
+        entries = self._data_sources.setdefault(key, [])
+        for entry in entries:
+            shared_data, data_source, indices, step_size = entry
+            if all(shared_data.get(name, values) is values for name, values in data.items()):
+                new_names = [name for name in data if name not in shared_data]
+                if len(new_names) > 0:
+                    shared_data.update(data)
+                    if use_downsample:
+                        # the selected samples can change with the new fields
+                        new_indices, step_size = get_downsampling_indices(
+                            shared_data, 'timestamp', bokeh_plot.width * STARTUP_DENSITY)
+                        if not isinstance(new_indices, slice) or new_indices != indices:
+                            indices = new_indices
+                            new_names = list(shared_data)
+                        entry[2:] = [indices, step_size]
+                    new_fields = {name: shared_data[name][indices] for name in new_names}
+                    data_source.data.update(compact_plot_data(new_fields, timestamp_offset))
+                    _add_points(name, new_fields)
+                if use_downsample:
+                    DynamicDownsample(bokeh_plot, data, 'timestamp', data_source=data_source,
+                                      last_step_size=step_size, name=name,
+                                      timestamp_offset=timestamp_offset)
+                return data_source
+
+        if use_downsample:
+            indices, step_size = get_downsampling_indices(
+                data, 'timestamp', bokeh_plot.width * STARTUP_DENSITY)
+            data_source = ColumnDataSource(data=compact_plot_data(
+                {name: values[indices] for name, values in data.items()}, timestamp_offset))
+            DynamicDownsample(bokeh_plot, data, 'timestamp', data_source=data_source,
+                              last_step_size=step_size, name=name,
+                              timestamp_offset=timestamp_offset)
+        else:
+            indices, step_size = slice(None), 1
+            data_source = ColumnDataSource(data=compact_plot_data(data, timestamp_offset))
+        entries.append([dict(data), data_source, indices, step_size])
+        _add_points(name, data_source.data)
+        return data_source
+
+
+def _add_points(name, data):
+    """ add the number of data points sent to the timing report """
+    timing_report = get_timing_report()
+    if timing_report is not None:
+        timing_report.add_points(name or 'unnamed',
+                                 sum(len(values) for values in data.values()))
+
+
+def get_shared_data_sources(doc=None):
+    """ get the SharedDataSources of a document (default: the current one) """
+    if doc is None:
+        doc = curdoc()
+    data_sources = _document_data_sources.get(doc)
+    if data_sources is None:
+        data_sources = SharedDataSources()
+        _document_data_sources[doc] = data_sources
+    return data_sources
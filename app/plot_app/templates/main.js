@@ -123,6 +123,34 @@ function setupPlots() {
 	});
 
 
+	// lazy plots (tagged with 'lazy'): request the data from the server once
+	// a plot is (nearly) scrolled into view
+	var lazy_plot_views = new Map(); // Map with {dom-element, plot-view} items
+	function request_plot_data(plot_view) {
+		plot_view.model.tags = ['render'];
+	}
+	var lazy_plot_observer = null;
+	if ('IntersectionObserver' in window) {
+		lazy_plot_observer = new IntersectionObserver(function(entries, observer) {
+			entries.forEach(function(entry) {
+				if (entry.isIntersecting) {
+					observer.unobserve(entry.target);
+					request_plot_data(lazy_plot_views.get(entry.target));
+				}
+			});
+		}, { rootMargin: '500px 0px' });
+	}
+	foreach_plot_view(root, function(plot_view) {
+		if (plot_view.model.tags.includes('lazy')) {
+			if (lazy_plot_observer) {
+				lazy_plot_views.set(plot_view.el, plot_view);
+				lazy_plot_observer.observe(plot_view.el);
+			} else {
+				request_plot_data(plot_view);
+			}
+		}
+	});
+
 	$('#loading-plots').hide();
 
 	$('#show-additional-data-btn').click(function(){
@@ -0,0 +1,183 @@
+""" Timing instrumentation of the plot pages: a JSON report per session """
+from contextlib import contextmanager
+import glob
+import json
+import os
+import threading
+import time
+from timeit import default_timer as timer
+import uuid
+import weakref
+
+from bokeh.io import curdoc
+import numpy as np
+
+from config import get_timing_reports_enabled, get_timing_reports_max, \
+    get_timing_reports_filepath
+
+_document_reports = weakref.WeakKeyDictionary()
+
+# upper bucket edges of the aggregated histograms [s]
+_HISTOGRAM_EDGES = [0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1, 3, 10, 30]
+
+
+class TimingReport:
+    """
+    Timings of a plot page session, by category ('stage', 'load', 'plot',
+    'analysis') and name, and the number of data points sent per topic.
+    Timings with the same name are accumulated.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.page = None
+        self.log_id = None
+        self._created = time.time()
+        self._timings = {} # key: category, value: dict of name: [count, seconds]
+        self._points = {} # key: topic name, value: number of data points
+        self._lock = threading.Lock() # timings are added from compute threads
+
+    def add_timing(self, category, name, duration):
+        """ add a duration [s] """
+        with self._lock:
+            timing = self._timings.setdefault(category, {}).setdefault(name, [0, 0.])
+            timing[0] += 1
+            timing[1] += duration
+
+    def add_points(self, name, num_points):
+        """ add a number of data points sent to the client """
+        with self._lock:
+            self._points[name] = self._points.get(name, 0) + num_points
+
+    def to_json_dict(self):
+        """ get the report as JSON-serializable dict """
+        with self._lock:
+            return {
+                'session_id': self.session_id,
+                'page': self.page,
+                'log_id': self.log_id,
+                'created': self._created,
+                'timings': {category: {name: {'count': count, 'seconds': seconds}
+                                       for name, (count, seconds) in timings.items()}
+                            for category, timings in self._timings.items()},
+                'points': dict(self._points),
+                }
+
+    def store(self):
+        """ write the report to the reports directory and delete the oldest
+        reports. Errors are not fatal. """
+        directory = get_timing_reports_filepath()
+        file_name = os.path.join(directory, '{:.0f}-{}.json'.format(
+            self._created * 1000, self.session_id))
+        temp_file_name = file_name + '.tmp' + str(uuid.uuid4())
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(temp_file_name, 'w', encoding='utf-8') as report_file:
+                json.dump(self.to_json_dict(), report_file)
+            os.replace(temp_file_name, file_name)
+            for old_file_name in _get_report_file_names()[:-get_timing_reports_max()]:
+                os.unlink(old_file_name)
+        except OSError as error:
+            print('Failed to write timing report {}: {}'.format(file_name, error))
+            if os.path.exists(temp_file_name):
+                os.unlink(temp_file_name)
+
+
+def start_timing_report(doc):
+    """ create the timing report of a session's document (if enabled). It is
+    stored when the session ends.
+    :return: TimingReport or None
+    """
+    if not get_timing_reports_enabled():
+        return None
+    report = TimingReport(doc.session_context.id)
+    _document_reports[doc] = report
+    doc.on_session_destroyed(lambda session_context: report.store())
+    return report
+
+
+def get_timing_report(doc=None):
+    """ get the timing report of a document (default: the current one)
+    :return: TimingReport or None
+    """
+    return _document_reports.get(curdoc() if doc is None else doc)
+
+
+@contextmanager
+def timed(category, name, report=None):
+    """ context manager that adds the duration of its body to a timing report
+    (by default the one of the current document, if any) """
+    if report is None:
+        report = get_timing_report()
+    if report is None:
+        yield
+        return
+    start_time = timer()
+    try:
+        yield
+    finally:
+        report.add_timing(category, name, timer() - start_time)
+
+
+def _get_report_file_names():
+    """ get the stored reports, oldest first """
+    return sorted(glob.glob(os.path.join(get_timing_reports_filepath(), '*.json')),
+                  key=os.path.basename)
+
+
+def load_timing_report(session_id):
+    """ load a stored report (as dict)
+    :return: dict or None if not found
+    """
+    for file_name in glob.glob(os.path.join(get_timing_reports_filepath(),
+                                            '*-{}.json'.format(session_id))):
+        with open(file_name, 'r', encoding='utf-8') as report_file:
+            return json.load(report_file)
+    return None
+
+
+def aggregate_timing_reports():
+    """ aggregate the stored reports: per category and name, statistics and a
+    histogram of the durations per session (and the mean number of data points
+    sent per topic)
+    :return: dict
+    """
+    durations = {}
+    points = {}
+    num_reports = 0
+    for file_name in _get_report_file_names():
+        try:
+            with open(file_name, 'r', encoding='utf-8') as report_file:
+                report = json.load(report_file)
+        except (OSError, ValueError):
+            continue # deleted or being written
+        num_reports += 1
+        for category, timings in report['timings'].items():
+            for name, timing in timings.items():
+                durations.setdefault(category, {}).setdefault(name, []).append(
+                    timing['seconds'])
+        for name, num_points in report['points'].items():
+            points.setdefault(name, []).append(num_points)
+
+    timings = {}
+    for category, category_durations in durations.items():
+        timings[category] = {}
+        for name, values in category_durations.items():
+            values = np.array(values)
+            counts = np.bincount(np.searchsorted(_HISTOGRAM_EDGES, values),
+                                 minlength=len(_HISTOGRAM_EDGES) + 1)
+            timings[category][name] = {
+                'count': len(values),
+                'mean': float(np.mean(values)),
+                'p50': float(np.percentile(values, 50)),
+                'p90': float(np.percentile(values, 90)),
+                'max': float(np.max(values)),
+                'histogram': counts.tolist(),
+                }
+    return {
+        'num_reports': num_reports,
+        'histogram_edges': _HISTOGRAM_EDGES,
+        'timings': timings,
+        'points': {name: {'count': len(values), 'mean': float(np.mean(values))}
+                   for name, values in points.items()},
+        }
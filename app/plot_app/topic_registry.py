@@ -0,0 +1,74 @@
+""" Index of the topics of a ULog object """
+
+from derived_signals import get_derived_signals, get_derived_dataset
+
+
+class TopicRegistry:
+    """
+    Index of the topics (ULog.Data) of a ULog object, keyed by
+    (name, multi_id), so that topic and field lookups do not need to scan the
+    data list. Iterating over it returns the datasets (like ULog.data_list).
+
+    The topics contain the derived fields (see get_derived_dataset()).
+    Virtual topics (e.g. the expanded FIFO samples) are added with
+    add_topic(): they replace an existing topic with the same name and instance
+    and are only visible through the registry (the ULog object is not
+    modified).
+    """
+
+    def __init__(self, data_list):
+        self._topics = {} # key: (name, multi_id), value: ULog.Data
+        self._num_instances = {} # key: name, value: number of instances
+        for dataset in data_list:
+            self.add_topic(dataset)
+
+    def __iter__(self):
+        return iter(self._topics.values())
+
+    def __len__(self):
+        return len(self._topics)
+
+    def has_topic(self, *names):
+        """ check if any of the given topics exists (any instance) """
+        return any(name in self._num_instances for name in names)
+
+    def has_field(self, name, field_name, multi_id=0):
+        """ check if a topic instance exists and has a given field """
+        dataset = self._topics.get((name, multi_id))
+        return dataset is not None and field_name in dataset.data
+
+    def get_dataset(self, name, multi_id=0):
+        """ get a topic instance
+        :raises KeyError: if the topic (instance) does not exist
+        """
+        return self._topics[(name, multi_id)]
+
+    def find_dataset(self, name, multi_id=0):
+        """ get a topic instance or None """
+        return self._topics.get((name, multi_id))
+
+    def add_topic(self, dataset):
+        """ add (or replace) a topic instance """
+        key = (dataset.name, dataset.multi_id)
+        if key not in self._topics:
+            self._num_instances[dataset.name] = self._num_instances.get(dataset.name, 0) + 1
+        self._topics[key] = dataset
+
+    def remove_topic(self, name, multi_id=0):
+        """ remove a topic instance (if it exists) """
+        if self._topics.pop((name, multi_id), None) is not None:
+            self._num_instances[name] -= 1
+            if self._num_instances[name] == 0:
+                del self._num_instances[name]
+
+
+def get_topic_registry(ulog):
+    """ get the TopicRegistry of a ULog object. It is created on first use and
+    then stays with the object. """
+    registry = getattr(ulog, 'topic_registry', None)
+    if registry is None:
+        signals = get_derived_signals(ulog)
+        registry = TopicRegistry([get_derived_dataset(dataset, signals)
+                                  for dataset in ulog.data_list])
+        ulog.topic_registry = registry
+    return registry
@@ -0,0 +1,432 @@
+""" Caches for parsed ULog files.
+
+ULogMemoryCache is the per-process RAM cache with a byte budget (it stores
+CompactULog objects).
+
+The persistent on-disk cache stores memory-mapped columns. It is shared by all
+server processes: the column files are memory-mapped read-only
+(copy-on-write), so the OS page cache holds a single copy of each log, no
+matter how many processes use it.
+"""
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from importlib.metadata import version, PackageNotFoundError
+
+import numpy as np
+from pyulog import ULog
+
+from config import get_ulog_cache_filepath, get_ulog_disk_cache_enabled, \
+    get_ulog_disk_cache_size, get_log_cache_memory
+
+#pylint: disable=protected-access
+
+# bump this whenever the on-disk layout changes
+CACHE_VERSION = 1
+
+_META_FILE_NAME = 'meta.pickle'
+_PRUNE_LOCK_FILE_NAME = 'prune.lock'
+_LOCK_FILE_SUFFIX = '.lock'
+
+# ULog attributes that are stored in the metadata file. The topic data is
+# stored separately, subscriptions are only needed while parsing.
+_ULOG_META_ATTRIBUTES = [
+    '_debug', '_file_corrupt', '_start_timestamp', '_last_timestamp',
+    '_msg_info_dict', '_msg_info_dict_types', '_msg_info_multiple_dict',
+    '_msg_info_multiple_dict_types', '_initial_parameters', '_default_parameters',
+    '_changed_parameters', '_message_formats', '_logged_messages',
+    '_logged_messages_tagged', '_dropouts', '_filtered_message_ids',
+    '_missing_message_ids', '_file_version', '_compat_flags', '_incompat_flags',
+    '_appended_offsets', '_has_sync', '_sync_seq_cnt']
+
+
+def _read_int_from_file(file_name):
+    try:
+        with open(file_name, encoding='utf-8') as limit_file:
+            return int(limit_file.read().strip())
+    except (OSError, ValueError): # does not exist or 'max'
+        return None
+
+
+def get_available_memory():
+    """ get the memory available to this process in bytes: the minimum of the
+    physical memory and the cgroup (container) limit """
+    limits = []
+    try:
+        limits.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES'))
+    except (ValueError, OSError):
+        pass
+    for cgroup_file in ['/sys/fs/cgroup/memory.max', # cgroup v2
+                        '/sys/fs/cgroup/memory/memory.limit_in_bytes']: # cgroup v1
+        limit = _read_int_from_file(cgroup_file)
+        if limit is not None:
+            limits.append(limit)
+    if len(limits) == 0:
+        return 4 * 1024**3 # fallback, we don't know
+    return min(limits)
+
+
+def get_memory_budget(num_processes=1):
+    """ get the byte budget for the RAM cache of a server process (from the
+    config). The configured memory is shared by all num_processes server
+    processes, each of them gets an equal part. """
+    cache_memory = get_log_cache_memory()
+    if cache_memory == 'auto':
+        # leave enough room for the plotting sessions
+        total_bytes = get_available_memory() // 4
+    else:
+        total_bytes = int(cache_memory) * 1024 * 1024
+    return total_bytes // max(num_processes, 1)
+
+
+class ULogMemoryCache:
+    """
+    Thread-safe RAM cache, bounded in bytes. The entries must have an nbytes
+    attribute (memory footprint of the data, without memory-mapped data). It
+    can grow while an entry is cached (e.g. memoized derived signals), the
+    sizes are updated when adding an entry.
+
+    Eviction is size-weighted LRU: the entry with the largest
+    (time since last access) * (size) is removed first, so large logs that are
+    not viewed anymore go first.
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {} # key: file name, value: [value, nbytes, last access]
+        self._resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ get a cached entry or None """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry[2] = time.monotonic()
+            return entry[0]
+
+    def put(self, key, value):
+        """ add an entry and evict others if over budget """
+        with self._lock:
+            self._entries[key] = [value, value.nbytes, time.monotonic()]
+            self._update_sizes()
+            self._evict(keep=key)
+
+    def _update_sizes(self):
+        self._resident_bytes = 0
+        for entry in self._entries.values():
+            entry[1] = entry[0].nbytes
+            self._resident_bytes += entry[1]
+
+    def _evict(self, keep):
+        now = time.monotonic()
+        while self._resident_bytes > self._max_bytes and len(self._entries) > 1:
+            key = max((k for k in self._entries if k != keep),
+                      key=lambda k: (now - self._entries[k][2] + 1) * self._entries[k][1])
+            self._resident_bytes -= self._entries.pop(key)[1]
+            self.evictions += 1
+
+    def set_max_bytes(self, max_bytes):
+        """ change the budget (entries are evicted if over the new budget) """
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict(keep=None)
+
+    def free_bytes(self):
+        """ get the remaining budget in bytes """
+        with self._lock:
+            self._update_sizes()
+            return max(self._max_bytes - self._resident_bytes, 0)
+
+    def contains(self, key):
+        """ check if an entry exists (does not count as access) """
+        with self._lock:
+            return key in self._entries
+
+    def remove(self, key):
+        """ remove an entry (if it exists) """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._resident_bytes -= entry[1]
+
+    def clear(self):
+        """ remove all entries """
+        with self._lock:
+            self._entries.clear()
+            self._resident_bytes = 0
+
+    def info(self):
+        """ get the cache statistics as dict. mapped_bytes and original_bytes
+        are the memory-mapped and the uncompressed size of the entries (if
+        they have mapped_nbytes and original_nbytes attributes). """
+        with self._lock:
+            values = [entry[0] for entry in self._entries.values()]
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'entries': len(self._entries),
+                    'resident_bytes': self._resident_bytes,
+                    'mapped_bytes': sum(getattr(value, 'mapped_nbytes', 0)
+                                        for value in values),
+                    'original_bytes': sum(getattr(value, 'original_nbytes', 0)
+                                          for value in values),
+                    'max_bytes': self._max_bytes}
+
+
+def _get_pyulog_version():
+    try:
+        return version('pyulog')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def get_cache_version_key(msg_filter):
+    """ get a string identifying the cache format: changes whenever the cache
+    version, the pyulog version or the message filter list changes """
+    filter_str = ','.join(sorted(msg_filter)) if msg_filter is not None else '*'
+    filter_hash = hashlib.sha1(filter_str.encode('utf-8')).hexdigest()[:12]
+    return '{}-{}-{}'.format(CACHE_VERSION, _get_pyulog_version(), filter_hash)
+
+
+def get_cache_dir(file_name):
+    """ get the cache directory for a given ULog file name """
+    abs_file_name = os.path.realpath(file_name)
+    name = os.path.splitext(os.path.basename(abs_file_name))[0]
+    path_hash = hashlib.sha1(abs_file_name.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(get_ulog_cache_filepath(), name + '_' + path_hash)
+
+
+def _get_file_signature(file_name):
+    stat = os.stat(file_name)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+@contextmanager
+def ulog_cache_lock(file_name):
+    """ inter-process lock for a single log file. Used to make sure only one
+    process parses a log while the others wait for the cache entry. """
+    if not get_ulog_disk_cache_enabled():
+        yield
+        return
+    os.makedirs(get_ulog_cache_filepath(), exist_ok=True)
+    lock_file_name = get_cache_dir(file_name) + _LOCK_FILE_SUFFIX
+    while True:
+        with open(lock_file_name, 'w', encoding='utf-8') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # prune_ulog_cache() might have removed the file while waiting
+            if _is_same_file(lock_file, lock_file_name):
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                return
+
+
+def _is_same_file(opened_file, file_name):
+    try:
+        return os.fstat(opened_file.fileno()).st_ino == os.stat(file_name).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def load_cached_ulog(file_name, msg_filter):
+    """ load a ULog object from the disk cache.
+    :return: ULog object or None if not cached (or the cache is outdated)
+    """
+    if not get_ulog_disk_cache_enabled():
+        return None
+    cache_dir = get_cache_dir(file_name)
+    try:
+        file_signature = _get_file_signature(file_name)
+        with open(os.path.join(cache_dir, _META_FILE_NAME), 'rb') as meta_file:
+            meta = pickle.load(meta_file)
+    except FileNotFoundError:
+        return None
+    except Exception as error: # corrupt cache entry
+        print('Failed to read ULog cache {}: {}'.format(cache_dir, error))
+        delete_cached_ulog(file_name)
+        return None
+
+    if meta.get('version_key') != get_cache_version_key(msg_filter) or \
+            meta.get('file_signature') != file_signature:
+        delete_cached_ulog(file_name)
+        return None
+
+    ulog = ULog(None)
+    for attribute, value in meta['ulog'].items():
+        setattr(ulog, attribute, value)
+
+    try:
+        data_list = []
+        for i, topic in enumerate(meta['topics']):
+            data = ULog.Data.__new__(ULog.Data)
+            data.multi_id = topic['multi_id']
+            data.msg_id = topic['msg_id']
+            data.name = topic['name']
+            data.field_data = topic['field_data']
+            data.timestamp_idx = topic['timestamp_idx']
+            data.data = {}
+            for j, field_name in enumerate(topic['columns']):
+                # copy-on-write mapping: callers may modify the arrays in place
+                data.data[field_name] = np.load(
+                    os.path.join(cache_dir, '{}_{}.npy'.format(i, j)), mmap_mode='c')
+            data_list.append(data)
+    except (OSError, ValueError) as error:
+        # (a missing file: the entry was replaced or removed meanwhile)
+        if not isinstance(error, FileNotFoundError):
+            print('Failed to read ULog cache {}: {}'.format(cache_dir, error))
+            delete_cached_ulog(file_name)
+        return None
+    ulog._data_list = data_list
+
+    # mark as recently used (for pruning)
+    os.utime(cache_dir)
+    return ulog
+
+
+def get_cached_ulog_size(file_name):
+    """ get the size in bytes of the disk cache entry of a ULog file.
+    :return: size or None if not cached
+    """
+    cache_dir = get_cache_dir(file_name)
+    if not get_ulog_disk_cache_enabled() or \
+            not os.path.exists(os.path.join(cache_dir, _META_FILE_NAME)):
+        return None
+    return _get_dir_size(cache_dir)
+
+
+def read_cached_ulog(file_name):
+    """ read the files of the disk cache entry of a ULog file (if it exists),
+    so that they are in the OS page cache """
+    cache_dir = get_cache_dir(file_name)
+    buffer = bytearray(1024 * 1024)
+    try:
+        for entry in os.scandir(cache_dir):
+            with open(entry.path, 'rb') as cache_file:
+                while cache_file.readinto(buffer) > 0:
+                    pass
+    except FileNotFoundError: # not cached or deleted concurrently
+        pass
+
+
+def store_cached_ulog(file_name, ulog, msg_filter):
+    """ store a parsed ULog object in the disk cache. Errors are not fatal. """
+    if not get_ulog_disk_cache_enabled():
+        return
+    cache_dir = get_cache_dir(file_name)
+    temp_dir = cache_dir + '.tmp' + str(uuid.uuid4())
+    try:
+        os.makedirs(temp_dir)
+        topics = []
+        for i, data in enumerate(ulog.data_list):
+            columns = list(data.data.keys())
+            for j, field_name in enumerate(columns):
+                np.save(os.path.join(temp_dir, '{}_{}.npy'.format(i, j)),
+                        np.ascontiguousarray(data.data[field_name]))
+            topics.append({'name': data.name, 'multi_id': data.multi_id,
+                           'msg_id': data.msg_id, 'field_data': data.field_data,
+                           'timestamp_idx': data.timestamp_idx, 'columns': columns})
+
+        meta = {
+            'version_key': get_cache_version_key(msg_filter),
+            'file_signature': _get_file_signature(file_name),
+            'ulog': {attribute: getattr(ulog, attribute)
+                     for attribute in _ULOG_META_ATTRIBUTES},
+            'topics': topics,
+            }
+        with open(os.path.join(temp_dir, _META_FILE_NAME), 'wb') as meta_file:
+            pickle.dump(meta, meta_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # swap the directories by renaming, so that readers never see a
+        # partial entry (only no entry for a moment, then they parse the log)
+        old_dir = cache_dir + '.tmp' + str(uuid.uuid4())
+        try:
+            os.rename(cache_dir, old_dir)
+        except FileNotFoundError: # not cached yet
+            old_dir = None
+        os.rename(temp_dir, cache_dir)
+        if old_dir is not None:
+            # processes that still have the files mapped keep their data
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception as error:
+        print('Failed to write ULog cache {}: {}'.format(cache_dir, error))
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return
+
+    prune_ulog_cache(keep=cache_dir)
+
+
+def _get_dir_size(path):
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path)
+                   if entry.is_file())
+    except FileNotFoundError: # deleted concurrently
+        return 0
+
+
+def prune_ulog_cache(keep=None):
+    """ remove least recently used entries until the disk cache fits into the
+    configured size. The budget is global for all processes.
+    :param keep: cache directory that must not be removed
+    """
+    cache_path = get_ulog_cache_filepath()
+    max_size = get_ulog_disk_cache_size() * 1024 * 1024
+    with open(os.path.join(cache_path, _PRUNE_LOCK_FILE_NAME), 'w',
+              encoding='utf-8') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        entries = [] # (last access time, size, path)
+        lock_file_names = []
+        for entry in os.scandir(cache_path):
+            if entry.is_dir() and '.tmp' not in entry.name:
+                entries.append((entry.stat().st_mtime, _get_dir_size(entry.path),
+                                entry.path))
+            elif entry.name.endswith(_LOCK_FILE_SUFFIX) and \
+                    entry.name != _PRUNE_LOCK_FILE_NAME:
+                lock_file_names.append(entry.path)
+        total_size = sum(entry[1] for entry in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= max_size:
+                break
+            if path == keep:
+                continue
+            # processes that still have the files mapped keep their data
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+        for lock_file_name in lock_file_names:
+            _remove_unused_lock_file(lock_file_name)
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _remove_unused_lock_file(lock_file_name):
+    """ remove the lock file of a log without cache entry (e.g. pruned or
+    failed to parse), unless it is in use """
+    if os.path.exists(lock_file_name[:-len(_LOCK_FILE_SUFFIX)]):
+        return
+    try:
+        with open(lock_file_name, 'a', encoding='utf-8') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError: # locked by another process
+                return
+            if _is_same_file(lock_file, lock_file_name):
+                os.unlink(lock_file_name)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        pass
+
+
+def delete_cached_ulog(file_name):
+    """ remove the disk cache entry of a ULog file (if it exists) """
+    shutil.rmtree(get_cache_dir(file_name), ignore_errors=True)
@@ -1,8 +1,13 @@
 """ VTOL tailsitter attitude and rate correction code """
 
+from functools import partial
+
 from scipy.spatial.transform import Rotation as Rot
 import numpy as np
 
+from derived_signals import get_derived_signals
+from topic_registry import get_topic_registry
+
 def tailsitter_orientation(ulog, vtol_states):
     """
     corrections for VTOL tailsitter attitude and rates
@@ -10,10 +15,16 @@ def tailsitter_orientation(ulog, vtol_states):
     rather than consistently reported in estimated and setpoint
     use setpoint values as ground truth here and correct estimated by 90 degrees
     rates also need yaw and roll swapped with a -1 on roll axis
+    (the result is memoized per log and must not be modified)
     """
+    return get_derived_signals(ulog).get(
+        ('tailsitter_orientation', tuple(tuple(state) for state in vtol_states)),
+        partial(_tailsitter_orientation, get_topic_registry(ulog), vtol_states))
+
+def _tailsitter_orientation(topic_registry, vtol_states):
     # correct attitudes for VTOL tailsitter in FW mode
     try:
-        cur_dataset = ulog.get_dataset('vehicle_attitude')
+        cur_dataset = topic_registry.get_dataset('vehicle_attitude')
         quat_0 = cur_dataset.data['q[0]']
         quat_1 = cur_dataset.data['q[1]']
         quat_2 = cur_dataset.data['q[2]']
@@ -75,10 +86,11 @@ def tailsitter_orientation(ulog, vtol_states):
 
     # correct angular rates for VTOL tailsitter in FW mode
     try:
-        cur_dataset = ulog.get_dataset('vehicle_angular_velocity')
-        w_r = cur_dataset.data['xyz[0]']
+        cur_dataset = topic_registry.get_dataset('vehicle_angular_velocity')
+        # copies: the logged data must not be modified
+        w_r = np.copy(cur_dataset.data['xyz[0]'])
         w_p = cur_dataset.data['xyz[1]']
-        w_y = cur_dataset.data['xyz[2]']
+        w_y = np.copy(cur_dataset.data['xyz[2]'])
         w_t = cur_dataset.data['timestamp']
 
         # fw rates (roll and yaw swap, roll is negative axis)
@@ -0,0 +1,101 @@
+""" Batched zoom updates of the dynamically downsampled plots of a document """
+from contextlib import contextmanager
+from timeit import default_timer as timer
+import weakref
+
+from bokeh.io import curdoc
+
+from config import get_zoom_update_delay
+from timing_report import timed
+
+_document_schedulers = weakref.WeakKeyDictionary()
+
+# zoom updates are delayed at most this many times the configured delay (so
+# that continuous panning still updates)
+_MAX_DELAY_FACTOR = 3
+
+
+@contextmanager
+def hold_document(doc):
+    """ context manager that holds the changes of a document and sends them
+    combined (one patch per changed property) at the end, also on errors. Does
+    nothing if the document is already held. """
+    if doc.callbacks.hold_value is not None:
+        yield
+        return
+    doc.hold('combine')
+    try:
+        yield
+    finally:
+        doc.unhold()
+
+
+class ZoomScheduler:
+    """
+    Zoom updates of a document. Bokeh triggers separate 'start' and 'end'
+    changes of a range (and wheel zooming many in a row), so a single zoom
+    gesture would update each downsampled data source of a plot several times.
+    Instead, changes of the ranges are collected until zooming paused for the
+    configured delay, then the data sources of all changed ranges are updated
+    in one batch, with the document changes held and sent together at the end.
+    """
+
+    def __init__(self):
+        # key: id of the range, value: (range, list of downsamplers)
+        self._downsamplers = {}
+        self._changed_ranges = set() # ids of the ranges to update
+        self._timeout = None # pending update callback
+        self._first_change_time = 0
+
+    def add(self, downsampler, plot_range):
+        """ update a downsampler (DynamicDownsample or DynamicTrackDownsample,
+        with its update_range() method) when plot_range (an x or y range) changes """
+        if plot_range.id not in self._downsamplers:
+            self._downsamplers[plot_range.id] = (plot_range, [])
+            def range_changed(attr, old, new):
+                self._range_changed(plot_range.id)
+            plot_range.on_change('start', range_changed)
+            plot_range.on_change('end', range_changed)
+        self._downsamplers[plot_range.id][1].append(downsampler)
+
+    def _range_changed(self, range_id):
+        self._changed_ranges.add(range_id)
+        doc = curdoc()
+        delay = get_zoom_update_delay()
+        if delay <= 0:
+            if self._timeout is None:
+                self._timeout = doc.add_next_tick_callback(self._update)
+            return
+
+        now = timer()
+        if self._timeout is None:
+            self._first_change_time = now
+        elif now - self._first_change_time < delay * _MAX_DELAY_FACTOR / 1000:
+            doc.remove_timeout_callback(self._timeout)
+        else:
+            return # waited long enough, do not postpone the update further
+        self._timeout = doc.add_timeout_callback(self._update, delay)
+
+    def _update(self):
+        self._timeout = None
+        changed_ranges = self._changed_ranges
+        self._changed_ranges = set()
+        # (a downsampler can depend on several ranges, update it once)
+        downsamplers = {}
+        for range_id in changed_ranges:
+            for downsampler in self._downsamplers[range_id][1]:
+                downsamplers[id(downsampler)] = downsampler
+        with timed('stage', 'zoom callback'), hold_document(curdoc()):
+            for downsampler in downsamplers.values():
+                downsampler.update_range()
+
+
+def get_zoom_scheduler(doc=None):
+    """ get the ZoomScheduler of a document (default: the current one) """
+    if doc is None:
+        doc = curdoc()
+    scheduler = _document_schedulers.get(doc)
+    if scheduler is None:
+        scheduler = ZoomScheduler()
+        _document_schedulers[doc] = scheduler
+    return scheduler
@@ -12,6 +12,8 @@ import datetime
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'plot_app'))
 from plot_app.config import get_db_filename, get_overview_img_filepath
 from plot_app.helper import get_log_filename
+from plot_app.ulog_cache import delete_cached_ulog
+from plot_app.render_cache import delete_rendered_documents
 
 
 parser = argparse.ArgumentParser(description='Remove old log files & DB entries')
@@ -74,6 +76,7 @@ with con:
         print('Removing '+log_id)
         # db entry
         cur.execute("DELETE FROM LogsGenerated WHERE Id = ?", (log_id,))
+        cur.execute("DELETE FROM IngestJobs WHERE Id = ?", (log_id,))
         cur.execute("DELETE FROM Logs WHERE Id = ?", (log_id,))
         num_deleted = cur.rowcount
         if num_deleted != 1:
@@ -82,6 +85,8 @@ with con:
 
         # and the log file
         ulog_file_name = get_log_filename(log_id)
+        delete_cached_ulog(ulog_file_name)
+        delete_rendered_documents(log_id)
         os.unlink(ulog_file_name)
         #and preview image if exist
         preview_image_filename=os.path.join(get_overview_img_filepath(), log_id+'.png')
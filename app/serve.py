@@ -27,8 +27,13 @@ from tornado_handlers.db_info_json import DBInfoHandler
 from tornado_handlers.three_d import ThreeDHandler
 from tornado_handlers.radio_controller import RadioControllerHandler
 from tornado_handlers.error_labels import UpdateErrorLabelHandler
+from tornado_handlers.ingest import start_ingest_queue
+from tornado_handlers.ingest_status import IngestStatusHandler
+from tornado_handlers.timing_reports import TimingReportsHandler
 
 from helper import set_log_id_is_filename, print_cache_info #pylint: disable=C0411
+from helper import set_num_server_processes #pylint: disable=C0411
+from prefetch import start_prefetcher #pylint: disable=C0411
 from config import debug_print_timing, get_overview_img_filepath #pylint: disable=C0411
 
 #pylint: disable=invalid-name
@@ -73,100 +78,119 @@ parser.add_argument('--allow-websocket-origin', action='append', type=str, metav
                     help="""Public hostnames which may connect to the Bokeh websocket""",
                     default=None)
 
-args = parser.parse_args()
-
-# This should remain here until --host is removed entirely
-_fixup_deprecated_host_args(args)
-
-applications = {}
-main_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'plot_app')
-handler = DirectoryHandler(filename=main_path)
-applications['/plot_app'] = Application(handler)
-
-server_kwargs = {}
-if args.port is not None: server_kwargs['port'] = args.port
-if args.use_xheaders: server_kwargs['use_xheaders'] = args.use_xheaders
-server_kwargs['num_procs'] = args.numprocs
-if args.address is not None: server_kwargs['address'] = args.address
-if args.host is not None: server_kwargs['host'] = args.host
-if args.allow_websocket_origin is not None:
-    server_kwargs['allow_websocket_origin'] = args.allow_websocket_origin
-server_kwargs['websocket_max_message_size'] = 100 * 1024 * 1024
-
-# increase the maximum upload size (default is 100MB)
-server_kwargs['http_server_kwargs'] = {'max_buffer_size': 300 * 1024 * 1024}
-
-
-show_ulog_file = False
-show_3d_page = False
-show_pid_analysis_page = False
-if args.file is not None:
-    ulog_file = os.path.abspath(args.file)
-    show_ulog_file = True
-    args.show = True
-    show_3d_page = args.threed
-    show_pid_analysis_page = args.pid_analysis
-
-set_log_id_is_filename(show_ulog_file)
-
-
-# additional request handlers
-extra_patterns = [
-    (r'/upload', UploadHandler),
-    (r'/browse', BrowseHandler),
-    (r'/browse_data_retrieval', BrowseDataRetrievalHandler),
-    (r'/3d', ThreeDHandler),
-    (r'/radio_controller', RadioControllerHandler),
-    (r'/edit_entry', EditEntryHandler),
-    (r'/?', UploadHandler), #root should point to upload
-    (r'/download', DownloadHandler),
-    (r'/dbinfo', DBInfoHandler),
-    (r'/error_label', UpdateErrorLabelHandler),
-    (r"/stats", RedirectHandler, {"url": "/plot_app?stats=1"}),
-    (r'/overview_img/(.*)', StaticFileHandler, {'path': get_overview_img_filepath()}),
-]
-
-server = None
-custom_port = 5006
-while server is None:
-    try:
-        server = Server(applications, extra_patterns=extra_patterns, **server_kwargs)
-    except OSError as e:
-        # if we get a port bind error and running locally with '-f',
-        # automatically select another port (useful for opening multiple logs)
-        if e.errno == errno.EADDRINUSE and show_ulog_file:
-            custom_port += 1
-            server_kwargs['port'] = custom_port
-        else:
-            raise
-
-if args.show:
-    # we have to defer opening in browser until we start up the server
-    def show_callback():
-        """ callback to open a browser window after server is fully initialized"""
-        if show_ulog_file:
-            if show_3d_page:
-                server.show('/3d?log='+ulog_file)
-            elif show_pid_analysis_page:
-                server.show('/plot_app?plots=pid_analysis&log='+ulog_file)
-            else:
-                server.show('/plot_app?log='+ulog_file)
-        else:
-            server.show('/upload')
-    server.io_loop.add_callback(show_callback)
-
-
-if debug_print_timing():
-    def print_statistics():
-        """ print ulog cache info once per hour """
-        print_cache_info()
-        server.io_loop.call_later(60*60, print_statistics)
-    server.io_loop.call_later(60, print_statistics)
-
-# run_until_shutdown has been added 0.12.4 and is the preferred start method
-run_op = getattr(server, "run_until_shutdown", None)
-if callable(run_op):
-    server.run_until_shutdown()
-else:
-    server.start()
 
+def main():
+    """ start the server """
+    args = parser.parse_args()
+
+    # This should remain here until --host is removed entirely
+    _fixup_deprecated_host_args(args)
+
+    applications = {}
+    main_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'plot_app')
+    handler = DirectoryHandler(filename=main_path)
+    applications['/plot_app'] = Application(handler)
+
+    server_kwargs = {}
+    if args.port is not None: server_kwargs['port'] = args.port
+    if args.use_xheaders: server_kwargs['use_xheaders'] = args.use_xheaders
+    server_kwargs['num_procs'] = args.numprocs
+    if args.address is not None: server_kwargs['address'] = args.address
+    if args.host is not None: server_kwargs['host'] = args.host
+    if args.allow_websocket_origin is not None:
+        server_kwargs['allow_websocket_origin'] = args.allow_websocket_origin
+    server_kwargs['websocket_max_message_size'] = 100 * 1024 * 1024
+
+    # increase the maximum upload size (default is 100MB)
+    server_kwargs['http_server_kwargs'] = {'max_buffer_size': 300 * 1024 * 1024}
+
+
+    show_ulog_file = False
+    show_3d_page = False
+    show_pid_analysis_page = False
+    if args.file is not None:
+        ulog_file = os.path.abspath(args.file)
+        show_ulog_file = True
+        args.show = True
+        show_3d_page = args.threed
+        show_pid_analysis_page = args.pid_analysis
+
+    set_log_id_is_filename(show_ulog_file)
+
+    # the server processes share the RAM cache budget (0 means one per core)
+    set_num_server_processes(args.numprocs if args.numprocs > 0 else os.cpu_count())
+
+
+    # additional request handlers
+    extra_patterns = [
+        (r'/upload', UploadHandler),
+        (r'/browse', BrowseHandler),
+        (r'/browse_data_retrieval', BrowseDataRetrievalHandler),
+        (r'/3d', ThreeDHandler),
+        (r'/radio_controller', RadioControllerHandler),
+        (r'/edit_entry', EditEntryHandler),
+        (r'/?', UploadHandler), #root should point to upload
+        (r'/download', DownloadHandler),
+        (r'/dbinfo', DBInfoHandler),
+        (r'/error_label', UpdateErrorLabelHandler),
+        (r'/ingest_status', IngestStatusHandler),
+        (r'/admin/timing', TimingReportsHandler),
+        (r"/stats", RedirectHandler, {"url": "/plot_app?stats=1"}),
+        (r'/overview_img/(.*)', StaticFileHandler, {'path': get_overview_img_filepath()}),
+    ]
+
+    server = None
+    custom_port = 5006
+    while server is None:
+        try:
+            server = Server(applications, extra_patterns=extra_patterns, **server_kwargs)
+        except OSError as e:
+            # if we get a port bind error and running locally with '-f',
+            # automatically select another port (useful for opening multiple logs)
+            if e.errno == errno.EADDRINUSE and show_ulog_file:
+                custom_port += 1
+                server_kwargs['port'] = custom_port
+            else:
+                raise
+
+    if args.show:
+        # we have to defer opening in browser until we start up the server
+        def show_callback():
+            """ callback to open a browser window after server is fully initialized"""
+            if show_ulog_file:
+                if show_3d_page:
+                    server.show('/3d?log='+ulog_file)
+                elif show_pid_analysis_page:
+                    server.show('/plot_app?plots=pid_analysis&log='+ulog_file)
+                else:
+                    server.show('/plot_app?log='+ulog_file)
+            else:
+                server.show('/upload')
+        server.io_loop.add_callback(show_callback)
+
+    # (no uploads when showing a single file)
+    if not show_ulog_file:
+        # background processing of uploaded logs
+        server.io_loop.add_callback(start_ingest_queue)
+
+        # warm up the caches with the logs that are likely to be viewed next
+        server.io_loop.add_callback(start_prefetcher)
+
+    if debug_print_timing():
+        def print_statistics():
+            """ print ulog cache info once per hour """
+            print_cache_info()
+            server.io_loop.call_later(60*60, print_statistics)
+        server.io_loop.call_later(60, print_statistics)
+
+    # run_until_shutdown has been added 0.12.4 and is the preferred start method
+    run_op = getattr(server, "run_until_shutdown", None)
+    if callable(run_op):
+        server.run_until_shutdown()
+    else:
+        server.start()
+
+
+if __name__ == '__main__':
+    # (the background worker processes import this file as well)
+    main()
@@ -144,5 +144,31 @@ with con:
                 "FlightTime INTEGER, " # latest flight time in seconds
                 "CONSTRAINT UUID_PK PRIMARY KEY (UUID))")
 
+
+    # IngestJobs table (background processing of uploaded logs)
+    cur.execute("PRAGMA table_info('IngestJobs')")
+    columns = cur.fetchall()
+
+    if len(columns) == 0:
+        cur.execute("CREATE TABLE IngestJobs("
+                "Id TEXT, " # log id
+                "Status TEXT, " # 'pending', 'running', 'done' or 'failed'
+                "Step TEXT, " # current (or last) processing step
+                "Attempts INT, " # number of started attempts
+                "Error TEXT, " # error message of the last failed attempt
+                "Created TIMESTAMP, "
+                "Updated TIMESTAMP, "
+                "Data TEXT, " # JSON with upload information (for the emails)
+                "EmailsSent TEXT DEFAULT '', " # comma-separated list of the sent emails
+                "CONSTRAINT Id_PK PRIMARY KEY (Id))")
+
+    else:
+        # try to upgrade
+        column_names = [ x[1] for x in columns]
+
+        if not 'EmailsSent' in column_names:
+            print('Adding column EmailsSent')
+            cur.execute("ALTER TABLE IngestJobs ADD COLUMN EmailsSent TEXT DEFAULT ''")
+
 con.close()
 
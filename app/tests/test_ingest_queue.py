@@ -0,0 +1,113 @@
+""" Tests of the ingest queue (tornado_handlers/ingest.py). Run from app/ with:
+python -m unittest discover -s tests -t .
+"""
+import datetime
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from tornado.ioloop import IOLoop
+from tornado import gen
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
+from tornado_handlers import ingest #pylint: disable=wrong-import-position
+
+
+def _slow_ingest_job(log_id):
+    """ replaces run_ingest_job in the (forked) workers """
+    time.sleep(1)
+    return log_id
+
+
+class IngestQueueTest(unittest.TestCase):
+    """ IngestQueue with a DB in a temporary directory """
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._db_filename = os.path.join(self._temp_dir.name, 'logs.sqlite')
+        con = sqlite3.connect(self._db_filename)
+        con.execute("CREATE TABLE IngestJobs(Id TEXT, Status TEXT, Step TEXT, "
+                    "Attempts INT, Error TEXT, Created TIMESTAMP, Updated TIMESTAMP, "
+                    "Data TEXT, EmailsSent TEXT DEFAULT '', "
+                    "CONSTRAINT Id_PK PRIMARY KEY (Id))")
+        con.commit()
+        con.close()
+        # the workers are forked directly, so that they inherit the patches
+        patches = [
+            mock.patch.object(ingest, 'get_db_filename', lambda: self._db_filename),
+            mock.patch.object(ingest, 'get_worker_process_context',
+                              lambda: multiprocessing.get_context('fork')),
+            mock.patch.object(ingest, 'run_ingest_job', _slow_ingest_job),
+            mock.patch.object(ingest, 'prefetch_logs', lambda *args: None),
+            mock.patch.object(ingest, 'delete_log', lambda *args, **kwargs: None),
+            ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _add_job(self, log_id):
+        now = datetime.datetime.now()
+        con = sqlite3.connect(self._db_filename)
+        con.execute("insert into IngestJobs (Id, Status, Step, Attempts, Error, Created, "
+                    "Updated, Data) values (?, 'pending', '', 0, '', ?, ?, '{}')",
+                    [log_id, now, now])
+        con.commit()
+        con.close()
+
+    def _get_jobs(self):
+        con = sqlite3.connect(self._db_filename)
+        jobs = {log_id: (status, attempts) for log_id, status, attempts in
+                con.execute('select Id, Status, Attempts from IngestJobs')}
+        con.close()
+        return jobs
+
+    def test_worker_killed(self):
+        """ a worker dies while two jobs are in flight: no new jobs are started
+        until the pool is recreated, and all jobs are eventually done """
+        queue = ingest.IngestQueue(num_workers=3, max_attempts=3)
+
+        async def run():
+            self._add_job('a')
+            self._add_job('b')
+            queue.start()
+            await gen.sleep(0.5)
+            self.assertEqual(self._get_jobs(), {'a': ('running', 1), 'b': ('running', 1)})
+
+            # kill a worker, and wait (without running the IOLoop) until the
+            # pool noticed, so that the failed jobs are not reported yet
+            # pylint: disable=protected-access
+            executor = queue._executor
+            os.kill(list(executor._processes)[0], signal.SIGKILL)
+            for _ in range(100):
+                if executor._broken:
+                    break
+                time.sleep(0.05)
+            self.assertTrue(executor._broken)
+
+            # a new job in this state must stay pending
+            self._add_job('c')
+            queue.dispatch()
+            self.assertEqual(self._get_jobs()['c'], ('pending', 0))
+
+            for _ in range(100):
+                if all(status == 'done' for status, _ in self._get_jobs().values()):
+                    break
+                await gen.sleep(0.1)
+
+        IOLoop.current().run_sync(run, timeout=30)
+        self.assertEqual(self._get_jobs(), {'a': ('done', 2), 'b': ('done', 2),
+                                            'c': ('done', 1)})
+
+
+if __name__ == '__main__':
+    unittest.main()
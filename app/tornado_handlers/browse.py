@@ -15,6 +15,7 @@ sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../pl
 from config import get_db_filename, get_overview_img_filepath
 from db_entry import DBData, DBDataGenerated
 from helper import flight_modes_table, get_airframe_data, html_long_word_force_break
+from prefetch import prefetch_logs, PRIORITY_BROWSE
 
 #pylint: disable=relative-beyond-top-level,too-many-statements
 from .common import get_jinja_env, get_generated_db_data_from_log
@@ -195,6 +196,7 @@ class BrowseDataRetrievalHandler(tornado.web.RequestHandler):
 
         filtered_counter = 0
         all_overview_imgs = set(os.listdir(get_overview_img_filepath()))
+        shown_log_ids = []
         if search_str == '':
             # speed-up the request by iterating only over the requested items
             counter = data_start
@@ -206,6 +208,7 @@ class BrowseDataRetrievalHandler(tornado.web.RequestHandler):
                     continue
 
                 json_output['data'].append(columns.columns)
+                shown_log_ids.append(db_tuples[i][0])
             filtered_counter = len(db_tuples)
         else:
             counter = 1
@@ -220,6 +223,7 @@ class BrowseDataRetrievalHandler(tornado.web.RequestHandler):
                         (columns.columns, columns.search_only_columns)):
                     if data_start <= filtered_counter < data_start + data_length:
                         json_output['data'].append(columns.columns)
+                        shown_log_ids.append(db_tuple[0])
                     filtered_counter += 1
 
 
@@ -228,6 +232,9 @@ class BrowseDataRetrievalHandler(tornado.web.RequestHandler):
 
         json_output['recordsFiltered'] = filtered_counter
 
+        # the logs on the page are likely to be opened next
+        prefetch_logs(shown_log_ids, PRIORITY_BROWSE)
+
         self.set_header('Content-Type', 'application/json')
         self.write(json.dumps(json_output))
 
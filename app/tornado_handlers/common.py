@@ -53,7 +53,8 @@ def generate_db_data_from_log_file(log_id, db_connection=None):
     """
     Extract necessary information from the log file and insert as an entry to
     the LogsGenerated table (faster information retrieval later on).
-    This is an expensive operation.
+    Only the metadata of the log is read (see load_ulog_file_metadata()), but
+    this still scans the whole file.
     It's ok to call this a second time for the same log, the call will just
     silently fail (but still read the whole log and will not update the DB entry)
 
@@ -70,20 +71,10 @@ def generate_db_data_from_log_file(log_id, db_connection=None):
     db_cursor = db_connection.cursor()
     try:
         db_cursor.execute(
-            'insert into LogsGenerated (Id, Duration, '
-            'Mavtype, Estimator, AutostartId, Hardware, '
-            'Software, NumLoggedErrors, NumLoggedWarnings, '
-            'FlightModes, SoftwareVersion, UUID, FlightModeDurations, StartTime) values '
-            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-            [log_id, db_data_gen.duration_s, db_data_gen.mav_type,
-             db_data_gen.estimator, db_data_gen.sys_autostart_id,
-             db_data_gen.sys_hw, db_data_gen.ver_sw,
-             db_data_gen.num_logged_errors,
-             db_data_gen.num_logged_warnings,
-             ','.join(map(str, db_data_gen.flight_modes)),
-             db_data_gen.ver_sw_release, db_data_gen.vehicle_uuid,
-             db_data_gen.flight_mode_durations_str(),
-             db_data_gen.start_time_utc])
+            'insert into LogsGenerated ({}) values ({})'.format(
+                ', '.join(DBDataGenerated.db_columns),
+                ', '.join(['?'] * len(DBDataGenerated.db_columns))),
+            db_data_gen.to_db_row(log_id))
         db_connection.commit()
     except sqlite3.IntegrityError:
         # someone else already inserted it (race). just ignore it
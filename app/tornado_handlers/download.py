@@ -9,14 +9,17 @@ import sys
 import uuid
 import shutil
 import sqlite3
+import tornado.ioloop
 import tornado.web
 
-from pyulog.ulog2kml import convert_ulog2kml
+import simplekml
+from pyulog.ulog2kml import _kml_add_position_data, _kml_add_camera_triggers
 
 # this is needed for the following imports
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
 from helper import get_log_filename, validate_log_id, \
-    flight_modes_table, load_ulog_file, get_default_parameters
+    flight_modes_table, load_ulog_file, load_ulog_file_topics, get_default_parameters, \
+    get_flight_mode_changes
 
 from config import get_db_filename, get_kml_filepath
 
@@ -25,10 +28,74 @@ from .common import CustomHTTPError, TornadoRequestHandlerBase
 
 #pylint: disable=abstract-method, unused-argument
 
+
+def convert_ulog2kml(log_file_name, output_file_name, position_topic_name,
+                     colors, *, style, camera_trigger_topic_name):
+    """ create a KML file from a ULog file. Same as pyulog's
+    convert_ulog2kml(), but only decodes the required topics """
+    ulog = load_ulog_file_topics(log_file_name, [position_topic_name, 'vehicle_status',
+                                                 camera_trigger_topic_name])
+    used_style = {'extrude': False, 'line_width': 3}
+    used_style.update(style)
+
+    kml = simplekml.Kml()
+    _kml_add_position_data(kml, ulog, position_topic_name, colors, used_style,
+                           altitude_offset=0, minimum_interval_s=0.1,
+                           flight_mode_changes=get_flight_mode_changes(ulog))
+    _kml_add_camera_triggers(kml, ulog, camera_trigger_topic_name, altitude_offset=0)
+    kml.save(output_file_name)
+
+
+def _kml_colors(flight_mode):
+    """ flight mode colors for KML file """
+    if flight_mode not in flight_modes_table: flight_mode = 0
+
+    color_str = flight_modes_table[flight_mode][1][1:] # color in form 'ff00aa'
+
+    # increase brightness to match colors with template
+    rgb = [int(color_str[2*x:2*x+2], 16) for x in range(3)]
+    for i in range(3):
+        rgb[i] += 40
+        if rgb[i] > 255: rgb[i] = 255
+
+    color_str = "".join(map(lambda x: format(x, '02x'), rgb))
+
+    return 'ff'+color_str[4:6]+color_str[2:4]+color_str[0:2] # KML uses aabbggrr
+
+
+def get_kml_filename(log_id):
+    """ get the (cached) KML file name of a log """
+    return os.path.join(get_kml_filepath(), log_id.replace('/', '.')+'.kml')
+
+
+def generate_kml_file(log_id):
+    """ create the KML file of a log (if it does not exist yet).
+    Raises an exception if the log contains no position data.
+    :return: KML file name
+    """
+    kml_file_name = get_kml_filename(log_id)
+    if os.path.exists(kml_file_name):
+        return kml_file_name
+    print('need to create kml file', kml_file_name)
+
+    style = {'line_width': 2}
+    # create in random temporary file, then move it (to avoid races)
+    temp_file_name = kml_file_name+'.'+str(uuid.uuid4())
+    try:
+        convert_ulog2kml(get_log_filename(log_id), temp_file_name,
+                         'vehicle_global_position', _kml_colors, style=style,
+                         camera_trigger_topic_name='camera_capture')
+        shutil.move(temp_file_name, kml_file_name)
+    finally:
+        if os.path.exists(temp_file_name):
+            os.unlink(temp_file_name)
+    return kml_file_name
+
+
 class DownloadHandler(TornadoRequestHandlerBase):
     """ Download log file Tornado request handler """
 
-    def get(self, *args, **kwargs):
+    async def get(self, *args, **kwargs):
         """ GET request callback """
         log_id = self.get_argument('log')
         if not validate_log_id(log_id):
@@ -61,7 +128,8 @@ class DownloadHandler(TornadoRequestHandlerBase):
             return default_value
 
         if download_type == '1': # download the parameters
-            ulog = load_ulog_file(log_file_name)
+            ulog = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, load_ulog_file, log_file_name)
             param_keys = sorted(ulog.initial_parameters.keys())
 
             self.set_header('Content-Type', 'application/octet-stream')
@@ -89,38 +157,13 @@ class DownloadHandler(TornadoRequestHandlerBase):
                 self.write('\n')
 
         elif download_type == '2': # download the kml file
-            kml_path = get_kml_filepath()
-            kml_file_name = os.path.join(kml_path, log_id.replace('/', '.')+'.kml')
+            kml_file_name = get_kml_filename(log_id)
 
             # check if chached file exists
             if not os.path.exists(kml_file_name):
-                print('need to create kml file', kml_file_name)
-
-                def kml_colors(flight_mode):
-                    """ flight mode colors for KML file """
-                    if flight_mode not in flight_modes_table: flight_mode = 0
-
-                    color_str = flight_modes_table[flight_mode][1][1:] # color in form 'ff00aa'
-
-                    # increase brightness to match colors with template
-                    rgb = [int(color_str[2*x:2*x+2], 16) for x in range(3)]
-                    for i in range(3):
-                        rgb[i] += 40
-                        if rgb[i] > 255: rgb[i] = 255
-
-                    color_str = "".join(map(lambda x: format(x, '02x'), rgb))
-
-                    return 'ff'+color_str[4:6]+color_str[2:4]+color_str[0:2] # KML uses aabbggrr
-
-                style = {'line_width': 2}
-                # create in random temporary file, then move it (to avoid races)
                 try:
-                    temp_file_name = kml_file_name+'.'+str(uuid.uuid4())
-                    convert_ulog2kml(log_file_name, temp_file_name,
-                                     'vehicle_global_position', kml_colors,
-                                     style=style,
-                                     camera_trigger_topic_name='camera_capture')
-                    shutil.move(temp_file_name, kml_file_name)
+                    await tornado.ioloop.IOLoop.current().run_in_executor(
+                        None, generate_kml_file, log_id)
                 except Exception as e:
                     print('Error creating KML file', sys.exc_info()[0], sys.exc_info()[1])
                     raise CustomHTTPError(400, 'No Position Data in log') from e
@@ -140,7 +183,8 @@ class DownloadHandler(TornadoRequestHandlerBase):
                 self.finish()
 
         elif download_type == '3': # download the non-default parameters
-            ulog = load_ulog_file(log_file_name)
+            ulog = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, load_ulog_file, log_file_name)
             param_keys = sorted(ulog.initial_parameters.keys())
 
             self.set_header('Content-Type', 'application/octet-stream')
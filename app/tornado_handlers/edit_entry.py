@@ -12,6 +12,8 @@ import tornado.web
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
 from config import get_db_filename, get_kml_filepath, get_overview_img_filepath
 from helper import clear_ulog_cache, get_log_filename
+from ulog_cache import delete_cached_ulog
+from render_cache import delete_rendered_documents
 
 #pylint: disable=relative-beyond-top-level
 from .common import get_jinja_env
@@ -80,27 +82,47 @@ Click <a href="{delete_url}">here</a> to confirm and delete the log {log_id}.
         if token != db_tuple[0]: # validate token
             return False
 
-        # kml file
-        kml_path = get_kml_filepath()
-        kml_file_name = os.path.join(kml_path, log_id.replace('/', '.')+'.kml')
-        if os.path.exists(kml_file_name):
-            os.unlink(kml_file_name)
-
-        #preview image
-        preview_image_filename = os.path.join(get_overview_img_filepath(), log_id+'.png')
-        if os.path.exists(preview_image_filename):
-            os.unlink(preview_image_filename)
-
-        log_file_name = get_log_filename(log_id)
-        print('deleting log entry {} and file {}'.format(log_id, log_file_name))
-        os.unlink(log_file_name)
-        cur.execute("DELETE FROM LogsGenerated WHERE Id = ?", (log_id,))
-        cur.execute("DELETE FROM Logs WHERE Id = ?", (log_id,))
-        con.commit()
         cur.close()
         con.close()
-
-        # need to clear the cache as well
-        clear_ulog_cache()
+        delete_log(log_id)
 
         return True
+
+
+def delete_log(log_id, keep_ingest_job=False):
+    """
+    delete a log: the file, the generated files, the caches and the DB entries
+    (without validating a token)
+
+    :param keep_ingest_job: keep the IngestJobs entry (with the error of a
+                            failed upload)
+    """
+    # kml file
+    kml_path = get_kml_filepath()
+    kml_file_name = os.path.join(kml_path, log_id.replace('/', '.')+'.kml')
+    if os.path.exists(kml_file_name):
+        os.unlink(kml_file_name)
+
+    #preview image
+    preview_image_filename = os.path.join(get_overview_img_filepath(), log_id+'.png')
+    if os.path.exists(preview_image_filename):
+        os.unlink(preview_image_filename)
+
+    log_file_name = get_log_filename(log_id)
+    print('deleting log entry {} and file {}'.format(log_id, log_file_name))
+    delete_cached_ulog(log_file_name)
+    delete_rendered_documents(log_id)
+    if os.path.exists(log_file_name):
+        os.unlink(log_file_name)
+    con = sqlite3.connect(get_db_filename())
+    cur = con.cursor()
+    cur.execute("DELETE FROM LogsGenerated WHERE Id = ?", (log_id,))
+    if not keep_ingest_job:
+        cur.execute("DELETE FROM IngestJobs WHERE Id = ?", (log_id,))
+    cur.execute("DELETE FROM Logs WHERE Id = ?", (log_id,))
+    con.commit()
+    cur.close()
+    con.close()
+
+    # need to clear the cache as well
+    clear_ulog_cache()
@@ -13,6 +13,7 @@ sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'plot_
 from config import *
 from db_entry import *
 from helper import validate_log_id, validate_error_ids
+from render_cache import delete_rendered_documents
 
 class UpdateErrorLabelHandler(tornado.web.RequestHandler):
     """ Update the error label of a flight log."""
@@ -47,6 +48,9 @@ class UpdateErrorLabelHandler(tornado.web.RequestHandler):
         cur.close()
         con.close()
 
+        # the plot page shows the error labels
+        delete_rendered_documents(log_id)
+
         self.write('OK')
 
     def data_received(self, chunk):
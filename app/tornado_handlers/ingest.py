@@ -0,0 +1,396 @@
+"""
+Background processing of uploaded logs (ingest pipeline).
+
+Uploads are stored as jobs in the IngestJobs DB table and processed by a pool
+of worker processes: loading the log (which also fills the ULog disk cache),
+updating the Vehicle and LogsGenerated tables, generating the preview image and
+the KML file, and sending the notification emails.
+"""
+from __future__ import print_function
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import json
+import os
+from html import escape
+import sqlite3
+import sys
+import traceback
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+import tornado.process
+
+from pyulog.px4 import PX4ULog
+
+# this is needed for the following imports
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
+from config import get_db_filename, get_ingest_workers, get_ingest_max_attempts, \
+    email_notifications_config
+from db_entry import DBVehicleData, DBData
+from helper import get_total_flight_time, get_log_filename, load_ulog_file, \
+    get_airframe_name, clear_ulog_cache, get_worker_process_context, ULogException
+from overview_generator import generate_overview_img_from_id
+from prefetch import prefetch_logs, PRIORITY_UPLOAD
+
+#pylint: disable=relative-beyond-top-level
+from .common import generate_db_data_from_log_file
+from .download import generate_kml_file
+from .edit_entry import delete_log
+from .send_email import send_notification_email, send_flightreport_email
+
+
+def update_vehicle_db_entry(cur, ulog, log_id, vehicle_name):
+    """
+    Update the Vehicle DB entry
+    :param cur: DB cursor
+    :param ulog: ULog object
+    :param vehicle_name: new vehicle name or '' if not updated
+    :return vehicle_data: DBVehicleData object
+    """
+
+    vehicle_data = DBVehicleData()
+    if 'sys_uuid' in ulog.msg_info_dict:
+        vehicle_data.uuid = escape(ulog.msg_info_dict['sys_uuid'])
+
+        if vehicle_name == '':
+            cur.execute('select Name '
+                        'from Vehicle where UUID = ?', [vehicle_data.uuid])
+            db_tuple = cur.fetchone()
+            if db_tuple is not None:
+                vehicle_data.name = db_tuple[0]
+            print('reading vehicle name from db:'+vehicle_data.name)
+        else:
+            vehicle_data.name = vehicle_name
+            print('vehicle name from uploader:'+vehicle_data.name)
+
+        vehicle_data.log_id = log_id
+        flight_time = get_total_flight_time(ulog)
+        if flight_time is not None:
+            vehicle_data.flight_time = flight_time
+
+        # update or insert the DB entry
+        cur.execute('insert or replace into Vehicle (UUID, LatestLogId, Name, FlightTime)'
+                    'values (?, ?, ?, ?)',
+                    [vehicle_data.uuid, vehicle_data.log_id, vehicle_data.name,
+                     vehicle_data.flight_time])
+    return vehicle_data
+
+
+def get_log_info(ulog, upload_data, vehicle_name):
+    """ get the log information for the notification emails """
+    info = {}
+    info['description'] = upload_data['description']
+    info['feedback'] = upload_data['feedback']
+    info['upload_filename'] = upload_data['upload_filename']
+    info['type'] = ''
+    info['airframe'] = ''
+    info['hardware'] = ''
+    info['uuid'] = ''
+    info['software'] = ''
+    info['rating'] = upload_data['rating']
+    if len(vehicle_name) > 0:
+        info['vehicle_name'] = vehicle_name
+
+    if ulog is not None:
+        px4_ulog = PX4ULog(ulog)
+        info['type'] = px4_ulog.get_mav_type()
+        airframe_name_tuple = get_airframe_name(ulog)
+        if airframe_name_tuple is not None:
+            airframe_name, airframe_id = airframe_name_tuple
+            if len(airframe_name) == 0:
+                info['airframe'] = airframe_id
+            else:
+                info['airframe'] = airframe_name
+        sys_hardware = ''
+        if 'ver_hw' in ulog.msg_info_dict:
+            sys_hardware = escape(ulog.msg_info_dict['ver_hw'])
+            info['hardware'] = sys_hardware
+        if 'sys_uuid' in ulog.msg_info_dict and sys_hardware != 'SITL':
+            info['uuid'] = escape(ulog.msg_info_dict['sys_uuid'])
+        branch_info = ''
+        if 'ver_sw_branch' in ulog.msg_info_dict:
+            branch_info = ' (branch: '+ulog.msg_info_dict['ver_sw_branch']+')'
+        if 'ver_sw' in ulog.msg_info_dict:
+            ver_sw = escape(ulog.msg_info_dict['ver_sw'])
+            info['software'] = ver_sw + branch_info
+    return info
+
+
+class IngestJobDeleted(Exception):
+    """ the log was deleted while its job was running """
+
+
+def _set_job_step(con, log_id, step):
+    cur = con.cursor()
+    cur.execute('update IngestJobs set Step = ?, Updated = ? where Id = ?',
+                [step, datetime.datetime.now(), log_id])
+    con.commit()
+    num_rows = cur.rowcount
+    cur.close()
+    if num_rows == 0:
+        raise IngestJobDeleted(log_id)
+
+
+def _set_email_sent(con, log_id, emails_sent, email):
+    """ record that an email was sent, so that it is not sent again when the
+    job is retried """
+    emails_sent.append(email)
+    cur = con.cursor()
+    cur.execute('update IngestJobs set EmailsSent = ? where Id = ?',
+                [','.join(emails_sent), log_id])
+    con.commit()
+    cur.close()
+
+
+def run_ingest_job(log_id):
+    """ process an uploaded log. This runs in a worker process.
+    Raises an exception on failure (the job will then be retried). """
+    con = sqlite3.connect(get_db_filename())
+    try:
+        cur = con.cursor()
+        cur.execute('select Data, EmailsSent from IngestJobs where Id = ?', [log_id])
+        db_tuple = cur.fetchone()
+        if db_tuple is None:
+            raise IngestJobDeleted(log_id)
+        upload_data = json.loads(db_tuple[0])
+        emails_sent = [email for email in db_tuple[1].split(',') if len(email) > 0]
+        is_public_flightreport = upload_data['type'] == 'flightreport' and \
+            upload_data['is_public']
+
+        # Load the ulog file but only if not uploaded via CI.
+        ulog = None
+        vehicle_name = upload_data['vehicle_name']
+        if upload_data['source'] != 'CI':
+            _set_job_step(con, log_id, 'loading')
+            ulog = load_ulog_file(get_log_filename(log_id))
+
+            _set_job_step(con, log_id, 'db')
+            vehicle_data = update_vehicle_db_entry(cur, ulog, log_id, vehicle_name)
+            vehicle_name = vehicle_data.name
+            con.commit()
+            generate_db_data_from_log_file(log_id, con)
+
+            if is_public_flightreport:
+                _set_job_step(con, log_id, 'overview')
+                generate_overview_img_from_id(log_id)
+
+            _set_job_step(con, log_id, 'kml')
+            try:
+                generate_kml_file(log_id)
+            except Exception as error:
+                # not all logs have position data
+                print('No KML file for {}: {}'.format(log_id, error))
+
+        # send the emails last. Sent emails are recorded, so that they are
+        # not sent again on a retry.
+        _set_job_step(con, log_id, 'email')
+        info = get_log_info(ulog, upload_data, vehicle_name)
+        if is_public_flightreport and upload_data['source'] != 'CI' and \
+                'flightreport' not in emails_sent:
+            rating = upload_data['rating']
+            destinations = set(email_notifications_config['public_flightreport'])
+            if rating in ['unsatisfactory', 'crash_sw_hw', 'crash_pilot']:
+                destinations = destinations | \
+                    set(email_notifications_config['public_flightreport_bad'])
+            send_flightreport_email(
+                list(destinations),
+                upload_data['plot_url'],
+                DBData.rating_str_static(rating),
+                DBData.wind_speed_str_static(upload_data['wind_speed']),
+                upload_data['delete_url'], upload_data['email'], info)
+            _set_email_sent(con, log_id, emails_sent, 'flightreport')
+
+        if 'notification' not in emails_sent:
+            send_notification_email(upload_data['email'], upload_data['plot_url'],
+                                    upload_data['delete_url'], info)
+            _set_email_sent(con, log_id, emails_sent, 'notification')
+        _set_job_step(con, log_id, 'done')
+        cur.close()
+    except IngestJobDeleted:
+        raise
+    except Exception:
+        traceback.print_exception(*sys.exc_info())
+        raise
+    finally:
+        con.close()
+        # the worker does not need to keep the log in RAM
+        clear_ulog_cache()
+
+
+def _init_worker():
+    """ worker process initialization: run with lower priority than the server """
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+def enqueue_ingest_job(con, log_id, upload_data):
+    """ add a job for an uploaded log to the queue
+    :param con: DB connection (will be committed)
+    :param upload_data: dict with upload information (JSON-serializable)
+    """
+    now = datetime.datetime.now()
+    cur = con.cursor()
+    cur.execute('insert or replace into IngestJobs (Id, Status, Step, Attempts, Error, '
+                'Created, Updated, Data, EmailsSent) values (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [log_id, 'pending', '', 0, '', now, now, json.dumps(upload_data), ''])
+    con.commit()
+    cur.close()
+    if _ingest_queue['queue'] is not None:
+        IOLoop.current().add_callback(_ingest_queue['queue'].dispatch)
+
+
+class IngestQueue:
+    """
+    Dispatches pending jobs from the IngestJobs table to a pool of worker
+    processes. Must be used from the IOLoop thread.
+    """
+
+    POLL_INTERVAL_MS = 5000
+
+    def __init__(self, num_workers, max_attempts):
+        self._num_workers = num_workers
+        self._max_attempts = max_attempts
+        self._executor = None
+        self._broken = False # a worker died, wait for the running jobs
+        self._running = set()
+
+    def start(self):
+        """ start the workers and process the pending jobs """
+        con = sqlite3.connect(get_db_filename())
+        with con:
+            # jobs that were running when the server stopped
+            con.execute("update IngestJobs set Status = 'pending' where Status = 'running'")
+        con.close()
+        self._create_executor()
+        PeriodicCallback(self.dispatch, self.POLL_INTERVAL_MS).start()
+        IOLoop.current().add_callback(self.dispatch)
+
+    def _create_executor(self):
+        # submit a first task right away, so that the workers are started
+        # early on
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._num_workers, initializer=_init_worker,
+            mp_context=get_worker_process_context())
+        self._executor.submit(os.getpid)
+
+    def dispatch(self):
+        """ start pending jobs if there are free workers """
+        while not self._broken and len(self._running) < self._num_workers:
+            log_id = self._claim_next_job()
+            if log_id is None:
+                break
+            print('Starting ingest job for log', log_id)
+            self._running.add(log_id)
+            try:
+                future = self._executor.submit(run_ingest_job, log_id)
+            except BrokenProcessPool:
+                # the pool broke before the failed jobs were reported
+                self._running.discard(log_id)
+                self._release_job(log_id)
+                self._pool_broken()
+                break
+            IOLoop.current().add_future(future, functools.partial(self._job_done, log_id))
+
+    @staticmethod
+    def _release_job(log_id):
+        """ put a claimed job back to pending, without counting the attempt """
+        con = sqlite3.connect(get_db_filename())
+        with con:
+            con.execute("update IngestJobs set Status = 'pending', Attempts = Attempts - 1, "
+                        "Updated = ? where Id = ? and Status = 'running'",
+                        [datetime.datetime.now(), log_id])
+        con.close()
+
+    def _pool_broken(self):
+        """ a worker died (e.g. out of memory): start a new pool once all jobs
+        of the broken one are done. Until then no new jobs are started. """
+        self._broken = True
+        if self._running:
+            return
+        self._executor.shutdown(wait=False)
+        self._create_executor()
+        self._broken = False
+
+    @staticmethod
+    def _claim_next_job():
+        """ mark the oldest pending job as running.
+        :return: log id or None
+        """
+        con = sqlite3.connect(get_db_filename())
+        try:
+            cur = con.cursor()
+            while True:
+                cur.execute("select Id from IngestJobs where Status = 'pending' "
+                            "order by Created limit 1")
+                db_tuple = cur.fetchone()
+                if db_tuple is None:
+                    return None
+                log_id = db_tuple[0]
+                cur.execute("update IngestJobs set Status = 'running', Attempts = Attempts + 1, "
+                            "Updated = ? where Id = ? and Status = 'pending'",
+                            [datetime.datetime.now(), log_id])
+                con.commit()
+                if cur.rowcount == 1:
+                    return log_id
+                # someone else got it: try the next one
+        finally:
+            con.close()
+
+    def _job_done(self, log_id, future):
+        self._running.discard(log_id)
+        error = future.exception()
+        con = sqlite3.connect(get_db_filename())
+        with con:
+            attempts = con.execute('select Attempts from IngestJobs where Id = ?',
+                                   [log_id]).fetchone()
+            if attempts is None:
+                print('Log {} was deleted during its ingest job'.format(log_id))
+            elif error is None:
+                con.execute("update IngestJobs set Status = 'done', Error = '', Updated = ? "
+                            "where Id = ?", [datetime.datetime.now(), log_id])
+                # the uploader is about to open the plot page
+                prefetch_logs([log_id], PRIORITY_UPLOAD)
+            else:
+                status = 'pending'
+                if isinstance(error, ULogException):
+                    # retrying does not help
+                    status = 'failed'
+                    error_message = 'Failed to parse the file. It is most likely ' \
+                        'corrupt. The log was removed.'
+                else:
+                    error_message = str(error) or type(error).__name__
+                    if attempts[0] >= self._max_attempts:
+                        status = 'failed'
+                print('Ingest job for log {} failed: {}'.format(log_id, error_message))
+                con.execute('update IngestJobs set Status = ?, Error = ?, Updated = ? '
+                            'where Id = ?', [status, error_message,
+                                             datetime.datetime.now(), log_id])
+        con.close()
+
+        if attempts is None:
+            # remove what the job added after the log was deleted
+            delete_log(log_id)
+        elif isinstance(error, ULogException):
+            # do not leave a broken entry. The job is kept, so that the
+            # uploader sees the error (plot page and ingest status).
+            delete_log(log_id, keep_ingest_job=True)
+
+        if isinstance(error, BrokenProcessPool) or self._broken:
+            self._pool_broken()
+        self.dispatch()
+
+
+_ingest_queue = {'queue': None}
+
+def start_ingest_queue():
+    """ start the ingest workers. With multiple server processes (--num-procs),
+    only the first process runs the workers, the other ones only add jobs. """
+    task_id = tornado.process.task_id()
+    if task_id is not None and task_id != 0:
+        return
+    queue = IngestQueue(get_ingest_workers(), get_ingest_max_attempts())
+    queue.start()
+    _ingest_queue['queue'] = queue
@@ -0,0 +1,48 @@
+"""
+Tornado handler for the ingest job status of an uploaded log (JSON)
+"""
+from __future__ import print_function
+import json
+import sqlite3
+import os
+import sys
+import tornado.web
+
+# this is needed for the following imports
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
+from config import get_db_filename, get_ingest_max_attempts
+from helper import validate_log_id
+
+#pylint: disable=abstract-method
+
+class IngestStatusHandler(tornado.web.RequestHandler):
+    """ Get the status of the background processing of an upload """
+
+    def get(self, *args, **kwargs):
+        """ GET request """
+        log_id = self.get_argument('log')
+        if not validate_log_id(log_id):
+            raise tornado.web.HTTPError(400, 'Invalid Parameter')
+
+        con = sqlite3.connect(get_db_filename(), detect_types=sqlite3.PARSE_DECLTYPES)
+        cur = con.cursor()
+        cur.execute('select Status, Step, Attempts, Error, Created, Updated '
+                    'from IngestJobs where Id = ?', [log_id])
+        db_tuple = cur.fetchone()
+        cur.close()
+        con.close()
+        if db_tuple is None:
+            raise tornado.web.HTTPError(404, 'No ingest job for this log')
+
+        jsondict = {}
+        jsondict['log_id'] = log_id
+        jsondict['status'] = db_tuple[0]
+        jsondict['step'] = db_tuple[1]
+        jsondict['attempts'] = db_tuple[2]
+        jsondict['max_attempts'] = get_ingest_max_attempts()
+        jsondict['error'] = db_tuple[3]
+        jsondict['created'] = str(db_tuple[4])
+        jsondict['updated'] = str(db_tuple[5])
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(jsondict))
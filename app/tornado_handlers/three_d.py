@@ -5,13 +5,14 @@ from __future__ import print_function
 import datetime
 import os
 import sys
+import tornado.ioloop
 import tornado.web
 import numpy as np
 
 # this is needed for the following imports
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
 from config import get_bing_maps_api_key, get_cesium_api_key
-from helper import validate_log_id, get_log_filename, load_ulog_file, \
+from helper import validate_log_id, get_log_filename, load_ulog_file_topics, \
     get_flight_mode_changes, flight_modes_table, get_lat_lon_alt_deg
 
 #pylint: disable=relative-beyond-top-level
@@ -24,7 +25,7 @@ THREED_TEMPLATE = '3d.html'
 class ThreeDHandler(TornadoRequestHandlerBase):
     """ Tornado Request Handler to render the 3D Cesium.js page """
 
-    def get(self, *args, **kwargs):
+    async def get(self, *args, **kwargs):
         """ GET request callback """
 
         # load the log file
@@ -32,7 +33,11 @@ class ThreeDHandler(TornadoRequestHandlerBase):
         if not validate_log_id(log_id):
             raise tornado.web.HTTPError(400, 'Invalid Parameter')
         log_file_name = get_log_filename(log_id)
-        ulog = load_ulog_file(log_file_name)
+        # load in a thread, so that other requests are not blocked
+        ulog = await tornado.ioloop.IOLoop.current().run_in_executor(
+            None, load_ulog_file_topics, log_file_name,
+            ['vehicle_gps_position', 'vehicle_attitude', 'manual_control_setpoint',
+             'vehicle_status'])
 
         # extract the necessary information from the log
 
@@ -0,0 +1,42 @@
+"""
+Tornado handler for the aggregated timing reports of the plot pages (JSON)
+"""
+from __future__ import print_function
+import hmac
+import json
+import re
+import os
+import sys
+import tornado.web
+
+# this is needed for the following imports
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../plot_app'))
+from config import get_admin_token
+from timing_report import aggregate_timing_reports, load_timing_report
+
+#pylint: disable=abstract-method
+
+class TimingReportsHandler(tornado.web.RequestHandler):
+    """ Get the timing histograms over all stored sessions, or the report of a
+    single session (with the session=<id> argument). Requires the admin token
+    (token=<token> argument). """
+
+    def get(self, *args, **kwargs):
+        """ GET request """
+        admin_token = get_admin_token()
+        token = self.get_argument('token', '')
+        if admin_token == '' or not hmac.compare_digest(token, admin_token):
+            raise tornado.web.HTTPError(403, 'Invalid Token')
+
+        session_id = self.get_argument('session', None)
+        if session_id is None:
+            jsondict = aggregate_timing_reports()
+        else:
+            if not re.fullmatch(r'[A-Za-z0-9_-]+', session_id):
+                raise tornado.web.HTTPError(400, 'Invalid Parameter')
+            jsondict = load_timing_report(session_id)
+            if jsondict is None:
+                raise tornado.web.HTTPError(404, 'No timing report for this session')
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(jsondict))